@@ -0,0 +1,16 @@
+import os
+import sys
+
+# ASGI entry point, an alternative to api/index.py. Serve with an ASGI
+# server, e.g. `uvicorn api.asgi:app`. See async_app.py.
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# Reuses the WSGI entry point's setup: /tmp database, snapshot copy and migrations
+from api.index import app_module
+from async_app import AsyncApp
+
+app = AsyncApp(app_module,
+               db_workers=int(os.environ.get('ASGI_DB_WORKERS', 4)),
+               wsgi_workers=int(os.environ.get('ASGI_WSGI_WORKERS', 16)))
@@ -1,8 +1,9 @@
 import os
+import shutil
 import sys
 
 # Set database path to /tmp for Vercel (writable location)
-os.environ['DB_PATH'] = '/tmp/travel.db'
+os.environ.setdefault('DB_PATH', '/tmp/travel.db')
 
 # Change to project root directory to ensure relative paths work
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -12,38 +13,31 @@ os.chdir(project_root)
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+# Start from the prebuilt, pre-seeded snapshot (see `python view_db.py snapshot`)
+# instead of creating and seeding the schema on every cold start
+snapshot_path = os.environ.get('DB_SNAPSHOT_PATH', os.path.join(project_root, 'snapshot', 'travel.db'))
+if os.path.exists(snapshot_path) and not os.path.exists(os.environ['DB_PATH']):
+    try:
+        # Copy to a temporary name first so a half-written file is never opened
+        shutil.copyfile(snapshot_path, os.environ['DB_PATH'] + '.tmp')
+        os.replace(os.environ['DB_PATH'] + '.tmp', os.environ['DB_PATH'])
+    except OSError as copy_error:
+        print(f"Snapshot copy error: {copy_error}")
+
 # Import Flask app
 try:
-    from app import app, init_db, add_sample_destinations, add_admin_user
+    import app as app_module
+    from app import app
 except Exception as import_error:
     print(f"Failed to import app: {import_error}")
     import traceback
     traceback.print_exc()
     raise
 
-# Initialize database on module load (Vercel caches the module)
-try:
-    init_db()
-    # Check if we need to add sample data
-    import sqlite3
-    try:
-        conn = sqlite3.connect('/tmp/travel.db')
-        count = conn.execute('SELECT COUNT(*) FROM destination').fetchone()[0]
-        conn.close()
-        if count == 0:
-            add_sample_destinations()
-            add_admin_user()
-    except Exception as db_error:
-        print(f"Database check error: {db_error}")
-        import traceback
-        traceback.print_exc()
-except Exception as init_error:
-    print(f"Database initialization error: {init_error}")
-    import traceback
-    traceback.print_exc()
-    # Continue anyway - database might be created on first request
+# Initialize database on module load (Vercel caches the module). With an
+# up-to-date snapshot this only reads PRAGMA user_version.
+app_module.ensure_db_initialized()
 
 # Export the Flask app for Vercel
 # Vercel Python runtime automatically detects the 'app' variable
 # This is the standard way to deploy Flask on Vercel
-
@@ -1,12 +1,30 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
-import sqlite3
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, g, Response, stream_with_context, abort, send_file
+from contextlib import closing
 from datetime import datetime
 import os
-import hashlib
 import functools
+import hmac
 import json
+import math
+import tempfile
 import uuid
 
+from archive import (count as count_archived, default_archive_dir, delete_booking as delete_archived_booking,
+                     each_partition, find as find_archived)
+from cart_store import MemoryCartStore, SQLiteCartStore
+from catalog import CatalogCache
+from catalog_json import CatalogJSON, parse_fields
+from db import ConnectionPool
+from fragments import FragmentCache
+from images import IMMUTABLE, SIZES as IMAGE_SIZES, ImageCache, ImageFetchError, source_version
+from inventory import AvailabilityCache, SoldOut, hold as hold_seats, release as release_seats
+from migrations import SCHEMA_VERSION, migrate, schema_version
+from orders import create_order, generate_order_number
+from pagecache import PageCache
+from passwords import PasswordHasher, hasher_from_env
+from ratelimit import MemoryRateLimitStore, SQLiteRateLimitStore, parse_limit
+from search import PrefixIndex, search_destinations
+
 # Get the directory where this file is located
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -15,106 +33,242 @@ app = Flask(__name__,
             static_folder=os.path.join(basedir, 'static'))
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here-change-in-production')
 
+# Compiled templates are cached on disk so new processes skip Jinja's compile
+# step; set JINJA_CACHE_DIR to an empty string to turn this off
+jinja_cache_dir = os.environ.get('JINJA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'dreamtravels-jinja'))
+if jinja_cache_dir:
+    from jinja2 import FileSystemBytecodeCache
+    try:
+        os.makedirs(jinja_cache_dir, exist_ok=True)
+        app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(jinja_cache_dir)}
+    except OSError:
+        pass
+
 # Database path - use /tmp on Vercel for writable location
 DB_PATH = os.environ.get('DB_PATH', 'travel.db')
 
+# Shared connection pool; each request borrows one connection via get_db()
+db_pool = ConnectionPool(DB_PATH,
+                         max_size=int(os.environ.get('DB_POOL_SIZE', 16)),
+                         timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)))
+
+# Yearly archive databases written by `view_db.py archive`; admin and export read them too
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', default_archive_dir(DB_PATH))
+
+# Destination catalog served from memory; admin writes must call catalog.invalidate()
+catalog = CatalogCache(DB_PATH,
+                       max_entries=int(os.environ.get('CATALOG_CACHE_SIZE', 5000)),
+                       ttl=float(os.environ.get('CATALOG_CACHE_TTL', 300)))
+
+# Password KDF runs on a bounded pool; PASSWORD_HASHER selects scrypt (default) or pbkdf2
+password_hasher = PasswordHasher(hasher_from_env(),
+                                 max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)))
+
+# Seats left per destination and date, cached briefly for the detail page
+availability_cache = AvailabilityCache(ttl=float(os.environ.get('AVAILABILITY_CACHE_TTL', 5)))
+
+# Server-side carts; CART_STORE=memory keeps them in this process only
+if os.environ.get('CART_STORE', 'sqlite') == 'memory':
+    cart_store = MemoryCartStore(max_carts=int(os.environ.get('CART_STORE_MAX_CARTS', 10000)))
+else:
+    cart_store = SQLiteCartStore(lambda: get_db())
+
+# Optional write-behind checkout: orders are journaled, queued and group-committed
+order_queue = None
+if os.environ.get('ORDER_QUEUE_ENABLED') == '1':
+    from order_queue import OrderQueue
+    order_queue = OrderQueue(db_pool,
+                             os.environ.get('ORDER_QUEUE_JOURNAL', DB_PATH + '.orders.journal'),
+                             max_depth=int(os.environ.get('ORDER_QUEUE_MAX_DEPTH', 1000)),
+                             batch_size=int(os.environ.get('ORDER_QUEUE_BATCH_SIZE', 50)))
+
+# Login/signup throttling with token buckets per client IP and per username.
+# RATE_LIMIT_STORE=sqlite shares the buckets between processes through RATE_LIMIT_DB.
+rate_limiter = None
+if os.environ.get('RATE_LIMIT_ENABLED', '1') != '0':
+    if os.environ.get('RATE_LIMIT_STORE', 'memory') == 'sqlite':
+        rate_limiter = SQLiteRateLimitStore(ConnectionPool(os.environ.get('RATE_LIMIT_DB', DB_PATH + '.ratelimit'),
+                                                           max_size=4))
+    else:
+        rate_limiter = MemoryRateLimitStore(max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000)))
+# "count/seconds" per bucket, overridable as e.g. RATE_LIMIT_LOGIN_USERNAME=5/300
+RATE_LIMITS = {
+    name: {scope: parse_limit(os.environ.get(f'RATE_LIMIT_{name.upper()}_{scope.upper()}', default))
+           for scope, default in scopes.items()}
+    for name, scopes in {
+        'login': {'ip': '20/60', 'username': '5/300'},
+        'signup': {'ip': '5/600'},
+    }.items()
+}
+# Proxies in front of the app that append to X-Forwarded-For. Vercel's edge (which
+# sets VERCEL=1) is one, so every client is not keyed on the proxy's address.
+RATE_LIMIT_PROXY_HOPS = int(os.environ.get('RATE_LIMIT_PROXY_HOPS', 1 if os.environ.get('VERCEL') else 0))
+
+# Rendered catalog pages for anonymous visitors, keyed by catalog generation
+page_cache = PageCache(catalog)
+
+# Destination cards and admin rows rendered once per catalog generation
+fragment_cache = FragmentCache(catalog, app)
+app.jinja_env.globals['fragment'] = fragment_cache.render
+
+# Resized destination images served from /img/<id>/<size>; IMAGE_PROXY=0 links the source URLs directly
+image_cache = None
+if os.environ.get('IMAGE_PROXY', '1') != '0':
+    image_cache = ImageCache(os.environ.get('IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'dreamtravels-images')),
+                             max_bytes=int(os.environ.get('IMAGE_CACHE_MB', 200)) * 1024 * 1024,
+                             failure_ttl=float(os.environ.get('IMAGE_FAILURE_TTL', 60)))
+
+def image_src(destination, size):
+    url = destination['image_url']
+    if not url or image_cache is None:
+        return url
+    # The source digest changes with image_url, which lets the response be cached as immutable
+    return url_for('destination_image', destination_id=destination['id'], size=size, v=source_version(url))
+
+def image_srcset(destination, sizes):
+    if not destination['image_url'] or image_cache is None:
+        return ''
+    return ', '.join(f'{image_src(destination, size)} {size}w' for size in sizes)
+
+app.jinja_env.globals.update(image_src=image_src, image_srcset=image_srcset)
+
+# Encoded destinations and responses for /api/v1, rebuilt whenever the catalog changes
+catalog_json = CatalogJSON(catalog)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+API_MAX_BATCH = 100
+
+# Typeahead over destination names, rebuilt whenever the catalog changes
+SEARCH_PAGE_SIZE = 12
+suggest_index = PrefixIndex(catalog)
+
+# Request, SQL and template timings served at /metrics; METRICS_ENABLED=0 turns them off
+metrics = None
+if os.environ.get('METRICS_ENABLED', '1') != '0':
+    from metrics import Metrics
+    slow_query_ms = os.environ.get('SLOW_QUERY_MS')
+    metrics = Metrics(slow_query_seconds=float(slow_query_ms) / 1000 if slow_query_ms else None,
+                      logger=app.logger)
+    metrics.install(app)
+    db_pool.on_query = metrics.record_query
+    metrics.register_stats('db_pool', db_pool.stats)
+    metrics.register_stats('catalog', catalog.stats)
+    metrics.register_stats('page_cache', page_cache.stats)
+    metrics.register_stats('fragment_cache', fragment_cache.stats)
+    metrics.register_stats('catalog_json', catalog_json.stats)
+    if rate_limiter is not None:
+        metrics.register_stats('rate_limiter', rate_limiter.stats)
+    if image_cache is not None:
+        metrics.register_stats('image_cache', image_cache.stats)
+    if order_queue is not None:
+        metrics.register_stats('order_queue', order_queue.stats)
+
 # Database initialization
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS destination
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  name TEXT NOT NULL,
-                  description TEXT NOT NULL,
-                  price REAL NOT NULL,
-                  image_url TEXT)''')
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS booking
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  name TEXT NOT NULL,
-                  email TEXT NOT NULL,
-                  destination_id INTEGER NOT NULL,
-                  travel_date TEXT NOT NULL,
-                  created_at TEXT NOT NULL,
-                  FOREIGN KEY (destination_id) REFERENCES destination (id))''')
-                  
-    c.execute('''CREATE TABLE IF NOT EXISTS user
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  username TEXT UNIQUE NOT NULL,
-                  email TEXT UNIQUE NOT NULL,
-                  password TEXT NOT NULL,
-                  is_admin INTEGER DEFAULT 0,
-                  created_at TEXT NOT NULL)''')
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS orders
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER NOT NULL,
-                  order_number TEXT NOT NULL,
-                  total_amount REAL NOT NULL,
-                  payment_method TEXT NOT NULL,
-                  status TEXT NOT NULL,
-                  created_at TEXT NOT NULL,
-                  FOREIGN KEY (user_id) REFERENCES user (id))''')
-                  
-    c.execute('''CREATE TABLE IF NOT EXISTS order_items
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  order_id INTEGER NOT NULL,
-                  destination_id INTEGER NOT NULL,
-                  quantity INTEGER NOT NULL,
-                  price REAL NOT NULL,
-                  travel_date TEXT NOT NULL,
-                  FOREIGN KEY (order_id) REFERENCES orders (id),
-                  FOREIGN KEY (destination_id) REFERENCES destination (id))''')
-    
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        migrate(conn)
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # One pooled connection per app context, returned to the pool on teardown
+    if 'db' not in g:
+        g.db = db_pool.acquire()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.release(conn)
 
 # Cart Management Functions
+# The session cookie only carries an opaque cart id; lines live in cart_store
+def get_cart_id(create=False):
+    cart_id = session.get('cart_id')
+    if cart_id is None and create:
+        cart_id = uuid.uuid4().hex
+        session['cart_id'] = cart_id
+    return cart_id
+
+def get_cart_lines():
+    # Loaded at most once per request
+    if 'cart_lines' not in g:
+        cart_id = get_cart_id()
+        g.cart_lines = cart_store.load(cart_id) if cart_id else {}
+    return g.cart_lines
+
 def get_cart():
-    if 'cart' not in session:
-        session['cart'] = []
-    return session['cart']
+    return list(get_cart_lines().values())
 
 def add_to_cart(destination_id, price, travel_date, quantity=1):
-    cart = get_cart()
-    
-    # Check if item is already in cart
-    for item in cart:
-        if item['destination_id'] == destination_id and item['travel_date'] == travel_date:
-            item['quantity'] += quantity
-            session.modified = True
-            return
-    
-    # Add new item to cart
-    cart.append({
+    cart_id = get_cart_id(create=True)
+    # Hold the seats first; raises SoldOut when there are not enough left
+    hold_seats(get_db(), cart_id, destination_id, travel_date, quantity)
+    availability_cache.invalidate([(destination_id, travel_date)])
+    cart_store.add(cart_id, {
         'destination_id': destination_id,
         'price': price,
         'travel_date': travel_date,
         'quantity': quantity
     })
-    session.modified = True
+    g.pop('cart_lines', None)
 
 def remove_from_cart(index):
-    cart = get_cart()
-    if 0 <= index < len(cart):
-        del cart[index]
-        session.modified = True
+    keys = list(get_cart_lines())
+    if 0 <= index < len(keys):
+        cart_store.remove(get_cart_id(), keys[index])
+        release_seats(get_db(), get_cart_id(), *keys[index])
+        availability_cache.invalidate([keys[index]])
+        g.pop('cart_lines', None)
 
-def get_cart_total():
-    cart = get_cart()
-    return sum(item['price'] * item['quantity'] for item in cart)
+def get_cart_items(cart=None):
+    # Join the cart to its destinations with one batched catalog lookup
+    if cart is None:
+        cart = get_cart()
+    destinations = catalog.get_many(get_db(), {item['destination_id'] for item in cart})
+    cart_items = []
+    for index, item in enumerate(cart):
+        destination = destinations.get(item['destination_id'])
+        if destination:
+            cart_items.append({
+                'index': index,
+                'destination': destination,
+                'destination_id': item['destination_id'],
+                'price': item['price'],
+                'travel_date': item['travel_date'],
+                'quantity': item['quantity'],
+                'subtotal': item['price'] * item['quantity']
+            })
+    return cart_items
+
+def get_cart_total(cart_items=None):
+    if cart_items is None:
+        cart_items = get_cart_items()
+    return sum(item['subtotal'] for item in cart_items)
+
+def clear_cart(keep_holds=False):
+    cart_id = get_cart_id()
+    if cart_id:
+        cart_store.clear(cart_id)
+        if keep_holds:
+            # A queued order still needs its seats: the order writer consumes the holds
+            # in inventory.reserve(). The next cart gets a new id so they stay separate.
+            session.pop('cart_id', None)
+        else:
+            release_seats(get_db(), cart_id)
+    g.pop('cart_lines', None)
 
-def clear_cart():
-    session['cart'] = []
+@app.context_processor
+def cart_context():
+    # A callable so the cart is only loaded by pages that show the badge
+    return {'cart_count': lambda: len(get_cart_lines())}
 
 # User Authentication Functions
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return password_hasher.hash(password)
+
+def verify_password(password, stored_hash):
+    # Returns (matches, needs_rehash); legacy SHA-256 hashes always need a rehash
+    return password_hasher.verify(password, stored_hash)
 
 def login_required(f):
     @functools.wraps(f)
@@ -137,54 +291,154 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def api_login_required(f):
+    # Like login_required, but answers 401 JSON instead of redirecting to the login page
+    @functools.wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return api_error('Login required', 401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+def api_error(message, status):
+    return jsonify({'error': message}), status
+
+def client_ip():
+    if RATE_LIMIT_PROXY_HOPS:
+        route = request.access_route
+        return route[max(len(route) - RATE_LIMIT_PROXY_HOPS, 0)]
+    return request.remote_addr or ''
+
+def rate_limited(name):
+    """Throttle POSTs to the view with the RATE_LIMITS[name] buckets.
+
+    Rejections are answered before the view runs, without touching the
+    database or rendering a template.
+    """
+    limits = RATE_LIMITS[name]
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            if rate_limiter is not None and request.method == 'POST':
+                for scope, (capacity, period) in limits.items():
+                    value = client_ip() if scope == 'ip' else (request.form.get(scope) or '').strip().lower()
+                    if not value:
+                        continue
+                    retry_after = rate_limiter.take(f'{name}:{scope}:{value}', capacity, period)
+                    if retry_after:
+                        seconds = math.ceil(retry_after)
+                        return Response(f'Too many attempts. Please try again in {seconds} seconds.\n', 429,
+                                        mimetype='text/plain', headers={'Retry-After': str(seconds)})
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def refund_rate_limit(name, scope, value):
+    # Gives back the token rate_limited() took for an attempt that should not count
+    value = (value or '').strip().lower()
+    if rate_limiter is not None and value and scope in RATE_LIMITS[name]:
+        capacity, period = RATE_LIMITS[name][scope]
+        rate_limiter.refund(f'{name}:{scope}:{value}', capacity, period)
+
 # Database initialization flag
 _db_initialized = False
 
+def boot_database():
+    # Fast path: a database already at the current schema version (e.g. a copied
+    # snapshot) needs neither DDL nor seeding
+    with db_pool.connection() as conn:
+        if schema_version(conn) >= SCHEMA_VERSION:
+            return
+        migrate(conn)
+        # Check if we need to add sample data
+        count = conn.execute('SELECT COUNT(*) FROM destination').fetchone()[0]
+        if count == 0:
+            seed_destinations(conn)
+            seed_admin_user(conn)
+
 def ensure_db_initialized():
     global _db_initialized
     if not _db_initialized:
         try:
-            init_db()
-            # Check if we need to add sample data
-            conn = get_db()
-            count = conn.execute('SELECT COUNT(*) FROM destination').fetchone()[0]
-            conn.close()
-            if count == 0:
-                add_sample_destinations()
-                add_admin_user()
+            boot_database()
+            if order_queue is not None:
+                # Replays any orders journaled before a restart
+                order_queue.start()
             _db_initialized = True
-        except Exception as e:
-            print(f"Database initialization error: {e}")
+        except Exception:
+            app.logger.exception('Database initialization error')
             _db_initialized = True  # Prevent infinite retries
 
 # Routes
 @app.route('/')
+@page_cache.cached
 def home():
     ensure_db_initialized()
     try:
-        conn = get_db()
-        destinations = conn.execute('SELECT * FROM destination').fetchall()
-        # Convert Row objects to dictionaries for template compatibility
-        destinations_list = [dict(dest) for dest in destinations]
-        conn.close()
-        return render_template('home.html', destinations=destinations_list)
-    except Exception as e:
-        print(f"Error loading destinations: {e}")
-        import traceback
-        traceback.print_exc()
-        # Return empty list if error
+        destinations = catalog.all(get_db())
+        return render_template('home.html', destinations=destinations)
+    except Exception:
+        app.logger.exception('Error loading destinations')
+        # Return empty list if error, but never cache the fallback page
+        g.skip_page_cache = True
         return render_template('home.html', destinations=[])
 
 @app.route('/destination/<int:id>')
+@page_cache.cached
 def destination_detail(id):
-    conn = get_db()
-    destination = conn.execute('SELECT * FROM destination WHERE id = ?', (id,)).fetchone()
-    conn.close()
+    destination = catalog.get(get_db(), id)
     if destination is None:
         flash('Destination not found', 'error')
         return redirect(url_for('home'))
     return render_template('destination_detail.html', destination=destination)
 
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()[:100]
+    page = request.args.get('page', 1, type=int)
+    # Cards come from the fragment cache, so make sure its generation is current
+    catalog.current_generation()
+    destinations, has_next = search_destinations(get_db(), query, page=page, per_page=SEARCH_PAGE_SIZE)
+    return render_template('search.html', query=query, destinations=destinations,
+                           page=max(page, 1), has_next=has_next)
+
+@app.route('/api/suggest')
+def suggest():
+    query = request.args.get('q', '')[:100]
+    limit = min(request.args.get('limit', 8, type=int), 20)
+    response = jsonify({'query': query, 'suggestions': suggest_index.suggest(get_db(), query, limit=limit)})
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+@app.route('/img/<int:destination_id>/<int:size>')
+def destination_image(destination_id, size):
+    destination = catalog.get(get_db(), destination_id)
+    if image_cache is None or size not in IMAGE_SIZES or destination is None or not destination['image_url']:
+        abort(404)
+    url = destination['image_url']
+    try:
+        path = image_cache.get(url, size)
+        try:
+            response = send_file(path, conditional=True, max_age=300)
+        except FileNotFoundError:
+            # Evicted between the lookup and the open; fetch it again
+            response = send_file(image_cache.get(url, size), conditional=True, max_age=300)
+    except ImageFetchError as e:
+        app.logger.warning('Image proxy: %s', e)
+        # Let the browser load the original instead
+        return redirect(url)
+    if request.args.get('v') == source_version(url):
+        response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+@app.route('/destination/<int:id>/availability')
+def destination_availability(id):
+    travel_date = request.args.get('date')
+    if not travel_date:
+        return jsonify({'error': 'date is required'}), 400
+    seats = availability_cache.get(get_db(), id, travel_date)
+    return jsonify({'destination_id': id, 'travel_date': travel_date, 'seats_left': max(seats, 0)})
+
 @app.route('/add-to-cart/<int:destination_id>', methods=['POST'])
 @login_required
 def add_destination_to_cart(destination_id):
@@ -195,15 +449,17 @@ def add_destination_to_cart(destination_id):
         flash('Please select a travel date', 'error')
         return redirect(url_for('destination_detail', id=destination_id))
     
-    conn = get_db()
-    destination = conn.execute('SELECT * FROM destination WHERE id = ?', (destination_id,)).fetchone()
-    conn.close()
+    destination = catalog.get(get_db(), destination_id)
     
     if destination is None:
         flash('Destination not found', 'error')
         return redirect(url_for('home'))
     
-    add_to_cart(destination_id, destination['price'], travel_date, quantity)
+    try:
+        add_to_cart(destination_id, destination['price'], travel_date, quantity)
+    except (SoldOut, ValueError) as e:
+        flash(f'Could not add {destination["name"]} to your cart: {e}', 'error')
+        return redirect(url_for('destination_detail', id=destination_id))
     flash(f'Added {destination["name"]} to your cart', 'success')
     
     return redirect(url_for('cart'))
@@ -211,22 +467,8 @@ def add_destination_to_cart(destination_id):
 @app.route('/cart')
 @login_required
 def cart():
-    conn = get_db()
-    cart_items = []
-    
-    for index, item in enumerate(get_cart()):
-        destination = conn.execute('SELECT * FROM destination WHERE id = ?', (item['destination_id'],)).fetchone()
-        if destination:
-            cart_items.append({
-                'index': index,
-                'destination': dict(destination),
-                'travel_date': item['travel_date'],
-                'quantity': item['quantity'],
-                'subtotal': item['price'] * item['quantity']
-            })
-    
-    conn.close()
-    return render_template('cart.html', cart_items=cart_items, total=get_cart_total())
+    cart_items = get_cart_items()
+    return render_template('cart.html', cart_items=cart_items, total=get_cart_total(cart_items))
 
 @app.route('/cart/remove/<int:index>', methods=['POST'])
 @login_required
@@ -235,10 +477,28 @@ def remove_item_from_cart(index):
     flash('Item removed from cart', 'success')
     return redirect(url_for('cart'))
 
+def queue_order(cart_items, payment_method, cart_id=None):
+    # Hands the order to the write-behind queue; returns None when the queue is full
+    from order_queue import QueueFull
+    order_number = generate_order_number()
+    try:
+        order_queue.submit({
+            'order_number': order_number,
+            'user_id': session['user_id'],
+            'cart_id': cart_id,
+            'payment_method': payment_method,
+            'cart_items': [{key: item[key] for key in ('destination_id', 'quantity', 'price', 'travel_date')}
+                           for item in cart_items]
+        })
+    except QueueFull:
+        return None
+    return order_number
+
 @app.route('/checkout', methods=['GET', 'POST'])
 @login_required
 def checkout():
-    if not get_cart():
+    cart_items = get_cart_items()
+    if not cart_items:
         flash('Your cart is empty', 'error')
         return redirect(url_for('home'))
     
@@ -248,52 +508,149 @@ def checkout():
             flash('Please select a payment method', 'error')
             return redirect(url_for('checkout'))
         
-        conn = get_db()
         try:
-            # Create new order
-            order_number = str(uuid.uuid4()).replace('-', '')[:10].upper()
-            
-            conn.execute('''INSERT INTO orders
-                          (user_id, order_number, total_amount, payment_method, status, created_at)
-                          VALUES (?, ?, ?, ?, ?, ?)''',
-                       (session['user_id'], order_number, get_cart_total(), payment_method, 'Completed',
-                        datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')))
-            conn.commit()
-            
-            # Get the order ID
-            order = conn.execute('SELECT id FROM orders WHERE order_number = ?', (order_number,)).fetchone()
-            order_id = order['id']
-            
-            # Add order items
-            for item in get_cart():
-                conn.execute('''INSERT INTO order_items
-                              (order_id, destination_id, quantity, price, travel_date)
-                              VALUES (?, ?, ?, ?, ?)''',
-                           (order_id, item['destination_id'], item['quantity'], item['price'], item['travel_date']))
-            
-            conn.commit()
+            if order_queue is not None:
+                order_number = queue_order(cart_items, payment_method, cart_id=get_cart_id())
+                if order_number is None:
+                    flash('We are receiving a lot of orders right now. Please try again in a moment.', 'error')
+                    return render_template('checkout.html', cart_total=get_cart_total(cart_items)), 503
+                status = 'Queued'
+            else:
+                order_id, order_number = create_order(get_db(), session['user_id'], cart_items, payment_method,
+                                                      cart_id=get_cart_id())
+                availability_cache.invalidate([(item['destination_id'], item['travel_date']) for item in cart_items])
+                status = 'Completed'
             
             # Clear cart after successful order
-            clear_cart()
+            clear_cart(keep_holds=status == 'Queued')
             
             flash('Your order has been placed successfully!', 'success')
-            return render_template('order_confirmation.html', order_number=order_number)
+            return render_template('order_confirmation.html', order_number=order_number, status=status)
             
+        except SoldOut as e:
+            flash(f'Sorry, one of your trips is no longer available: {e}', 'error')
         except Exception as e:
+            app.logger.exception('Checkout failed')
             flash(f'Error processing your order: {str(e)}', 'error')
-        finally:
-            conn.close()
     
-    return render_template('checkout.html', cart_total=get_cart_total())
+    return render_template('checkout.html', cart_total=get_cart_total(cart_items))
+
+@app.route('/order/<order_number>/status')
+@login_required
+def order_status(order_number):
+    status = order_queue.status(order_number) if order_queue is not None else None
+    if status is None:
+        conn = get_db()
+        order = conn.execute('SELECT status FROM orders WHERE order_number = ? AND user_id = ?',
+                             (order_number, session['user_id'])).fetchone()
+        if order is not None:
+            status = order['status']
+        elif conn.execute('SELECT 1 FROM failed_orders WHERE order_number = ? AND user_id = ?',
+                          (order_number, session['user_id'])).fetchone():
+            # Queued checkouts the order writer could not commit
+            status = 'Failed'
+        else:
+            order = find_archived(conn, ARCHIVE_DIR, 'SELECT status FROM {schema}.orders WHERE order_number = ? AND user_id = ?',
+                                  (order_number, session['user_id']))
+            if order is None:
+                return jsonify({'error': 'Order not found'}), 404
+            status = order['status']
+    return jsonify({'order_number': order_number, 'status': status})
+
+@app.route('/api/v1/destinations')
+def api_destinations():
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        if 'ids' in request.args:
+            try:
+                ids = [int(id) for id in request.args['ids'].split(',') if id.strip()]
+            except ValueError:
+                raise ValueError('ids must be a comma-separated list of integers')
+            if not 0 < len(ids) <= API_MAX_BATCH:
+                raise ValueError(f'ids must list between 1 and {API_MAX_BATCH} destinations')
+            body, etag = catalog_json.batch(get_db(), fields, ids)
+        else:
+            try:
+                after = int(request.args.get('cursor') or 0)
+            except ValueError:
+                raise ValueError('Invalid cursor')
+            limit = min(max(request.args.get('limit', API_PAGE_SIZE, type=int), 1), API_MAX_PAGE_SIZE)
+            body, etag = catalog_json.page(get_db(), fields, after=after, limit=limit)
+    except ValueError as e:
+        return api_error(str(e), 400)
+    # The body is the cached bytes; only the headers are built per request
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 0
+    response.cache_control.must_revalidate = True
+    return response.make_conditional(request)
+
+@app.route('/api/v1/orders', methods=['POST'])
+@api_login_required
+def api_create_order():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return api_error('Expected a JSON object', 400)
+    payment_method = data.get('payment_method')
+    items = data.get('items')
+    if not payment_method or not isinstance(payment_method, str):
+        return api_error('payment_method is required', 400)
+    if not isinstance(items, list) or not 0 < len(items) <= API_MAX_BATCH:
+        return api_error(f'items must list between 1 and {API_MAX_BATCH} trips', 400)
+
+    lines = []
+    for n, item in enumerate(items):
+        try:
+            destination_id = int(item['destination_id'])
+            quantity = int(item.get('quantity', 1))
+            travel_date = datetime.strptime(item['travel_date'], '%Y-%m-%d').strftime('%Y-%m-%d')
+        except (TypeError, KeyError, ValueError, AttributeError):
+            return api_error(f'items[{n}] needs destination_id, travel_date (YYYY-MM-DD) and quantity', 400)
+        if quantity < 1:
+            return api_error(f'items[{n}]: quantity must be at least 1', 400)
+        lines.append((destination_id, quantity, travel_date))
+
+    # Prices always come from the catalog, never from the client
+    conn = get_db()
+    destinations = catalog.get_many(conn, {destination_id for destination_id, _, _ in lines})
+    cart_items = []
+    for n, (destination_id, quantity, travel_date) in enumerate(lines):
+        destination = destinations.get(destination_id)
+        if destination is None:
+            return api_error(f'items[{n}]: destination {destination_id} not found', 404)
+        cart_items.append({'destination_id': destination_id, 'quantity': quantity,
+                           'price': destination['price'], 'travel_date': travel_date})
+
+    try:
+        if order_queue is not None:
+            order_number = queue_order(cart_items, payment_method)
+            if order_number is None:
+                response = jsonify({'error': 'Too many orders right now, please retry shortly'})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            status, code = 'Queued', 202
+        else:
+            _, order_number = create_order(conn, session['user_id'], cart_items, payment_method)
+            availability_cache.invalidate([(item['destination_id'], item['travel_date']) for item in cart_items])
+            status, code = 'Completed', 201
+    except SoldOut as e:
+        return api_error(f'Sold out: {e}', 409)
+    response = jsonify({
+        'order_number': order_number,
+        'status': status,
+        'total_amount': round(sum(item['price'] * item['quantity'] for item in cart_items), 2),
+        'items': len(cart_items),
+    })
+    response.headers['Location'] = url_for('order_status', order_number=order_number)
+    return response, code
 
 @app.route('/book/<int:destination_id>', methods=['GET', 'POST'])
 @login_required
 def book_trip(destination_id):
-    conn = get_db()
-    destination = conn.execute('SELECT * FROM destination WHERE id = ?', (destination_id,)).fetchone()
+    destination = catalog.get(get_db(), destination_id)
     
     if destination is None:
-        conn.close()
         flash('Destination not found', 'error')
         return redirect(url_for('home'))
     
@@ -308,9 +665,8 @@ def book_trip(destination_id):
             else:
                 flash('Please select a travel date', 'error')
         except Exception as e:
+            app.logger.exception('Booking failed')
             flash(f'Error adding to cart: {str(e)}', 'error')
-        finally:
-            conn.close()
     
     return render_template('booking.html', destination=destination)
 
@@ -320,6 +676,7 @@ def contact():
 
 # Authentication Routes
 @app.route('/signup', methods=['GET', 'POST'])
+@rate_limited('signup')
 def signup():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -361,13 +718,14 @@ def signup():
             flash('Account created successfully!', 'success')
             return redirect(url_for('home'))
         except Exception as e:
+            app.logger.exception('Signup failed')
+            conn.rollback()
             flash(f'Error creating account: {str(e)}', 'error')
-        finally:
-            conn.close()
             
     return render_template('signup.html')
 
 @app.route('/login', methods=['GET', 'POST'])
+@rate_limited('login')
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -382,10 +740,19 @@ def login():
             # Get user
             user = conn.execute('SELECT * FROM user WHERE username = ?', (username,)).fetchone()
             
-            if not user or user['password'] != hash_password(password):
+            matches, needs_rehash = verify_password(password, user['password']) if user else (False, False)
+            if not matches:
                 flash('Invalid username or password', 'error')
                 return render_template('login.html')
             
+            # Upgrade legacy or outdated hashes now that we know the plain password
+            if needs_rehash:
+                conn.execute('UPDATE user SET password = ? WHERE id = ?', (hash_password(password), user['id']))
+                conn.commit()
+            
+            # Only failed attempts count against the username's limit
+            refund_rate_limit('login', 'username', username)
+            
             # Set session
             session['user_id'] = user['id']
             session['username'] = user['username']
@@ -395,40 +762,174 @@ def login():
             flash('Logged in successfully!', 'success')
             return redirect(next_page)
         except Exception as e:
+            app.logger.exception('Login failed')
             flash(f'Error logging in: {str(e)}', 'error')
-        finally:
-            conn.close()
             
     return render_template('login.html')
 
 @app.route('/logout')
 def logout():
+    clear_cart()
     session.clear()
     flash('You have been logged out', 'success')
     return redirect(url_for('home'))
 
+# Admin dashboard pagination: rows are walked newest first by (created_at, id)
+ADMIN_PAGE_SIZE = 50
+
+def parse_cursor(value):
+    # Cursors are "<created_at>|<id>" of the last row shown on the previous page
+    try:
+        created_at, row_id = value.rsplit('|', 1)
+        return created_at, int(row_id)
+    except (AttributeError, ValueError):
+        return None
+
+def keyset_page(conn, query, alias, conditions, params, cursor, page_size=ADMIN_PAGE_SIZE, archive_dir=None,
+                since=None, until=None):
+    # ``query`` names its archived table as {schema}.<table>. The hot table is read first,
+    # then the archive partitions newest first, only while the page still has room:
+    # archived rows are all older than the hot ones and every partition holds one year
+    conditions, params = list(conditions), list(params)
+    position = parse_cursor(cursor)
+    if position:
+        conditions.append(f'({alias}.created_at, {alias}.id) < (?, ?)')
+        params.extend(position)
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += f' ORDER BY {alias}.created_at DESC, {alias}.id DESC LIMIT ?'
+    rows = conn.execute(query.format(schema='main'), params + [page_size + 1]).fetchall()
+    if archive_dir and len(rows) <= page_size:
+        with closing(each_partition(conn, archive_dir, since=since, until=until)) as schemas:
+            for schema in schemas:
+                rows += conn.execute(query.format(schema=schema), params + [page_size + 1 - len(rows)]).fetchall()
+                if len(rows) > page_size:
+                    break
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}"
+    return rows, next_cursor
+
 @app.route('/admin')
 @admin_required
 def admin():
     conn = get_db()
-    destinations = conn.execute('SELECT * FROM destination').fetchall()
-    bookings = conn.execute('''
-        SELECT b.*, d.name as destination_name 
-        FROM booking b
-        JOIN destination d ON b.destination_id = d.id
-        ORDER BY b.created_at DESC
-    ''').fetchall()
+    destinations = catalog.all(conn)
+    filters = {key: request.args.get(key, '').strip() for key in ('status', 'user', 'date_from', 'date_to')}
+    
+    # Date filters apply to both tables; status and user only to orders
+    date_conditions = {'o': [], 'b': []}
+    date_params = []
+    if filters['date_from']:
+        for alias in date_conditions:
+            date_conditions[alias].append(f'{alias}.created_at >= ?')
+        date_params.append(filters['date_from'])
+    if filters['date_to']:
+        for alias in date_conditions:
+            date_conditions[alias].append(f"{alias}.created_at < date(?, '+1 day')")
+        date_params.append(filters['date_to'])
     
-    # Get orders for admin
-    orders = conn.execute('''
+    order_conditions, order_params = [], []
+    if filters['status']:
+        order_conditions.append('o.status = ?')
+        order_params.append(filters['status'])
+    if filters['user']:
+        order_conditions.append('u.username = ?')
+        order_params.append(filters['user'])
+    
+    # Archived rows are listed too; partitions outside the date filter are not opened
+    archived = {'archive_dir': ARCHIVE_DIR, 'since': filters['date_from'], 'until': filters['date_to']}
+    orders, orders_cursor = keyset_page(conn, '''
         SELECT o.*, u.username 
-        FROM orders o
-        JOIN user u ON o.user_id = u.id
-        ORDER BY o.created_at DESC
-    ''').fetchall()
+        FROM {schema}.orders o
+        JOIN main.user u ON o.user_id = u.id
+    ''', 'o', order_conditions + date_conditions['o'], order_params + date_params,
+        request.args.get('orders_after'), **archived)
+    
+    bookings, bookings_cursor = keyset_page(conn, '''
+        SELECT b.*, d.name as destination_name 
+        FROM {schema}.booking b
+        JOIN main.destination d ON b.destination_id = d.id
+    ''', 'b', date_conditions['b'], date_params, request.args.get('bookings_after'), **archived)
+    
+    # Totals are maintained by triggers (see migrations.add_admin_counters)
+    totals = {row['name']: row['value'] for row in conn.execute('SELECT name, value FROM admin_counters')}
     
-    conn.close()
-    return render_template('admin.html', destinations=destinations, bookings=bookings, orders=orders)
+    return render_template('admin.html', destinations=destinations, bookings=bookings, orders=orders,
+                           orders_cursor=orders_cursor, bookings_cursor=bookings_cursor,
+                           filters=filters, filter_args={key: value for key, value in filters.items() if value},
+                           totals=totals)
+
+def build_sales_report():
+    from reports import sales_report
+    conn = get_db()
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    report = sales_report(conn, days=days)
+    names = catalog.get_many(conn, {row['destination_id'] for row in report['top_destinations']})
+    for row in report['top_destinations']:
+        destination = names.get(row['destination_id'])
+        row['name'] = destination['name'] if destination else f"#{row['destination_id']} (deleted)"
+    return report
+
+@app.route('/admin/reports')
+@admin_required
+def admin_reports():
+    return render_template('admin_reports.html', report=build_sales_report())
+
+@app.route('/admin/reports.json')
+@admin_required
+def admin_reports_json():
+    return jsonify(build_sales_report())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Only served to a scraper sending "Authorization: Bearer <METRICS_TOKEN>";
+    # without a configured token the endpoint does not exist
+    token = os.environ.get('METRICS_TOKEN')
+    if metrics is None or not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return metrics.response()
+
+@app.route('/admin/export/<name>.<fmt>')
+@admin_required
+def export_data(name, fmt):
+    from export import EXPORTS, FORMATS, iter_export
+    if name not in EXPORTS or fmt not in FORMATS:
+        abort(404)
+    since = request.args.get('since')
+    conn = get_db()
+
+    # Stream chunk by chunk; the pooled connection is released when the stream ends
+    chunks = iter_export(conn, name, fmt, since=since, archive_dir=ARCHIVE_DIR)
+    return Response(stream_with_context(chunks), mimetype=FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={name}.{fmt}'})
+
+@app.route('/admin/destinations/import', methods=['POST'])
+@admin_required
+def import_destinations():
+    from importer import FORMATS, import_file
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        abort(400)
+    fmt = request.form.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+    if fmt not in FORMATS:
+        abort(400)
+    # Rows are read straight from the uploaded stream, one chunk at a time
+    result = import_file(get_db(), upload.stream, fmt)
+    if result.inserted or result.updated:
+        catalog.invalidate()
+        page_cache.purge()
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(result.as_dict())
+    flash(f'Imported {result.rows} rows: {result.inserted} added, {result.updated} updated, '
+          f'{result.unchanged} unchanged, {result.error_count} rejected',
+          'warning' if result.error_count else 'success')
+    for error in result.errors[:10]:
+        flash(f"Line {error['line']}: {error['error']}", 'error')
+    return redirect(url_for('admin'))
 
 @app.route('/admin/destination/delete/<int:id>', methods=['POST'])
 @admin_required
@@ -437,16 +938,21 @@ def delete_destination(id):
     try:
         # Check if the destination has bookings
         bookings = conn.execute('SELECT COUNT(*) FROM booking WHERE destination_id = ?', (id,)).fetchone()[0]
+        # Archived bookings still point at the destination
+        bookings += count_archived(conn, ARCHIVE_DIR, 'SELECT COUNT(*) FROM {schema}.booking WHERE destination_id = ?',
+                                   (id,))
         if bookings > 0:
             flash(f'Cannot delete destination. It has {bookings} bookings.', 'error')
         else:
             conn.execute('DELETE FROM destination WHERE id = ?', (id,))
             conn.commit()
+            catalog.invalidate()
+            page_cache.purge()
             flash('Destination deleted successfully', 'success')
     except Exception as e:
+        app.logger.exception('Deleting destination failed')
+        conn.rollback()
         flash(f'Error deleting destination: {str(e)}', 'error')
-    finally:
-        conn.close()
     return redirect(url_for('admin'))
 
 @app.route('/admin/booking/delete/<int:id>', methods=['POST'])
@@ -454,18 +960,26 @@ def delete_destination(id):
 def delete_booking(id):
     conn = get_db()
     try:
-        conn.execute('DELETE FROM booking WHERE id = ?', (id,))
+        deleted = conn.execute('DELETE FROM booking WHERE id = ?', (id,)).rowcount
         conn.commit()
-        flash('Booking deleted successfully', 'success')
+        if not deleted:
+            deleted = delete_archived_booking(conn, ARCHIVE_DIR, id)
+        if deleted:
+            flash('Booking deleted successfully', 'success')
+        else:
+            flash('Booking not found', 'error')
     except Exception as e:
+        app.logger.exception('Deleting booking failed')
+        conn.rollback()
         flash(f'Error deleting booking: {str(e)}', 'error')
-    finally:
-        conn.close()
     return redirect(url_for('admin'))
 
 # Add sample destinations if none exist
 def add_sample_destinations():
-    conn = get_db()
+    with db_pool.connection() as conn:
+        seed_destinations(conn)
+
+def seed_destinations(conn):
     count = conn.execute('SELECT COUNT(*) FROM destination').fetchone()[0]
     if count == 0:
         destinations = [
@@ -497,11 +1011,14 @@ def add_sample_destinations():
         conn.executemany('''INSERT INTO destination (name, description, price, image_url)
                            VALUES (?, ?, ?, ?)''', destinations)
         conn.commit()
-    conn.close()
+        catalog.invalidate()
 
 # Add an admin user if none exists
 def add_admin_user():
-    conn = get_db()
+    with db_pool.connection() as conn:
+        seed_admin_user(conn)
+
+def seed_admin_user(conn):
     count = conn.execute('SELECT COUNT(*) FROM user WHERE is_admin = 1').fetchone()[0]
     if count == 0:
         conn.execute('''INSERT INTO user 
@@ -511,7 +1028,6 @@ def add_admin_user():
                     datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')))
         conn.commit()
         print("Admin user created with username: 'admin' and password: 'admin123'")
-    conn.close()
 
 if __name__ == '__main__':
     init_db()
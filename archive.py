@@ -0,0 +1,271 @@
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from db import write_transaction
+
+# Orders (with their items) and bookings older than a cutoff move out of the
+# hot database into one archive database per year, <archive dir>/<year>.db.
+# Each chunk is copied and committed to the archive first, then deleted from
+# the hot database in a short write transaction, so a crash in between only
+# leaves rows that the next run copies again (INSERT OR IGNORE) and deletes.
+# Readers go through each_partition() to see archived rows as well.
+
+# Tables that are archived, with the columns copied (same order as the hot tables)
+ARCHIVED = {
+    'orders': ('id', 'user_id', 'order_number', 'total_amount', 'payment_method', 'status', 'created_at'),
+    'order_items': ('id', 'order_id', 'destination_id', 'quantity', 'price', 'travel_date'),
+    'booking': ('id', 'name', 'email', 'destination_id', 'travel_date', 'created_at'),
+}
+
+ARCHIVE_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS {schema}.orders
+       (id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        order_number TEXT NOT NULL,
+        total_amount REAL NOT NULL,
+        payment_method TEXT NOT NULL,
+        status TEXT NOT NULL,
+        created_at TEXT NOT NULL)''',
+    '''CREATE TABLE IF NOT EXISTS {schema}.order_items
+       (id INTEGER PRIMARY KEY,
+        order_id INTEGER NOT NULL,
+        destination_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        price REAL NOT NULL,
+        travel_date TEXT NOT NULL)''',
+    '''CREATE TABLE IF NOT EXISTS {schema}.booking
+       (id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        destination_id INTEGER NOT NULL,
+        travel_date TEXT NOT NULL,
+        created_at TEXT NOT NULL)''',
+    # The same indexes the admin and export queries use on the hot tables
+    'CREATE UNIQUE INDEX IF NOT EXISTS {schema}.idx_orders_order_number ON orders (order_number)',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_orders_created_at ON orders (created_at)',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_orders_user_created ON orders (user_id, created_at)',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_orders_status_created ON orders (status, created_at)',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_order_items_order_id ON order_items (order_id)',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_booking_created_at ON booking (created_at)',
+)
+
+PARTITION_RE = re.compile(r'^(\d{4})\.db$')
+
+
+def default_archive_dir(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'archive')
+
+
+def partitions(archive_dir):
+    """Return [(year, path)] for every archive partition, newest first."""
+    try:
+        names = os.listdir(archive_dir)
+    except FileNotFoundError:
+        return []
+    found = [(int(match.group(1)), os.path.join(archive_dir, name))
+             for name, match in ((name, PARTITION_RE.match(name)) for name in names) if match]
+    return sorted(found, reverse=True)
+
+
+def cutoff_for(days, now=None):
+    # Midnight ``days`` ago, so a day's orders are never split between the hot and archive databases
+    return ((now or datetime.utcnow()) - timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def columns(table):
+    return ', '.join(ARCHIVED[table])
+
+
+def each_partition(conn, archive_dir, since=None, until=None, oldest_first=False):
+    """Attach the archive partitions one at a time and yield each one's schema name.
+
+    Partitions come newest first (or oldest first); those entirely before
+    ``since`` or after ``until`` (date or timestamp strings) are skipped.
+    A partition is detached as soon as the caller moves on, so any number of
+    years stays within SQLite's limit on attached databases; finish reading
+    one before asking for the next. Must be iterated outside a transaction.
+    """
+    years = [(year, path) for year, path in partitions(archive_dir)
+             if not (since and f'{year:04d}' < since[:4]) and not (until and f'{year:04d}' > until[:4])]
+    if oldest_first:
+        years.reverse()
+    for year, path in years:
+        schema = f'archive_{year:04d}'
+        # Still attached if an earlier reader was abandoned mid-statement
+        if schema not in {row[1] for row in conn.execute('PRAGMA database_list')}:
+            conn.execute(f'ATTACH DATABASE ? AS {schema}', (path,))
+        try:
+            yield schema
+        finally:
+            try:
+                conn.execute(f'DETACH DATABASE {schema}')
+            except sqlite3.OperationalError:
+                # A statement on it is still open (e.g. an abandoned export stream);
+                # the next reader on this connection reuses it
+                pass
+
+
+def find(conn, archive_dir, query, params=()):
+    """Return the first row ``query`` (naming its tables {schema}.<table>) finds in a partition, or None."""
+    with closing(each_partition(conn, archive_dir)) as schemas:
+        for schema in schemas:
+            rows = conn.execute(query.format(schema=schema), params).fetchall()
+            if rows:
+                return rows[0]
+    return None
+
+
+def count(conn, archive_dir, query, params=()):
+    """Sum the single value ``query`` (naming its tables {schema}.<table>) returns from every partition."""
+    return sum(conn.execute(query.format(schema=schema), params).fetchone()[0]
+               for schema in each_partition(conn, archive_dir))
+
+
+def delete_booking(conn, archive_dir, booking_id):
+    """Delete an archived booking; returns False if no partition has it."""
+    with closing(each_partition(conn, archive_dir)) as schemas:
+        for schema in schemas:
+            if not conn.execute(f'SELECT 1 FROM {schema}.booking WHERE id = ?', (booking_id,)).fetchall():
+                continue
+            with write_transaction(conn):
+                conn.execute(f'DELETE FROM {schema}.booking WHERE id = ?', (booking_id,))
+                # Archived bookings are still on the dashboard totals, and no trigger fires here
+                conn.execute("UPDATE admin_counters SET value = value - 1 WHERE name = 'bookings'")
+            return True
+    return False
+
+
+def _ids(rows):
+    return [row[0] for row in rows], ', '.join('?' * len(rows))
+
+
+def _copy(conn, table, key, ids, placeholders):
+    conn.execute(f'INSERT OR IGNORE INTO archive.{table} ({columns(table)}) '
+                 f'SELECT {columns(table)} FROM main.{table} WHERE {key} IN ({placeholders})', ids)
+
+
+def _move_orders(conn, start, end, chunk_size):
+    rows = conn.execute('''SELECT id, total_amount FROM main.orders
+                           WHERE created_at >= ? AND created_at < ?
+                           ORDER BY created_at LIMIT ?''', (start, end, chunk_size)).fetchall()
+    if not rows:
+        return 0, 0
+    ids, placeholders = _ids(rows)
+    # Copy first and commit the archive on its own: WAL commits are not atomic across files
+    conn.execute('BEGIN')
+    try:
+        _copy(conn, 'orders', 'id', ids, placeholders)
+        _copy(conn, 'order_items', 'order_id', ids, placeholders)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    with write_transaction(conn):
+        items = conn.execute(f'DELETE FROM main.order_items WHERE order_id IN ({placeholders})', ids).rowcount
+        conn.execute(f'DELETE FROM main.orders WHERE id IN ({placeholders})', ids)
+        # The delete triggers took these off the dashboard totals, which still count archived orders
+        conn.execute("UPDATE admin_counters SET value = value + ? WHERE name = 'orders'", (len(ids),))
+        conn.execute("UPDATE admin_counters SET value = value + ? WHERE name = 'revenue'",
+                     (sum(row[1] for row in rows),))
+    return len(ids), items
+
+
+def _move_bookings(conn, start, end, chunk_size):
+    rows = conn.execute('''SELECT id FROM main.booking
+                           WHERE created_at >= ? AND created_at < ?
+                           ORDER BY created_at LIMIT ?''', (start, end, chunk_size)).fetchall()
+    if not rows:
+        return 0
+    ids, placeholders = _ids(rows)
+    conn.execute('BEGIN')
+    try:
+        _copy(conn, 'booking', 'id', ids, placeholders)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    with write_transaction(conn):
+        conn.execute(f'DELETE FROM main.booking WHERE id IN ({placeholders})', ids)
+        conn.execute("UPDATE admin_counters SET value = value + ? WHERE name = 'bookings'", (len(ids),))
+    return len(ids)
+
+
+def _has_rows(conn, start, end):
+    return conn.execute('''SELECT EXISTS (SELECT 1 FROM main.orders WHERE created_at >= ? AND created_at < ?)
+                               OR EXISTS (SELECT 1 FROM main.booking WHERE created_at >= ? AND created_at < ?)''',
+                        (start, end, start, end)).fetchone()[0]
+
+
+def archive(conn, cutoff, archive_dir, chunk_size=500, pause=0.0):
+    """Move orders, their items and bookings created before ``cutoff`` into yearly partitions.
+
+    Every chunk is its own short transaction and ``pause`` seconds are slept
+    between chunks, so checkouts keep getting the write lock. Safe to re-run
+    after an interruption. Returns counts of the rows moved.
+    """
+    moved = {'orders': 0, 'order_items': 0, 'bookings': 0}
+    first = conn.execute('''SELECT MIN(created_at) FROM (SELECT MIN(created_at) AS created_at FROM main.orders
+                                                         UNION ALL SELECT MIN(created_at) FROM main.booking)''').fetchone()[0]
+    if first is None or first >= cutoff:
+        return moved
+    os.makedirs(archive_dir, exist_ok=True)
+    for year in range(int(first[:4]), int(cutoff[:4]) + 1):
+        start, end = f'{year:04d}', min(f'{year + 1:04d}', cutoff)
+        # Only years that have rows to move get a partition
+        if start >= end or not _has_rows(conn, start, end):
+            continue
+        conn.execute('ATTACH DATABASE ? AS archive', (os.path.join(archive_dir, f'{year:04d}.db'),))
+        try:
+            for statement in ARCHIVE_SCHEMA:
+                conn.execute(statement.format(schema='archive'))
+            conn.commit()
+            while True:
+                orders, items = _move_orders(conn, start, end, chunk_size)
+                if not orders:
+                    break
+                moved['orders'] += orders
+                moved['order_items'] += items
+                time.sleep(pause)
+            while True:
+                bookings = _move_bookings(conn, start, end, chunk_size)
+                if not bookings:
+                    break
+                moved['bookings'] += bookings
+                time.sleep(pause)
+        finally:
+            conn.execute('DETACH DATABASE archive')
+    return moved
+
+
+def reclaim(conn, pages=1000, pause=0.0):
+    """Return free pages to the filesystem ``pages`` at a time; returns the number freed.
+
+    Only databases with auto_vacuum=INCREMENTAL can shrink like this (new
+    databases are created that way, see db.DEFAULT_PRAGMAS); returns None
+    for others, which need a one-off vacuum() first.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        return None
+    freed = 0
+    while True:
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free:
+            break
+        with write_transaction(conn):
+            conn.execute(f'PRAGMA incremental_vacuum({min(pages, free)})').fetchall()
+        freed += min(pages, free)
+        time.sleep(pause)
+    # The file only shrinks once the WAL is checkpointed back into it
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    return freed
+
+
+def vacuum(conn):
+    # Rewrites the whole file and blocks writers while it runs; switches it to
+    # incremental auto_vacuum so later runs can use reclaim() instead
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
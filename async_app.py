@@ -0,0 +1,138 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import format_datetime
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+
+# ASGI front end for app.py. Anonymous catalog pages already in the page
+# cache and typeahead lookups are answered on the event loop, with any
+# SQLite work pushed to a dedicated executor. Every other request goes to
+# the Flask app through asgiref's WSGI adapter on a bounded thread pool.
+# Idle keep-alive connections then cost a socket on the event loop rather
+# than a parked worker thread.
+
+
+class AsyncApp:
+    def __init__(self, app_module, db_workers=4, wsgi_workers=16):
+        self.app_module = app_module
+        self.db_executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix='db')
+        self.wsgi_executor = ThreadPoolExecutor(max_workers=wsgi_workers, thread_name_prefix='wsgi')
+        self.session_cookie = app_module.app.config['SESSION_COOKIE_NAME'].encode()
+        wsgi_app = app_module.app
+        executor = self.wsgi_executor
+
+        class Instance(WsgiToAsgiInstance):
+            # asgiref runs WSGI apps on one shared thread by default; use our pool instead
+            run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False,
+                                         executor=executor)
+
+        self._wsgi_instance = lambda: Instance(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            started = time.perf_counter()
+            handled = await self._fast_path(scope, send)
+            if handled is not None:
+                self._record(handled, scope['method'], started)
+                return
+        await self._wsgi_instance()(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self._run_db(self.app_module.ensure_db_initialized)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.db_executor.shutdown(wait=False)
+                self.wsgi_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _run_db(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.db_executor, fn, *args)
+
+    def _is_anonymous(self, scope):
+        # Any session cookie may carry a login or flash messages, so only cookie-less requests qualify
+        for name, value in scope['headers']:
+            if name == b'cookie' and self.session_cookie + b'=' in value:
+                return False
+        return True
+
+    async def _fast_path(self, scope, send):
+        # Returns (endpoint, status) when the request was answered here, else None
+        path = scope['path']
+        if path == '/api/suggest':
+            return await self._suggest(scope, send)
+        is_page = path == '/' or (path.startswith('/destination/') and path[len('/destination/'):].isdigit())
+        if is_page and self._is_anonymous(scope):
+            return await self._cached_page(scope, send)
+        return None
+
+    async def _cached_page(self, scope, send):
+        app_module = self.app_module
+        key = f"{scope['path']}?{scope['query_string'].decode('latin-1')}"
+        generation = await self._run_db(app_module.catalog.current_generation)
+        page = app_module.page_cache.peek(key, generation)
+        if page is None:
+            # Not rendered yet for this generation; Flask renders and caches it
+            return None
+        body, etag, last_modified, mimetype = page
+        headers = [
+            (b'etag', f'"{etag}"'.encode()),
+            (b'last-modified', format_datetime(last_modified, usegmt=True).encode()),
+            (b'cache-control', b'public, max-age=0, must-revalidate'),
+            (b'vary', b'Cookie'),
+        ]
+        if_none_match = dict(scope['headers']).get(b'if-none-match', b'')
+        if if_none_match and (if_none_match.strip() == b'*' or
+                              f'"{etag}"'.encode() in [tag.strip() for tag in if_none_match.split(b',')]):
+            app_module.page_cache.count_not_modified()
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return self._endpoint(scope['path']), 304
+        headers += [(b'content-type', f'{mimetype}; charset=utf-8'.encode()),
+                    (b'content-length', str(len(body)).encode())]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+        return self._endpoint(scope['path']), 200
+
+    async def _suggest(self, scope, send):
+        args = parse_qs(scope['query_string'].decode('latin-1'))
+        query = args.get('q', [''])[0][:100]
+        try:
+            limit = min(int(args.get('limit', ['8'])[0]), 20)
+        except ValueError:
+            limit = 8
+        suggestions = await self._run_db(self._suggestions, query, limit)
+        body = json.dumps({'query': query, 'suggestions': suggestions}).encode()
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'cache-control', b'public, max-age=60'),
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+        return 'suggest', 200
+
+    def _suggestions(self, query, limit):
+        # A connection is only used when the prefix index has to be rebuilt
+        with self.app_module.db_pool.connection() as conn:
+            return self.app_module.suggest_index.suggest(conn, query, limit=limit)
+
+    @staticmethod
+    def _endpoint(path):
+        return 'home' if path == '/' else 'destination_detail'
+
+    def _record(self, handled, method, started):
+        # Fast-path responses never reach Flask's request hooks, so report them here
+        metrics = self.app_module.metrics
+        if metrics is not None:
+            endpoint, status = handled
+            metrics.latency.observe(time.perf_counter() - started, (endpoint,))
+            metrics.requests.inc(labels=(endpoint, method, str(status)))
@@ -0,0 +1,73 @@
+"""Latency of GET /api/v1/destinations from the cached JSON versus encoding per request.
+
+Seeds --destinations rows, then requests pages of --limit destinations
+through the test client. The cached path sends the stored bytes; the
+baseline encodes the same page with jsonify on every request, as a plain
+Flask view would.
+
+Usage: python benchmarks/bench_api.py [--destinations N] [--limit N] [--requests N]
+"""
+import argparse
+import bisect
+import time
+
+from common import load_app, report
+
+
+def timed(client, paths):
+    started = time.perf_counter()
+    for path in paths:
+        response = client.get(path)
+        assert response.status_code == 200, response.status_code
+    return (time.perf_counter() - started) / len(paths) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--destinations', type=int, default=4000, help='keep under CATALOG_CACHE_SIZE')
+    parser.add_argument('--limit', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    app = app_module.app
+    with app_module.db_pool.connection() as conn:
+        conn.executemany('INSERT INTO destination (name, description, price, image_url) VALUES (?, ?, ?, ?)',
+                         [(f'Synthetic destination {n}', f'A synthetic trip number {n} with a longer description.',
+                           100 + n % 900, f'https://images.example.com/{n}.jpg')
+                          for n in range(args.destinations)])
+        conn.commit()
+    app_module.catalog.invalidate()
+
+    @app.route('/bench/jsonify')
+    def jsonify_page():
+        from flask import jsonify, request
+        after = request.args.get('cursor', 0, type=int)
+        rows = app_module.catalog.all(app_module.get_db())
+        start = bisect.bisect_right(rows, after, key=lambda row: row['id'])
+        rows = rows[start:start + args.limit]
+        return jsonify({'destinations': rows, 'next_cursor': str(rows[-1]['id']) if rows else None})
+
+    client = app.test_client()
+    cursors = [n * args.limit for n in range(max(args.destinations // args.limit, 1))]
+    cached = [f'/api/v1/destinations?limit={args.limit}&cursor={cursors[n % len(cursors)]}'
+              for n in range(args.requests)]
+    baseline = [f'/bench/jsonify?cursor={cursors[n % len(cursors)]}' for n in range(args.requests)]
+    # Warm both paths so neither pays for the first catalog load
+    timed(client, cached[:len(cursors)])
+    timed(client, baseline[:1])
+    report({
+        f'cached JSON, {args.limit} per page': f'{timed(client, cached):.3f} ms/request',
+        f'jsonify per request, {args.limit} per page': f'{timed(client, baseline):.3f} ms/request',
+        'first page after a catalog change': f'{encode_after_change(app_module, client, cached[0]):.1f} ms',
+    })
+
+
+def encode_after_change(app_module, client, path):
+    # Includes reloading the catalog and encoding every destination once
+    app_module.catalog.invalidate()
+    return timed(client, [path])
+
+
+if __name__ == '__main__':
+    main()
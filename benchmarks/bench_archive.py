@@ -0,0 +1,117 @@
+"""Checkout latency while old orders are being archived.
+
+Seeds --orders orders (one item each) spread over the last three years, then
+places orders on the pooled connection while archive.archive() moves
+everything older than a year on its own connection. The baseline moves the
+same rows in one transaction, which holds the write lock for the whole copy.
+
+Usage: python benchmarks/bench_archive.py [--orders N] [--chunk-size N]
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+from common import load_app, report
+
+
+def seed(conn, count):
+    conn.execute('UPDATE destination SET capacity = 1000000000')
+    conn.executemany('''INSERT INTO orders (user_id, order_number, total_amount, payment_method, status, created_at)
+                        VALUES (1, ?, 99.0, 'Credit Card', 'Completed',
+                                datetime('now', '-' || ? || ' minutes'))''',
+                     [(f'SEED{n:09d}', n * 3 * 365 * 24 * 60 // count) for n in range(count)])
+    conn.execute('''INSERT INTO order_items (order_id, destination_id, quantity, price, travel_date)
+                    SELECT id, 1, 1, 99.0, '2027-06-01' FROM orders''')
+    conn.commit()
+
+
+def one_transaction(conn, cutoff, archive_dir):
+    # Baseline: the whole move as a single transaction
+    os.makedirs(archive_dir, exist_ok=True)
+    conn.execute('ATTACH DATABASE ? AS archive', (os.path.join(archive_dir, 'all.db'),))
+    conn.execute('CREATE TABLE archive.orders AS SELECT * FROM main.orders WHERE 0')
+    conn.execute('CREATE TABLE archive.order_items AS SELECT * FROM main.order_items WHERE 0')
+    conn.execute('BEGIN IMMEDIATE')
+    conn.execute('INSERT INTO archive.orders SELECT * FROM main.orders WHERE created_at < ?', (cutoff,))
+    conn.execute('''INSERT INTO archive.order_items SELECT * FROM main.order_items
+                    WHERE order_id IN (SELECT id FROM archive.orders)''')
+    conn.execute('DELETE FROM main.order_items WHERE order_id IN (SELECT id FROM archive.orders)')
+    conn.execute('DELETE FROM main.orders WHERE created_at < ?', (cutoff,))
+    conn.commit()
+    conn.execute('DETACH DATABASE archive')
+
+
+def checkout_latency(app_module, move):
+    # Runs move() on a separate connection and times checkouts until it returns
+    from orders import create_order
+    cart_items = [{'destination_id': 2, 'quantity': 1, 'price': 999.99, 'travel_date': '2027-06-01'}]
+    done = threading.Event()
+    elapsed = {}
+
+    def mover():
+        conn = sqlite3.connect(app_module.DB_PATH, timeout=30)
+        started = time.perf_counter()
+        try:
+            move(conn)
+        finally:
+            elapsed['seconds'] = time.perf_counter() - started
+            conn.close()
+            done.set()
+
+    latencies = []
+    thread = threading.Thread(target=mover)
+    with app_module.db_pool.connection() as conn:
+        thread.start()
+        while not done.is_set():
+            started = time.perf_counter()
+            create_order(conn, 1, cart_items, 'Credit Card')
+            latencies.append(time.perf_counter() - started)
+    thread.join()
+    latencies.sort()
+    return elapsed['seconds'], latencies
+
+
+def describe(seconds, latencies, rows):
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+    worst = latencies[-1] if latencies else 0
+    return (f'{rows / seconds:8.0f} orders/s moved, {len(latencies):6d} checkouts, '
+            f'p99 {p99 * 1000:6.2f} ms, max {worst * 1000:7.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    from archive import archive, cutoff_for
+    cutoff = cutoff_for(365)
+    workdir = os.path.dirname(app_module.DB_PATH)
+
+    results = {}
+    with app_module.db_pool.connection() as conn:
+        seed(conn, args.orders)
+        rows = conn.execute('SELECT COUNT(*) FROM orders WHERE created_at < ?', (cutoff,)).fetchone()[0]
+    seconds, latencies = checkout_latency(
+        app_module, lambda conn: archive(conn, cutoff, os.path.join(workdir, 'archive'), chunk_size=args.chunk_size))
+    results[f'chunked ({args.chunk_size} per chunk)'] = describe(seconds, latencies, rows)
+
+    # Put the rows back and move them again in one transaction
+    with app_module.db_pool.connection() as conn:
+        for path in sorted(os.listdir(os.path.join(workdir, 'archive'))):
+            conn.execute('ATTACH DATABASE ? AS archive', (os.path.join(workdir, 'archive', path),))
+            conn.execute('INSERT INTO main.orders SELECT * FROM archive.orders')
+            conn.execute('INSERT INTO main.order_items SELECT * FROM archive.order_items')
+            conn.commit()
+            conn.execute('DETACH DATABASE archive')
+    seconds, latencies = checkout_latency(
+        app_module, lambda conn: one_transaction(conn, cutoff, os.path.join(workdir, 'baseline')))
+    results['one transaction'] = describe(seconds, latencies, rows)
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Head-to-head of the WSGI server and the ASGI entry point under many keep-alive connections.
+
+Each server runs in its own process on the same seeded database: werkzeug's
+threaded server (a thread per connection) and uvicorn serving api/asgi.py.
+An asyncio client runs --connections concurrent clients for --duration
+seconds. Each asks for keep-alive and reconnects when the server closes the
+connection, as werkzeug does. The traffic is anonymous catalog requests:
+home, destination pages, typeahead, and a search that always goes through
+Flask. Reports requests/second, p50/p99, errors, and the server's peak RSS
+and thread count.
+
+Requires uvicorn (pip install uvicorn). Runs offline on localhost.
+
+Usage: python benchmarks/bench_asgi.py [--connections N] [--duration S]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import load_app, project_root
+
+SERVERS = {
+    'wsgi (werkzeug threaded)': (
+        'import sys; sys.path.insert(0, {root!r}); '
+        'from werkzeug.serving import WSGIRequestHandler, make_server; '
+        'import api.index as entry; '
+        'WSGIRequestHandler.log_request = lambda *args, **kwargs: None; '
+        'make_server("127.0.0.1", {port}, entry.app, threaded=True).serve_forever()'
+    ),
+    'asgi (uvicorn + async_app)': (
+        'import sys; sys.path.insert(0, {root!r}); '
+        'import uvicorn, api.asgi as entry; '
+        'uvicorn.run(entry.app, host="127.0.0.1", port={port}, log_level="warning", '
+        'backlog=4096, timeout_keep_alive=60)'
+    ),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f'Server on port {port} did not start')
+
+
+def process_stats(pid):
+    stats = {}
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            key, _, value = line.partition(':')
+            if key in ('VmHWM', 'VmRSS', 'Threads'):
+                stats[key] = value.strip()
+    return stats
+
+
+async def client(port, paths, deadline, latencies, errors):
+    # werkzeug answers "Connection: close", so reconnect whenever the server hangs up
+    rng = random.Random()
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: keep-alive\r\n\r\n'.encode())
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError('server closed the connection')
+            length, keep_alive = 0, True
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.partition(b':')
+                name = name.strip().lower()
+                if name == b'content-length':
+                    length = int(value)
+                elif name == b'connection' and value.strip().lower() == b'close':
+                    keep_alive = False
+            await reader.readexactly(length)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.01)
+            continue
+        latencies.append(time.perf_counter() - started)
+        if not status_line.startswith(b'HTTP/1.1 200'):
+            errors.append(status_line.strip().decode())
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def sample_threads(pid, deadline, peak):
+    while time.perf_counter() < deadline:
+        peak[0] = max(peak[0], int(process_stats(pid).get('Threads', 0)))
+        await asyncio.sleep(0.2)
+
+
+async def drive(port, connections, duration, paths, pid):
+    latencies, errors, peak_threads = [], [], [0]
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(sample_threads(pid, deadline, peak_threads),
+                         *(client(port, paths, deadline, latencies, errors) for _ in range(connections)))
+    return latencies, errors, time.perf_counter() - started, peak_threads[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=256)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dreamtravels-asgi-')
+    db_path = os.path.join(workdir, 'travel.db')
+    load_app(db_path).db_pool.close_all()
+    paths = ['/', '/destination/1', '/destination/3', '/destination/5',
+             '/api/suggest?q=pa', '/api/suggest?q=ba', '/search?q=beach']
+
+    for name, code in SERVERS.items():
+        port = free_port()
+        env = dict(os.environ, DB_PATH=db_path, DB_SNAPSHOT_PATH=os.path.join(workdir, 'missing'),
+                   DB_POOL_SIZE=str(args.connections + 8))
+        server = subprocess.Popen([sys.executable, '-c', code.format(root=project_root, port=port)],
+                                  env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            # Warm the page cache so both servers start from the same state
+            asyncio.run(drive(port, 4, 1.0, paths, server.pid))
+            latencies, errors, elapsed, threads = asyncio.run(
+                drive(port, args.connections, args.duration, paths, server.pid))
+            stats = process_stats(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+        latencies.sort()
+        print(f'{name}')
+        print(f'  connections        {args.connections}')
+        print(f'  requests/s         {len(latencies) / elapsed:.0f}')
+        if latencies:
+            print(f'  latency p50 / p99  {latencies[len(latencies) // 2] * 1000:.1f} / '
+                  f'{latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms')
+        print(f'  errors             {len(errors)}')
+        print(f'  peak RSS           {stats.get("VmHWM")}')
+        print(f'  peak threads       {threads}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Orders per second for checkout carts of 1, 10 and 100 lines.
+
+Usage: python benchmarks/bench_checkout.py [--seconds N]
+"""
+import argparse
+import time
+from datetime import datetime
+
+from common import load_app, report
+
+
+def legacy_checkout(conn, user_id, cart_items, payment_method):
+    # The pre-transaction flow: commit, re-select by order_number, insert items one by one.
+    # Seats are reserved and the sales summaries updated too, so both flows do the same work.
+    from inventory import reserve
+    from orders import generate_order_number
+    from reports import record_order
+    reserve(conn, None, cart_items)
+    order_number = generate_order_number()
+    created_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    conn.execute('''INSERT INTO orders
+                    (user_id, order_number, total_amount, payment_method, status, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)''',
+                 (user_id, order_number, 0, payment_method, 'Completed', created_at))
+    conn.commit()
+    order_id = conn.execute('SELECT id FROM orders WHERE order_number = ?', (order_number,)).fetchone()['id']
+    for item in cart_items:
+        conn.execute('''INSERT INTO order_items
+                        (order_id, destination_id, quantity, price, travel_date)
+                        VALUES (?, ?, ?, ?, ?)''',
+                     (order_id, item['destination_id'], item['quantity'], item['price'], item['travel_date']))
+    record_order(conn, created_at, payment_method, cart_items)
+    conn.commit()
+
+
+def run(place_order, conn, cart_items, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        place_order(conn, 1, cart_items, 'Credit Card')
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    from orders import create_order
+
+    results = {}
+    with app_module.db_pool.connection() as conn:
+        # Unlimited seats so the benchmark measures order writes, not sell-outs
+        conn.execute('UPDATE destination SET capacity = 1000000000')
+        conn.commit()
+        for lines in (1, 10, 100):
+            cart_items = [{'destination_id': (i % 6) + 1, 'quantity': 1, 'price': 999.99,
+                           'travel_date': '2027-06-01'} for i in range(lines)]
+            legacy = run(legacy_checkout, conn, cart_items, args.seconds)
+            current = run(create_order, conn, cart_items, args.seconds)
+            results[f'{lines:>3} lines  legacy'] = f'{legacy:10.1f} orders/s'
+            results[f'{lines:>3} lines  single transaction'] = f'{current:10.1f} orders/s'
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
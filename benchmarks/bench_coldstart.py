@@ -0,0 +1,93 @@
+"""Cold-start time of the Vercel entry point, with and without the DB snapshot.
+
+Every run is a fresh interpreter with an empty /tmp-style database path, and
+measures process start to first `/` response. --importtime additionally
+prints the slowest imports reported by `python -X importtime`.
+
+Usage: python benchmarks/bench_coldstart.py [--runs N] [--budget-ms MS] [--importtime]
+"""
+import argparse
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import project_root
+
+FIRST_RESPONSE = (
+    'import time, sys; started = time.perf_counter(); '
+    'sys.path.insert(0, {root!r}); '
+    'import api.index as entry; '
+    'response = entry.app.test_client().get("/"); '
+    'assert response.status_code == 200, response.status_code; '
+    'print(time.perf_counter() - started)'
+)
+
+
+def cold_start(snapshot_path):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, DB_PATH=os.path.join(workdir, 'travel.db'), DB_SNAPSHOT_PATH=snapshot_path)
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', FIRST_RESPONSE.format(root=project_root)],
+                                env=env, check=True, capture_output=True, text=True).stdout
+        total = time.perf_counter() - started
+        in_process = float(output.strip().splitlines()[-1])
+        return total * 1000, in_process * 1000
+
+
+def import_times(limit=15):
+    code = f'import sys; sys.path.insert(0, {project_root!r}); import app'
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, DB_PATH=os.path.join(workdir, 'travel.db'))
+        stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env,
+                                check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def summarize(samples):
+    # Nearest-rank p95, so with few runs it is the slowest run rather than one below it
+    samples = sorted(samples)
+    return statistics.median(samples), samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, help='exit non-zero if the snapshot p50 exceeds this')
+    parser.add_argument('--importtime', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        snapshot_path = os.path.join(workdir, 'snapshot.db')
+        subprocess.run([sys.executable, os.path.join(project_root, 'view_db.py'), 'snapshot', snapshot_path],
+                       check=True, capture_output=True)
+        results = {}
+        for label, path in (('no snapshot', os.path.join(workdir, 'missing.db')), ('snapshot', snapshot_path)):
+            runs = [cold_start(path) for _ in range(args.runs)]
+            total_p50, total_p95 = summarize([total for total, _ in runs])
+            app_p50, app_p95 = summarize([in_process for _, in_process in runs])
+            results[label] = total_p50
+            print(f'{label:<12} process start to first response p50 {total_p50:7.1f} ms  p95 {total_p95:7.1f} ms'
+                  f'   (import + first request p50 {app_p50:6.1f} ms  p95 {app_p95:6.1f} ms)')
+
+    if args.importtime:
+        print('\nSlowest imports (cumulative us, self us, module):')
+        for cumulative_us, self_us, name in import_times():
+            print(f'{cumulative_us:10} {self_us:10}  {name}')
+
+    if args.budget_ms is not None and results['snapshot'] > args.budget_ms:
+        print(f'Cold start p50 {results["snapshot"]:.1f} ms exceeds budget of {args.budget_ms:.1f} ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
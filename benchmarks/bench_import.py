@@ -0,0 +1,81 @@
+"""Throughput of the bulk destination import (view_db.py import / /admin/destinations/import).
+
+Writes --rows synthetic destinations to a CSV and an NDJSON file, then times
+importer.import_file for a fresh load, an identical re-import, a price-only
+update, and a description update (which re-indexes every row for search).
+For comparison, the same fresh load is also timed as a plain executemany
+upsert with the per-row catalog triggers left on.
+
+Usage: python benchmarks/bench_import.py [--rows N] [--chunk-size N]
+"""
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+
+from common import load_app, report
+
+
+def write_file(workdir, fmt, rows, variant, tag=None):
+    # Names carry a tag (the format by default) so each run starts with a fresh load
+    records = [{'name': f'Imported {tag or fmt} place {n}',
+                'description': f'A {variant["word"]} trip to imported place {n}.',
+                'price': 100 + n % 900 + variant['price'],
+                'image_url': f'https://images.example.com/{n}.jpg'} for n in range(rows)]
+    path = os.path.join(workdir, f'{variant["name"]}.{fmt}')
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+        else:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dreamtravels-import-')
+    app_module = load_app(os.path.join(workdir, 'travel.db'))
+    from importer import UPSERT_SQL, import_file, iter_records, validate
+
+    variants = [
+        ('fresh load', {'name': 'fresh', 'word': 'quiet', 'price': 0}),
+        ('identical re-import', {'name': 'fresh', 'word': 'quiet', 'price': 0}),
+        ('price update', {'name': 'prices', 'word': 'quiet', 'price': 5}),
+        ('description update', {'name': 'descriptions', 'word': 'lively', 'price': 5}),
+    ]
+    results = {}
+    with app_module.db_pool.connection() as conn:
+        for fmt in ('csv', 'ndjson'):
+            for label, variant in variants:
+                path = write_file(workdir, fmt, args.rows, variant)
+                started = time.perf_counter()
+                with open(path, 'rb') as f:
+                    result = import_file(conn, f, fmt, chunk_size=args.chunk_size)
+                elapsed = time.perf_counter() - started
+                results[f'{fmt} {label}'] = (f'{result.rows / elapsed:,.0f} rows/s '
+                                             f'({result.inserted} new, {result.updated} updated)')
+        conn.execute("INSERT INTO destination_fts (destination_fts) VALUES ('integrity-check')")
+
+        path = write_file(workdir, 'csv', args.rows, {**variants[0][1], 'name': 'baseline'}, tag='baseline')
+        started = time.perf_counter()
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = [validate(record) for _, record in iter_records(f, 'csv')]
+        for start in range(0, len(rows), args.chunk_size):
+            conn.executemany(UPSERT_SQL, rows[start:start + args.chunk_size])
+            conn.commit()
+        elapsed = time.perf_counter() - started
+    results['csv fresh load, plain executemany with triggers'] = f'{args.rows / elapsed:,.0f} rows/s'
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
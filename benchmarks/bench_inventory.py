@@ -0,0 +1,83 @@
+"""Concurrent checkouts competing for the same destination and travel date.
+
+Many threads check out one seat at a time on a single hot date until it
+sells out. The run fails if the seats sold differ from capacity (overselling
+or lost updates).
+
+Usage: python benchmarks/bench_inventory.py [--threads N] [--capacity N]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from common import load_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--capacity', type=int, default=2000)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    from inventory import SoldOut
+    from orders import create_order
+
+    app_module.db_pool.max_size = args.threads + 1
+    with app_module.db_pool.connection() as conn:
+        conn.execute('UPDATE destination SET capacity = ? WHERE id = 1', (args.capacity,))
+        conn.commit()
+
+    line = [{'destination_id': 1, 'quantity': 1, 'price': 1299.99, 'travel_date': '2027-07-14'}]
+    latencies = []
+    counts = {'orders': 0, 'sold_out': 0}
+    lock = threading.Lock()
+    start_gate = threading.Barrier(args.threads)
+
+    def worker():
+        local_latencies = []
+        orders = sold_out = 0
+        with app_module.db_pool.connection() as conn:
+            start_gate.wait()
+            while True:
+                started = time.perf_counter()
+                try:
+                    create_order(conn, 1, line, 'Credit Card')
+                    orders += 1
+                except SoldOut:
+                    sold_out += 1
+                    break
+                finally:
+                    local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            counts['orders'] += orders
+            counts['sold_out'] += sold_out
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app_module.db_pool.connection() as conn:
+        sold = conn.execute("SELECT sold FROM availability WHERE destination_id = 1 AND travel_date = '2027-07-14'"
+                            ).fetchone()[0]
+        items = conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM order_items WHERE travel_date = '2027-07-14'"
+                             ).fetchone()[0]
+
+    latencies.sort()
+    print(f'threads              {args.threads}')
+    print(f'checkouts/s          {counts["orders"] / elapsed:.1f}')
+    print(f'latency p50          {statistics.median(latencies) * 1000:.2f} ms')
+    print(f'latency p99          {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms')
+    print(f'capacity / sold      {args.capacity} / {sold} (order items {items})')
+    if sold != args.capacity or items != args.capacity or counts['orders'] != args.capacity:
+        raise SystemExit('Inventory mismatch: seats were oversold or updates were lost')
+
+
+if __name__ == '__main__':
+    main()
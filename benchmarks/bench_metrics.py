@@ -0,0 +1,100 @@
+"""Overhead of the /metrics instrumentation on home().
+
+Runs in one interpreter, switching the instrumentation (request hooks,
+template signals, SQL timing) on and off between batches, so process-to-
+process differences do not swamp a budget of a few percent. Every round
+runs one batch each of: without metrics, without metrics again (a control),
+and with metrics, in rotating order. The overhead of a round is measured
+against its own baseline batch. The median over the rounds is reported
+with its interquartile range, next to the control's, which is the noise
+floor of this machine: a budget below that spread cannot be checked.
+
+Usage: python benchmarks/bench_metrics.py [--requests N] [--rounds N] [--budget-percent P]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from flask import before_render_template, template_rendered
+
+from common import load_app
+
+MODES = (('baseline', False), ('control', False), ('metrics', True))
+
+
+def instrument(app_module, enabled):
+    # What Metrics.install() and app.py wire up, undone and redone in place
+    app, metrics, pool = app_module.app, app_module.metrics, app_module.db_pool
+    for funcs, hook in ((app.before_request_funcs.setdefault(None, []), metrics._before_request),
+                        (app.after_request_funcs.setdefault(None, []), metrics._after_request)):
+        if hook in funcs:
+            funcs.remove(hook)
+        if enabled:
+            funcs.append(hook)
+    for signal, receiver in ((before_render_template, metrics._before_render),
+                             (template_rendered, metrics._after_render)):
+        signal.disconnect(receiver, app)
+        if enabled:
+            signal.connect(receiver, app)
+    on_query = metrics.record_query if enabled else None
+    pool.on_query = on_query
+    for conn in pool._idle:
+        conn.on_query = on_query
+
+
+def per_request(client, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get('/')
+    return (time.perf_counter() - started) / requests
+
+
+def quartiles(values):
+    low, _, high = statistics.quantiles(values, n=4)
+    return low, high
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500, help='requests per batch')
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--budget-percent', type=float, default=2.0)
+    args = parser.parse_args()
+
+    os.environ['METRICS_ENABLED'] = '1'
+    app_module = load_app()
+    client = app_module.app.test_client()
+    for _, enabled in MODES:
+        instrument(app_module, enabled)
+        per_request(client, args.requests)
+
+    timings = {name: [] for name, _ in MODES}
+    for round_number in range(args.rounds):
+        shift = round_number % len(MODES)
+        for name, enabled in MODES[shift:] + MODES[:shift]:
+            instrument(app_module, enabled)
+            timings[name].append(per_request(client, args.requests))
+    instrument(app_module, True)
+
+    baseline = timings['baseline']
+    overheads = {name: [(value - base) / base * 100 for value, base in zip(timings[name], baseline)]
+                 for name in ('control', 'metrics')}
+    for name, _ in MODES:
+        print(f'home() {name:<10} median {statistics.median(timings[name]) * 1e6:7.1f} us/request')
+    for name, label in (('control', 'noise (control)'), ('metrics', 'overhead')):
+        low, high = quartiles(overheads[name])
+        print(f'{label:<17} median {statistics.median(overheads[name]):+6.2f}%  '
+              f'IQR {low:+6.2f}% .. {high:+6.2f}%  over {args.rounds} rounds')
+
+    overhead = statistics.median(overheads['metrics'])
+    noise_low, noise_high = quartiles(overheads['control'])
+    print(f'budget            {args.budget_percent}%')
+    if noise_high - noise_low > args.budget_percent:
+        print('The control spread is wider than the budget; use more --requests or --rounds on a quieter machine')
+    if overhead > args.budget_percent:
+        raise SystemExit('Instrumentation overhead is over budget')
+
+
+if __name__ == '__main__':
+    main()
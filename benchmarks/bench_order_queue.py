@@ -0,0 +1,90 @@
+"""Checkout latency under concurrency: direct transactions versus the order queue.
+
+--threads workers each place --orders single-line orders. "direct" commits
+each order with create_order() on a pooled connection. The queue variants
+return once the order is journaled: "fsync per order" writes and fsyncs
+every line under one lock, as the queue did before group commit, while
+"group commit" shares one fsync among every submit waiting at the time.
+
+Usage: python benchmarks/bench_order_queue.py [--threads N] [--orders N]
+"""
+import argparse
+import os
+import threading
+import time
+
+from common import load_app, report
+
+
+def latencies(threads, orders, place_order):
+    results = []
+    lock = threading.Lock()
+
+    def worker(n):
+        mine = []
+        for i in range(orders):
+            started = time.perf_counter()
+            place_order(n, i)
+            mine.append(time.perf_counter() - started)
+        with lock:
+            results.extend(mine)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    results.sort()
+    return (f'{len(results) / elapsed:8.0f} orders/s, p50 {results[len(results) // 2] * 1000:6.2f} ms, '
+            f'p99 {results[int(len(results) * 0.99)] * 1000:6.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--orders', type=int, default=50, help='orders per thread')
+    args = parser.parse_args()
+
+    app_module = load_app()
+    from order_queue import OrderQueue
+    from orders import create_order, generate_order_number
+
+    with app_module.db_pool.connection() as conn:
+        conn.execute('UPDATE destination SET capacity = 1000000000')
+        conn.commit()
+    cart_items = [{'destination_id': 1, 'quantity': 1, 'price': 999.99, 'travel_date': '2027-06-01'}]
+
+    def direct(n, i):
+        with app_module.db_pool.connection() as conn:
+            create_order(conn, 1, cart_items, 'Credit Card')
+
+    def queued(order_queue):
+        def submit(n, i):
+            order_queue.submit({'order_number': generate_order_number(), 'user_id': 1, 'cart_id': None,
+                                'payment_method': 'Credit Card', 'cart_items': cart_items})
+        return submit
+
+    class FsyncPerOrder(OrderQueue):
+        # The journal before group commit: one write and fsync per order, serialized
+        _lock = threading.Lock()
+
+        def _journal(self, order_number, line):
+            with self._lock:
+                self._append([(order_number, line)])
+            with self._journal_cond:
+                self._outstanding[order_number] = line
+
+    workdir = os.path.dirname(app_module.DB_PATH)
+    report({
+        'direct transaction': latencies(args.threads, args.orders, direct),
+        'queue, fsync per order': latencies(args.threads, args.orders, queued(
+            FsyncPerOrder(app_module.db_pool, os.path.join(workdir, 'per-order.journal'), max_depth=10 ** 6))),
+        'queue, group commit': latencies(args.threads, args.orders, queued(
+            OrderQueue(app_module.db_pool, os.path.join(workdir, 'group.journal'), max_depth=10 ** 6))),
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Logins per second per core for each password hashing cost setting.
+
+Each setting hashes once and then verifies repeatedly on a single thread,
+which is what one login costs a core.
+
+Usage: python benchmarks/bench_passwords.py [--seconds N]
+"""
+import argparse
+import hashlib
+import time
+
+import common  # noqa: F401  (puts the project root on sys.path)
+from passwords import LegacySHA256Hasher, PBKDF2Hasher, ScryptHasher
+
+SETTINGS = [
+    ('sha256 (legacy)', LegacySHA256Hasher()),
+    ('scrypt n=2^13 r=8', ScryptHasher(n=2 ** 13)),
+    ('scrypt n=2^14 r=8 (default)', ScryptHasher(n=2 ** 14)),
+    ('scrypt n=2^15 r=8', ScryptHasher(n=2 ** 15)),
+    ('pbkdf2 100k', PBKDF2Hasher(iterations=100000)),
+    ('pbkdf2 600k', PBKDF2Hasher(iterations=600000)),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+
+    for name, hasher in SETTINGS:
+        if isinstance(hasher, LegacySHA256Hasher):
+            encoded = hashlib.sha256(b'correct horse').hexdigest()
+        else:
+            encoded = hasher.encode('correct horse')
+        count = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < args.seconds:
+            assert hasher.verify('correct horse', encoded)
+            count += 1
+        elapsed = time.perf_counter() - started
+        print(f'{name:<30} {count / elapsed:12.1f} logins/s/core  {elapsed / count * 1000:8.2f} ms/login')
+
+
+if __name__ == '__main__':
+    main()
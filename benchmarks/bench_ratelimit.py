@@ -0,0 +1,68 @@
+"""Cost of the login/signup rate limiter per request.
+
+Times a single token-bucket check for the in-memory and SQLite stores, for
+keys that are allowed and keys already rejected. It then compares POST /login
+through the test client in three cases: a failed login that passes the
+limiter, the same with the limiter off, and a request the limiter rejects.
+
+Usage: python benchmarks/bench_ratelimit.py [--iterations N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import load_app, report
+
+
+def per_call(fn, iterations):
+    started = time.perf_counter()
+    for n in range(iterations):
+        fn(n)
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    from db import ConnectionPool
+    from ratelimit import MemoryRateLimitStore, SQLiteRateLimitStore
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='dreamtravels-ratelimit-')
+    stores = {
+        'memory': MemoryRateLimitStore(),
+        'sqlite': SQLiteRateLimitStore(ConnectionPool(os.path.join(workdir, 'ratelimit.db'))),
+    }
+    for name, store in stores.items():
+        # Distinct keys are always allowed; one hot key is rejected after its burst
+        allowed = per_call(lambda n: store.take(f'login:ip:10.0.{n // 256}.{n % 256}', 20, 60), args.iterations)
+        rejected = per_call(lambda n: store.take('login:ip:10.1.0.1', 20, 60), args.iterations)
+        results[f'{name} store, allowed'] = f'{allowed * 1e6:.1f} us/check'
+        results[f'{name} store, rejected'] = f'{rejected * 1e6:.1f} us/check'
+
+    client = app_module.app.test_client()
+    requests = max(args.iterations // 100, 20)
+    form = {'username': 'admin', 'password': 'wrong password'}
+
+    def failed_login(n):
+        # A fresh client address and username each time so no bucket fills up
+        client.post('/login', data=dict(form, username=f'user{n}'), environ_base={'REMOTE_ADDR': f'10.2.{n // 256}.{n % 256}'})
+
+    results['POST /login, failed, limiter on'] = f'{per_call(failed_login, requests) * 1000:.2f} ms/request'
+    limiter = app_module.rate_limiter
+    app_module.rate_limiter = None
+    results['POST /login, failed, limiter off'] = f'{per_call(failed_login, requests) * 1000:.2f} ms/request'
+    app_module.rate_limiter = limiter
+    for _ in range(30):
+        client.post('/login', data=form)
+    rejected = per_call(lambda n: client.post('/login', data=form), requests)
+    results['POST /login, rejected (429)'] = f'{rejected * 1000:.2f} ms/request'
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""Load test of the main user flows, through the Flask test client and a real WSGI server.
+
+Seeds a synthetic database (--destinations, --users, --orders), then runs
+--clients virtual users concurrently. Each logs in once and repeats
+browse -> search -> detail -> add to cart -> cart -> checkout; one extra
+client walks the admin pages. Prints JSON with requests/second and
+p50/p95/p99 per route for each driver, so runs can be diffed across commits.
+Everything runs offline on localhost.
+
+Usage: python benchmarks/bench_routes.py [--driver test-client|wsgi|both] [--clients N]
+           [--iterations N] [--destinations N] [--users N] [--orders N] [--db PATH] [--output FILE]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from common import load_app, project_root
+
+USER_PASSWORD = 'loadtest'
+SEARCH_TERMS = ['paris', 'beach', 'island', 'tok', 'new york', 'temple', 'mountain', 'ba']
+WORDS = ['Coast', 'Island', 'Old Town', 'Valley', 'Harbor', 'Highlands', 'Lakes', 'Desert', 'Temple', 'Canyon']
+PLACES = ['Paris', 'Bali', 'Tokyo', 'Santorini', 'York', 'Lisbon', 'Cusco', 'Kyoto', 'Havana', 'Petra']
+
+
+def seed(app_module, destinations, users, orders, rng):
+    """Top the sample data up to the requested scale; returns (destination ids, usernames)."""
+    from db import write_transaction
+    from orders import generate_order_number, insert_order
+
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    password = app_module.hash_password(USER_PASSWORD)
+    with app_module.db_pool.connection() as conn:
+        existing = conn.execute('SELECT COUNT(*) FROM destination').fetchone()[0]
+        conn.executemany('INSERT INTO destination (name, description, price, image_url) VALUES (?, ?, ?, ?)',
+                         [(f'{rng.choice(WORDS)} of {rng.choice(PLACES)} {n}',
+                           f'A synthetic {rng.choice(WORDS).lower()} trip near {rng.choice(PLACES)}.',
+                           round(rng.uniform(300, 5000), 2), '')
+                          for n in range(existing, destinations)])
+        # Load tests must measure the routes, not run out of seats
+        conn.execute('UPDATE destination SET capacity = 1000000000')
+        conn.executemany('''INSERT OR IGNORE INTO user (username, email, password, is_admin, created_at)
+                            VALUES (?, ?, ?, 0, ?)''',
+                         [(f'load{n}', f'load{n}@example.com', password, now) for n in range(users)])
+        conn.commit()
+        destination_rows = conn.execute('SELECT id, price FROM destination').fetchall()
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM user WHERE username LIKE 'load%'")]
+
+        existing = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+        for start in range(existing, orders, 1000):
+            with write_transaction(conn):
+                for _ in range(start, min(start + 1000, orders)):
+                    items = []
+                    for destination_id, price in rng.sample(destination_rows, rng.randint(1, 3)):
+                        travel_date = (datetime(2027, 1, 1) + timedelta(days=rng.randrange(365))).strftime('%Y-%m-%d')
+                        items.append({'destination_id': destination_id, 'quantity': rng.randint(1, 4),
+                                      'price': price, 'travel_date': travel_date})
+                    insert_order(conn, rng.choice(user_ids), items, rng.choice(['Credit Card', 'PayPal']),
+                                 generate_order_number())
+    app_module.catalog.invalidate()
+    return [row[0] for row in destination_rows], [f'load{n}' for n in range(users)]
+
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code
+
+
+class HTTPDriver:
+    """Keep-alive HTTP/1.1 client that carries cookies between requests."""
+
+    def __init__(self, host, port):
+        self.conn = http.client.HTTPConnection(host, port, timeout=60)
+        self.cookies = {}
+
+    def request(self, method, path, data=None):
+        headers = {}
+        body = None
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        response.read()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def timed(self, driver, route, method, path, data=None):
+        started = time.perf_counter()
+        try:
+            status = driver.request(method, path, data)
+        except Exception:
+            status = 599
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies.setdefault(route, []).append(elapsed)
+            if status >= 400:
+                self.errors[route] = self.errors.get(route, 0) + 1
+        return status
+
+
+def shopper(driver, recorder, username, destination_ids, iterations, rng):
+    recorder.timed(driver, 'login', 'POST', '/login', {'username': username, 'password': USER_PASSWORD})
+    for _ in range(iterations):
+        destination_id = rng.choice(destination_ids)
+        travel_date = (datetime(2027, 1, 1) + timedelta(days=rng.randrange(365))).strftime('%Y-%m-%d')
+        recorder.timed(driver, 'home', 'GET', '/')
+        recorder.timed(driver, 'search', 'GET', '/search?' + urlencode({'q': rng.choice(SEARCH_TERMS)}))
+        recorder.timed(driver, 'suggest', 'GET', '/api/suggest?' + urlencode({'q': rng.choice(SEARCH_TERMS)[:2]}))
+        recorder.timed(driver, 'destination_detail', 'GET', f'/destination/{destination_id}')
+        recorder.timed(driver, 'add_to_cart', 'POST', f'/add-to-cart/{destination_id}',
+                       {'travel_date': travel_date, 'quantity': rng.randint(1, 3)})
+        recorder.timed(driver, 'cart', 'GET', '/cart')
+        recorder.timed(driver, 'checkout', 'POST', '/checkout', {'payment_method': 'Credit Card'})
+
+
+def administrator(driver, recorder, iterations):
+    recorder.timed(driver, 'login', 'POST', '/login', {'username': 'admin', 'password': 'admin123'})
+    for _ in range(iterations):
+        recorder.timed(driver, 'admin', 'GET', '/admin')
+        recorder.timed(driver, 'admin_reports', 'GET', '/admin/reports')
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def run(make_driver, usernames, destination_ids, clients, iterations, seed_value):
+    recorder = Recorder()
+    threads = [threading.Thread(target=shopper, args=(make_driver(), recorder, usernames[n % len(usernames)],
+                                                      destination_ids, iterations, random.Random(seed_value + n)))
+               for n in range(clients)]
+    threads.append(threading.Thread(target=administrator, args=(make_driver(), recorder, iterations)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for route, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        routes[route] = {
+            'requests': len(latencies),
+            'errors': recorder.errors.get(route, 0),
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        }
+    total = sum(route['requests'] for route in routes.values())
+    return {'elapsed_seconds': round(elapsed, 2), 'requests': total, 'rps': round(total / elapsed, 1),
+            'routes': routes}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--driver', choices=['test-client', 'wsgi', 'both'], default='both')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent shoppers (plus one admin)')
+    parser.add_argument('--iterations', type=int, default=25, help='flows per client')
+    parser.add_argument('--destinations', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', help='database to seed and reuse (default: a temp file)')
+    parser.add_argument('--output', '-o', help='write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='dreamtravels-load-'), 'travel.db')
+    # Every virtual user logs in from 127.0.0.1, which the login rate limiter would throttle
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    app_module = load_app(db_path)
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    destination_ids, usernames = seed(app_module, args.destinations, args.users, args.orders, rng)
+    seed_seconds = time.perf_counter() - started
+    app_module.db_pool.max_size = max(app_module.db_pool.max_size, args.clients + 4)
+
+    report = {
+        'commit': git_commit(),
+        'config': {key: getattr(args, key) for key in ('clients', 'iterations', 'destinations', 'users',
+                                                       'orders', 'seed')},
+        'seed_seconds': round(seed_seconds, 2),
+        'drivers': {},
+    }
+    if args.driver in ('test-client', 'both'):
+        report['drivers']['test-client'] = run(lambda: TestClientDriver(app_module.app), usernames,
+                                               destination_ids, args.clients, args.iterations, args.seed)
+    if args.driver in ('wsgi', 'both'):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        server = make_server('127.0.0.1', 0, app_module.app, threaded=True, request_handler=QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            report['drivers']['wsgi'] = run(lambda: HTTPDriver('127.0.0.1', server.server_port), usernames,
+                                            destination_ids, args.clients, args.iterations, args.seed)
+        finally:
+            server.shutdown()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Search and typeahead latency over a large synthetic catalog.
+
+Seeds --destinations rows (the FTS index is filled by its triggers), then
+times /search-style BM25 queries and /api/suggest prefix lookups.
+
+Usage: python benchmarks/bench_search.py [--destinations N] [--queries N]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from common import load_app
+
+PLACES = ['Paris', 'Bali', 'Tokyo', 'Santorini', 'York', 'Lisbon', 'Cusco', 'Kyoto', 'Reykjavik',
+          'Marrakesh', 'Havana', 'Queenstown', 'Dubrovnik', 'Banff', 'Zanzibar', 'Petra']
+WORDS = ['beach', 'mountain', 'island', 'temple', 'old', 'town', 'lake', 'desert', 'harbor', 'valley',
+         'castle', 'market', 'volcano', 'river', 'forest', 'coast', 'canyon', 'glacier', 'vineyard', 'reef']
+
+
+def percentile(latencies, fraction):
+    return latencies[max(int(len(latencies) * fraction) - 1, 0)] * 1000
+
+
+def timed(fn, queries):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--destinations', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    from search import search_destinations
+
+    rng = random.Random(42)
+    rows = []
+    for n in range(args.destinations):
+        place = rng.choice(PLACES)
+        words = rng.sample(WORDS, 3)
+        rows.append((f'{words[0].title()} {place} {n}', f'A {words[1]} and {words[2]} escape near {place}.',
+                     round(rng.uniform(300, 5000), 2), ''))
+
+    with app_module.db_pool.connection() as conn:
+        started = time.perf_counter()
+        conn.executemany('INSERT INTO destination (name, description, price, image_url) VALUES (?, ?, ?, ?)',
+                         rows)
+        conn.commit()
+        seeded = time.perf_counter() - started
+        app_module.catalog.invalidate()
+
+        search_queries = [' '.join(rng.sample(WORDS + PLACES, rng.choice([1, 2]))) for _ in range(args.queries)]
+        suggest_queries = [rng.choice(WORDS + PLACES)[:rng.randint(1, 4)] for _ in range(args.queries)]
+
+        started = time.perf_counter()
+        app_module.suggest_index.suggest(conn, 'a')
+        index_build = time.perf_counter() - started
+
+        search = timed(lambda q: search_destinations(conn, q, page=rng.randint(1, 5)), search_queries)
+        suggest = timed(lambda q: app_module.suggest_index.suggest(conn, q), suggest_queries)
+
+    print(f'destinations         {args.destinations}')
+    print(f'seed + fts index     {seeded:.2f} s')
+    print(f'prefix index build   {index_build * 1000:.0f} ms')
+    print(f'search p50 / p99     {statistics.median(search) * 1000:.2f} / {percentile(search, 0.99):.2f} ms')
+    print(f'suggest p50 / p99    {statistics.median(suggest) * 1000:.3f} / {percentile(suggest, 0.99):.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Template cost of destination cards, with and without the fragment cache.
+
+Renders --cards synthetic destinations the old way (an include per card)
+and through FragmentCache, cold (first render of a generation) and warm.
+Also times compiling every template in a fresh Jinja environment with an
+empty and a warm FileSystemBytecodeCache, which is what a new process pays.
+
+Usage: python benchmarks/bench_templates.py [--cards N] [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from common import load_app, project_root
+
+
+def best(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), statistics.median(timings)
+
+
+def compile_all(bytecode_cache):
+    from jinja2 import Environment, FileSystemLoader
+    env = Environment(loader=FileSystemLoader(os.path.join(project_root, 'templates')),
+                      bytecode_cache=bytecode_cache)
+    for name in env.list_templates():
+        env.get_template(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cards', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    app = app_module.app
+    destinations = [{'id': n, 'name': f'Destination {n}', 'price': 1000 + n,
+                     'description': 'A long description of a wonderful place to visit. ' * 4,
+                     'image_url': f'https://images.example.com/{n}.jpg'} for n in range(1, args.cards + 1)]
+    included = app.jinja_env.from_string(
+        "{% for destination in destinations %}{% include '_destination_card.html' %}{% endfor %}")
+    fragmented = app.jinja_env.from_string(
+        "{% for destination in destinations %}{{ fragment('_destination_card.html', destination) }}{% endfor %}")
+    cache = app_module.fragment_cache
+
+    def cold():
+        cache.purge()
+        fragmented.render(destinations=destinations)
+
+    per_thousand = 1000 / args.cards
+    with app.test_request_context('/'):
+        results = {
+            'include per card': best(lambda: included.render(destinations=destinations), args.repeat),
+            'fragment cache, cold': best(cold, args.repeat),
+            'fragment cache, warm': best(lambda: fragmented.render(destinations=destinations), args.repeat),
+        }
+    print(f'render time per 1,000 cards ({args.cards} cards, best / median of {args.repeat})')
+    for name, (fastest, median) in results.items():
+        print(f'  {name:<22} {fastest * 1000 * per_thousand:8.2f} / {median * 1000 * per_thousand:8.2f} ms')
+
+    from jinja2 import FileSystemBytecodeCache
+    with tempfile.TemporaryDirectory() as cache_dir:
+        without = best(lambda: compile_all(None), 5)[0]
+        compile_all(FileSystemBytecodeCache(cache_dir))
+        warm = best(lambda: compile_all(FileSystemBytecodeCache(cache_dir)), 5)[0]
+    print('compile every template in a new environment')
+    print(f'  no bytecode cache      {without * 1000:8.2f} ms')
+    print(f'  warm bytecode cache    {warm * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+def load_app(db_path=None):
+    # DB_PATH is read when app.py is imported, so it must be set first
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='dreamtravels-bench-'), 'travel.db')
+    os.environ['DB_PATH'] = db_path
+    import app as app_module
+    app_module.init_db()
+    app_module.add_sample_destinations()
+    app_module.add_admin_user()
+    return app_module
+
+
+def report(results):
+    width = max(len(name) for name in results)
+    for name, value in results.items():
+        print(f'{name:<{width}}  {value}')
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Server-side carts keyed by an opaque cart id kept in the session cookie.
+# A cart is a dict of lines keyed by (destination_id, travel_date), so adding
+# the same trip twice merges into one line in O(1).
+
+
+class MemoryCartStore:
+    """Per-process LRU of carts. Fast, but carts are lost on restart."""
+
+    def __init__(self, max_carts=10000, ttl=7 * 24 * 3600):
+        self.max_carts = max_carts
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._carts = OrderedDict()
+
+    def _get(self, cart_id):
+        entry = self._carts.get(cart_id)
+        if entry is None:
+            return None
+        expires_at, lines = entry
+        if expires_at < time.time():
+            del self._carts[cart_id]
+            return None
+        return lines
+
+    def _touch(self, cart_id, lines):
+        self._carts[cart_id] = (time.time() + self.ttl, lines)
+        self._carts.move_to_end(cart_id)
+        while len(self._carts) > self.max_carts:
+            self._carts.popitem(last=False)
+
+    def load(self, cart_id):
+        with self._lock:
+            lines = self._get(cart_id) or {}
+            return OrderedDict((key, dict(line)) for key, line in lines.items())
+
+    def add(self, cart_id, line):
+        key = (line['destination_id'], line['travel_date'])
+        with self._lock:
+            lines = self._get(cart_id)
+            if lines is None:
+                lines = OrderedDict()
+            if key in lines:
+                lines[key]['quantity'] += line['quantity']
+            else:
+                lines[key] = dict(line)
+            self._touch(cart_id, lines)
+
+    def remove(self, cart_id, key):
+        with self._lock:
+            lines = self._get(cart_id)
+            if lines is not None:
+                lines.pop(key, None)
+                self._touch(cart_id, lines)
+
+    def clear(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+
+class SQLiteCartStore:
+    """Carts in the cart_lines table, shared by every worker process."""
+
+    def __init__(self, get_conn, ttl=7 * 24 * 3600, purge_interval=3600):
+        self.get_conn = get_conn
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+
+    def load(self, cart_id):
+        # A stable order: the cart page removes lines by their position
+        rows = self.get_conn().execute('''SELECT destination_id, travel_date, quantity, price
+                                          FROM cart_lines
+                                          WHERE cart_id = ? AND updated_at >= ?
+                                          ORDER BY destination_id, travel_date''',
+                                       (cart_id, time.time() - self.ttl))
+        return OrderedDict(((row['destination_id'], row['travel_date']), dict(row)) for row in rows)
+
+    def add(self, cart_id, line):
+        conn = self.get_conn()
+        now = time.time()
+        conn.execute('''INSERT INTO cart_lines
+                        (cart_id, destination_id, travel_date, quantity, price, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (cart_id, destination_id, travel_date)
+                        DO UPDATE SET quantity = quantity + excluded.quantity,
+                                      updated_at = excluded.updated_at''',
+                     (cart_id, line['destination_id'], line['travel_date'], line['quantity'],
+                      line['price'], now))
+        # Keep the whole cart alive, not just the line that changed
+        conn.execute('UPDATE cart_lines SET updated_at = ? WHERE cart_id = ?', (now, cart_id))
+        if now - self._last_purge > self.purge_interval:
+            self._last_purge = now
+            conn.execute('DELETE FROM cart_lines WHERE updated_at < ?', (now - self.ttl,))
+        conn.commit()
+
+    def remove(self, cart_id, key):
+        conn = self.get_conn()
+        conn.execute('DELETE FROM cart_lines WHERE cart_id = ? AND destination_id = ? AND travel_date = ?',
+                     (cart_id,) + tuple(key))
+        conn.commit()
+
+    def clear(self, cart_id):
+        conn = self.get_conn()
+        conn.execute('DELETE FROM cart_lines WHERE cart_id = ?', (cart_id,))
+        conn.commit()
@@ -0,0 +1,169 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CatalogCache:
+    """In-process cache of the destination table keyed by destination id.
+
+    The cache is dropped when an admin write calls ``invalidate()``, when the
+    TTL runs out, or when another process bumps ``catalog_meta.version``
+    (noticed cheaply through ``PRAGMA data_version`` on a watcher connection).
+    """
+
+    def __init__(self, path, max_entries=5000, ttl=300, check_interval=1.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._all_ids = None
+        self._loaded_at = time.monotonic()
+        self._watch_conn = None
+        self._data_version = None
+        self._db_version = None
+        self._last_check = 0.0
+        # Bumped on every invalidation; other caches key their entries on it
+        self.generation = 0
+        self.changed_at = time.time()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def _clear(self):
+        self._entries.clear()
+        self._all_ids = None
+        self._loaded_at = time.monotonic()
+        self.generation += 1
+        self.changed_at = time.time()
+        self._invalidations += 1
+
+    def _watcher(self):
+        if self._watch_conn is None:
+            self._watch_conn = sqlite3.connect(self.path, check_same_thread=False)
+        return self._watch_conn
+
+    def _check(self):
+        now = time.monotonic()
+        if now - self._loaded_at > self.ttl:
+            self._clear()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            watcher = self._watcher()
+            data_version = watcher.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+            db_version = watcher.execute('SELECT version FROM catalog_meta').fetchone()[0]
+        except sqlite3.Error:
+            return
+        if db_version != self._db_version:
+            if self._db_version is not None:
+                self._clear()
+            self._db_version = db_version
+
+    def current_generation(self):
+        with self._lock:
+            self._check()
+            return self.generation
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+            # Force the next access to re-read the database version
+            self._last_check = 0.0
+            self._data_version = None
+
+    def _store(self, generation, rows):
+        if generation != self.generation:
+            return
+        for row in rows:
+            self._entries[row['id']] = row
+            self._entries.move_to_end(row['id'])
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._all_ids = None
+
+    def all(self, conn):
+        with self._lock:
+            self._check()
+            if self._all_ids is not None:
+                self._hits += 1
+                return [self._entries[id] for id in self._all_ids]
+            self._misses += 1
+            generation = self.generation
+
+        rows = [dict(row) for row in conn.execute('SELECT * FROM destination ORDER BY id')]
+
+        with self._lock:
+            if generation == self.generation and len(rows) <= self.max_entries:
+                self._entries.clear()
+                self._store(generation, rows)
+                self._all_ids = [row['id'] for row in rows]
+        return rows
+
+    def get(self, conn, id):
+        with self._lock:
+            self._check()
+            destination = self._entries.get(id)
+            if destination is not None or self._all_ids is not None:
+                # With the whole catalog loaded, a missing id simply does not exist
+                self._hits += 1
+                if destination is not None:
+                    self._entries.move_to_end(id)
+                return destination
+            self._misses += 1
+            generation = self.generation
+
+        row = conn.execute('SELECT * FROM destination WHERE id = ?', (id,)).fetchone()
+        if row is None:
+            return None
+        destination = dict(row)
+        with self._lock:
+            self._store(generation, [destination])
+        return destination
+
+    def get_many(self, conn, ids):
+        # Returns {id: destination} for the ids that exist, in at most one query per chunk
+        found = {}
+        with self._lock:
+            self._check()
+            missing = []
+            for id in ids:
+                destination = self._entries.get(id)
+                if destination is not None:
+                    found[id] = destination
+                elif self._all_ids is None:
+                    missing.append(id)
+            if not missing:
+                self._hits += 1
+                return found
+            self._misses += 1
+            generation = self.generation
+
+        rows = []
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            rows.extend(dict(row) for row in conn.execute(
+                f'SELECT * FROM destination WHERE id IN ({placeholders})', chunk))
+        with self._lock:
+            self._store(generation, rows)
+        for row in rows:
+            found[row['id']] = row
+        return found
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'invalidations': self._invalidations,
+                'entries': len(self._entries),
+                'complete': self._all_ids is not None,
+                'generation': self.generation,
+            }
@@ -0,0 +1,122 @@
+import bisect
+import hashlib
+import json
+import threading
+
+# JSON for the /api/v1 catalog endpoints. Each destination is encoded once
+# per catalog generation and field selection, and whole responses are kept
+# too, so a repeat request is a dict lookup and the body is sent as-is.
+
+FIELDS = ('id', 'name', 'description', 'price', 'image_url', 'capacity')
+
+
+def parse_fields(value):
+    """Turn ``"name,price"`` into a tuple of known fields (id always first), or raise ValueError."""
+    if not value:
+        return FIELDS
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    return tuple(field for field in FIELDS if field == 'id' or field in requested)
+
+
+class CatalogJSON:
+    """Encoded destinations and responses, dropped whenever the catalog generation changes."""
+
+    def __init__(self, catalog, max_responses=1024, max_field_sets=16):
+        self.catalog = catalog
+        self.max_responses = max_responses
+        self.max_field_sets = max_field_sets
+        self._lock = threading.Lock()
+        self._generation = None
+        self._ids = None
+        self._items = {}
+        self._responses = {}
+        self._hits = 0
+        self._misses = 0
+
+    def _reset(self, generation):
+        # Called with the lock held
+        if generation != self._generation:
+            self._generation = generation
+            self._ids = None
+            self._items.clear()
+            self._responses.clear()
+
+    def _encoded(self, conn, generation, fields):
+        # Returns (sorted ids, {id: encoded destination}) for this generation
+        with self._lock:
+            self._reset(generation)
+            items = self._items.get(fields)
+            if items is not None:
+                return self._ids, items
+        destinations = self.catalog.all(conn)
+        ids = [destination['id'] for destination in destinations]
+        items = {destination['id']: json.dumps({field: destination[field] for field in fields},
+                                               separators=(',', ':')).encode()
+                 for destination in destinations}
+        with self._lock:
+            if generation == self._generation:
+                if len(self._items) >= self.max_field_sets:
+                    self._items.clear()
+                self._ids = ids
+                self._items[fields] = items
+        return ids, items
+
+    def _respond(self, key, generation, build):
+        with self._lock:
+            self._reset(generation)
+            response = self._responses.get(key)
+            if response is not None:
+                self._hits += 1
+                return response
+            self._misses += 1
+        body = build()
+        response = (body, hashlib.sha1(body).hexdigest())
+        with self._lock:
+            if generation == self._generation:
+                if len(self._responses) >= self.max_responses:
+                    self._responses.pop(next(iter(self._responses)))
+                self._responses[key] = response
+        return response
+
+    def page(self, conn, fields, after=0, limit=50):
+        """One page of destinations with id > ``after``; returns (body, etag)."""
+        generation = self.catalog.current_generation()
+
+        def build():
+            ids, items = self._encoded(conn, generation, fields)
+            start = bisect.bisect_right(ids, after)
+            page_ids = ids[start:start + limit]
+            next_cursor = str(page_ids[-1]) if start + limit < len(ids) else None
+            return (b'{"destinations":[' + b','.join(items[id] for id in page_ids) +
+                    b'],"next_cursor":' + json.dumps(next_cursor).encode() + b'}')
+
+        return self._respond(('page', fields, after, limit), generation, build)
+
+    def batch(self, conn, fields, ids):
+        """The destinations with these ids, in the order asked; unknown ids are listed as missing."""
+        generation = self.catalog.current_generation()
+
+        def build():
+            _, items = self._encoded(conn, generation, fields)
+            found = [items[id] for id in ids if id in items]
+            missing = [id for id in ids if id not in items]
+            return (b'{"destinations":[' + b','.join(found) + b'],"missing":' +
+                    json.dumps(missing).encode() + b'}')
+
+        return self._respond(('batch', fields, tuple(ids)), generation, build)
+
+    def purge(self):
+        with self._lock:
+            self._reset(None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'responses': len(self._responses),
+                'field_sets': len(self._items),
+            }
@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# PRAGMAs applied once to every new connection handed out by the pool
+DEFAULT_PRAGMAS = (
+    # Only takes effect on a new, empty database, and only before journal_mode is set
+    ('auto_vacuum', 'INCREMENTAL'),
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -16000),  # negative value means KiB, so ~16 MB per connection
+    ('busy_timeout', 5000),
+    ('temp_store', 'MEMORY'),
+)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection(sqlite3.Connection):
+    # Shared by every connection of one pool; see write_transaction()
+    write_lock = None
+    # Called as on_query(sql, seconds) after each statement when set (see metrics.py)
+    on_query = None
+
+    def execute(self, sql, parameters=()):
+        if self.on_query is None:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.on_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, parameters):
+        if self.on_query is None:
+            return super().executemany(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            self.on_query(sql, time.perf_counter() - started)
+
+
+@contextmanager
+def write_transaction(conn):
+    """Run a BEGIN IMMEDIATE transaction, committing on success.
+
+    Writers from the same pool queue on a Python lock first. Waiters are then
+    woken as soon as the previous writer commits, instead of sleeping in
+    SQLite's busy handler, which turns hot-row contention into a lock convoy.
+    """
+    with getattr(conn, 'write_lock', None) or nullcontext():
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+class ConnectionPool:
+    """A bounded pool of SQLite connections shared between worker threads.
+
+    Connections are created lazily up to ``max_size`` and reused LIFO so the
+    hottest connection (with the warmest page cache) is handed out first.
+    """
+
+    def __init__(self, path, max_size=16, timeout=10.0, pragmas=DEFAULT_PRAGMAS, on_query=None):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self.on_query = on_query
+        self._cond = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._pid = os.getpid()
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self.write_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               factory=PooledConnection)
+        conn.write_lock = self.write_lock
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f'PRAGMA {name} = {value}')
+        conn.on_query = self.on_query
+        return conn
+
+    def _check_fork(self):
+        # Connections must never be shared across a fork (e.g. gunicorn --preload)
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._size = 0
+            self.write_lock = threading.Lock()
+
+    def acquire(self):
+        with self._cond:
+            self._check_fork()
+            if self._idle:
+                self._hits += 1
+                return self._idle.pop()
+            if self._size >= self.max_size:
+                self._waits += 1
+                started = time.perf_counter()
+                deadline = started + self.timeout
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        self._wait_time += time.perf_counter() - started
+                        raise PoolTimeout(f'No database connection available after {self.timeout}s')
+                    self._cond.wait(remaining)
+                self._wait_time += time.perf_counter() - started
+                if self._idle:
+                    self._hits += 1
+                    return self._idle.pop()
+            self._size += 1
+            self._misses += 1
+
+        # Open the new connection outside the lock so other threads are not blocked on it
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'waits': self._waits,
+                'wait_time_seconds': self._wait_time,
+                'timeouts': self._timeouts,
+            }
@@ -0,0 +1,63 @@
+import csv
+import io
+import itertools
+import json
+
+from archive import ARCHIVED, each_partition
+
+# Exportable datasets: name -> (table, columns). Password hashes are never exported.
+EXPORTS = {
+    'orders': ('orders', ('id', 'user_id', 'order_number', 'total_amount', 'payment_method', 'status',
+                          'created_at')),
+    'bookings': ('booking', ('id', 'name', 'email', 'destination_id', 'travel_date', 'created_at')),
+    'users': ('user', ('id', 'username', 'email', 'is_admin', 'created_at')),
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def iter_rows(conn, name, since=None, chunk_size=1000, archive_dir=None):
+    # Yields lists of row tuples so memory stays flat regardless of table size.
+    # Archived tables are read from each partition in ``archive_dir`` first, oldest first.
+    table, columns = EXPORTS[name]
+    sql = f'SELECT {", ".join(columns)} FROM {{schema}}.{table}'
+    params = ()
+    if since:
+        sql += ' WHERE created_at >= ?'
+        params = (since,)
+    schemas = ['main']
+    if table in ARCHIVED and archive_dir:
+        schemas = itertools.chain(each_partition(conn, archive_dir, since=since, oldest_first=True), schemas)
+    for schema in schemas:
+        cursor = conn.execute(sql.format(schema=schema), params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def iter_export(conn, name, fmt='csv', since=None, chunk_size=1000, archive_dir=None):
+    """Yield the export as text chunks, one chunk per ``fetchmany`` batch.
+
+    Pass ``archive_dir`` to include archived orders and bookings.
+    """
+    columns = EXPORTS[name][1]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for rows in iter_rows(conn, name, since, chunk_size, archive_dir):
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'ndjson':
+        for rows in iter_rows(conn, name, since, chunk_size, archive_dir):
+            yield ''.join(json.dumps(dict(zip(columns, row)), separators=(',', ':')) + '\n' for row in rows)
+    else:
+        raise ValueError(f'Unknown export format: {fmt}')
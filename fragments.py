@@ -0,0 +1,60 @@
+import threading
+
+from markupsafe import Markup
+
+# Per-destination HTML fragments (catalog cards, admin rows) rendered once and
+# reused across pages, so a large catalog page is mostly string joins.
+
+
+class FragmentCache:
+    """Rendered fragments keyed by template, destination id and catalog generation.
+
+    Templates call ``fragment('_destination_card.html', destination)``. Any
+    catalog change bumps the generation, which drops every cached fragment.
+    Fragments must not depend on the request or session, only on the
+    destination passed in.
+    """
+
+    def __init__(self, catalog, app, max_entries=20000):
+        self.catalog = catalog
+        self.app = app
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._fragments = {}
+        self._generation = None
+        self._hits = 0
+        self._misses = 0
+
+    def render(self, template_name, destination):
+        # The page already checked the catalog, so read the generation without another check
+        generation = self.catalog.generation
+        key = (template_name, destination['id'])
+        with self._lock:
+            if generation != self._generation:
+                self._fragments.clear()
+                self._generation = generation
+            html = self._fragments.get(key)
+            if html is not None:
+                self._hits += 1
+                return html
+            self._misses += 1
+        html = Markup(self.app.jinja_env.get_template(template_name).render(destination=destination))
+        with self._lock:
+            if generation == self._generation:
+                if len(self._fragments) >= self.max_entries:
+                    self._fragments.clear()
+                self._fragments[key] = html
+        return html
+
+    def purge(self):
+        with self._lock:
+            self._fragments.clear()
+            self._generation = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'entries': len(self._fragments),
+            }
@@ -0,0 +1,218 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Resized destination images served from a bounded on-disk cache. Sources
+# that take a width parameter (Unsplash, imgix) are asked for the size
+# directly. Other sources are fetched once and resized with Pillow when it
+# is installed, or served at their original size when it is not.
+
+SIZES = (100, 200, 400, 800, 1200)
+IMMUTABLE = 'public, max-age=31536000, immutable'
+EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp', 'image/gif': '.gif',
+              'image/avif': '.avif'}
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+def source_version(url):
+    # Short digest of the source URL; part of the image URL so browsers can cache it forever
+    return hashlib.sha1(url.encode()).hexdigest()[:10]
+
+
+def sized_url(url, size):
+    """Return ``url`` with its ``w`` parameter set to ``size``, or None if it has none."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if not any(key == 'w' for key, _ in query):
+        return None
+    query = [(key, str(size) if key == 'w' else value) for key, value in query]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def fetch(url, timeout):
+    # Returns (body, content type)
+    request = urllib.request.Request(url, headers={'User-Agent': 'DreamTravels-ImageProxy/1.0'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            content_type = response.headers.get_content_type()
+            if content_type not in EXTENSIONS:
+                raise ImageFetchError(f'{url} returned {content_type}, not an image')
+            body = response.read(MAX_SOURCE_BYTES + 1)
+    except OSError as e:
+        raise ImageFetchError(f'fetching {url} failed: {e}') from e
+    if len(body) > MAX_SOURCE_BYTES:
+        raise ImageFetchError(f'{url} is larger than {MAX_SOURCE_BYTES} bytes')
+    return body, content_type
+
+
+def resize(body, content_type, size):
+    """Scale the image down to ``size`` pixels wide with Pillow, if it is installed.
+
+    Returns (body, content type); the input comes back unchanged when Pillow
+    is missing, the image is already narrow enough, or it cannot be decoded.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return body, content_type
+    try:
+        with Image.open(io.BytesIO(body)) as image:
+            if image.width <= size:
+                return body, content_type
+            height = max(1, round(image.height * size / image.width))
+            resized = image.convert('RGB').resize((size, height), Image.LANCZOS)
+            out = io.BytesIO()
+            resized.save(out, 'JPEG', quality=82, optimize=True, progressive=True)
+    except (OSError, ValueError):
+        return body, content_type
+    return out.getvalue(), 'image/jpeg'
+
+
+class ImageCache:
+    """Resized images on disk, evicted least recently used once ``max_bytes`` is exceeded.
+
+    Files are named after a digest of the source URL and size, so a changed
+    image_url never serves a stale picture. Each variant is fetched once per
+    process; concurrent requests for the same variant wait for the first.
+    A failed fetch is remembered for ``failure_ttl`` seconds, so a dead
+    source URL does not tie up a worker on every request.
+    """
+
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024, timeout=10.0, failure_ttl=60.0,
+                 max_failures=10000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.failure_ttl = failure_ttl
+        self.max_failures = max_failures
+        self._lock = threading.Lock()
+        self._fetching = {}
+        self._files = OrderedDict()
+        # key -> (retry after, error message)
+        self._failures = {}
+        self._loaded = False
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+        self._failure_hits = 0
+        self._evictions = 0
+
+    def _load(self):
+        # Called with the lock held on first use, so importing the app touches no files
+        os.makedirs(self.directory, exist_ok=True)
+        # Pick up files from earlier runs, oldest access first
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith('.'):
+                stat = entry.stat()
+                entries.append((stat.st_atime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self._bytes += size
+        self._loaded = True
+
+    def _key(self, url, size):
+        return hashlib.sha1(f'{size}:{url}'.encode()).hexdigest()
+
+    def _lookup(self, key):
+        for name in (key + ext for ext in EXTENSIONS.values()):
+            if name in self._files:
+                return name
+        return None
+
+    def get(self, url, size):
+        """Return the path of ``url`` resized to ``size``, fetching it on a miss."""
+        key = self._key(url, size)
+        while True:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                failure = self._failures.get(key)
+                if failure is not None:
+                    if failure[0] > time.monotonic():
+                        self._failure_hits += 1
+                        raise ImageFetchError(failure[1])
+                    del self._failures[key]
+                name = self._lookup(key)
+                if name is not None:
+                    path = os.path.join(self.directory, name)
+                    if os.path.exists(path):
+                        self._files.move_to_end(name)
+                        self._hits += 1
+                        return path
+                    # Removed behind our back (another process or a tmp cleaner)
+                    self._bytes -= self._files.pop(name)
+                pending = self._fetching.get(key)
+                if pending is None:
+                    pending = self._fetching[key] = threading.Event()
+                    self._misses += 1
+                    break
+            pending.wait(self.timeout)
+        try:
+            return self._fill(key, url, size)
+        except ImageFetchError as e:
+            with self._lock:
+                self._errors += 1
+                if len(self._failures) >= self.max_failures:
+                    now = time.monotonic()
+                    self._failures = {k: failure for k, failure in self._failures.items() if failure[0] > now}
+                if len(self._failures) < self.max_failures:
+                    self._failures[key] = (time.monotonic() + self.failure_ttl, str(e))
+            raise
+        finally:
+            with self._lock:
+                del self._fetching[key]
+            pending.set()
+
+    def _fill(self, key, url, size):
+        variant = sized_url(url, size)
+        if variant is not None:
+            body, content_type = fetch(variant, self.timeout)
+        else:
+            body, content_type = resize(*fetch(url, self.timeout), size)
+        name = key + EXTENSIONS[content_type]
+        path = os.path.join(self.directory, name)
+        # Write under a temporary name so readers never see a partial file
+        partial = os.path.join(self.directory, f'.{name}.{threading.get_ident()}.{time.monotonic_ns()}')
+        with open(partial, 'wb') as f:
+            f.write(body)
+        os.replace(partial, path)
+        with self._lock:
+            self._bytes += len(body) - self._files.pop(name, 0)
+            self._files[name] = len(body)
+            self._evict()
+        return path
+
+    def _evict(self):
+        # Called with the lock held; never evicts the file just added
+        while self._bytes > self.max_bytes and len(self._files) > 1:
+            name, size = self._files.popitem(last=False)
+            self._bytes -= size
+            self._evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'errors': self._errors,
+                'failure_hits': self._failure_hits,
+                'failures': len(self._failures),
+                'evictions': self._evictions,
+                'files': len(self._files),
+                'bytes': self._bytes,
+            }
@@ -0,0 +1,133 @@
+import threading
+import time
+
+from db import write_transaction
+
+# Seats per destination and travel date. availability rows are created lazily
+# from destination.capacity; cart_holds are short-lived reservations that
+# expire on their own, so abandoned carts give their seats back.
+
+HOLD_TTL = 15 * 60
+
+
+class SoldOut(Exception):
+    def __init__(self, destination_id, travel_date, available):
+        super().__init__(f'Only {max(available, 0)} seat(s) left for {travel_date}')
+        self.destination_id = destination_id
+        self.travel_date = travel_date
+        self.available = available
+
+
+def _ensure_row(conn, destination_id, travel_date):
+    conn.execute('''INSERT OR IGNORE INTO availability (destination_id, travel_date, capacity, sold)
+                    SELECT id, ?, capacity, 0 FROM destination WHERE id = ?''',
+                 (travel_date, destination_id))
+
+
+def seats_left(conn, destination_id, travel_date, exclude_cart=None, now=None):
+    if now is None:
+        now = time.time()
+    row = conn.execute('''SELECT a.capacity - a.sold - COALESCE(
+                                  (SELECT SUM(h.quantity) FROM cart_holds h
+                                   WHERE h.destination_id = a.destination_id
+                                     AND h.travel_date = a.travel_date
+                                     AND h.expires_at > ? AND h.cart_id IS NOT ?), 0)
+                          FROM availability a
+                          WHERE a.destination_id = ? AND a.travel_date = ?''',
+                       (now, exclude_cart, destination_id, travel_date)).fetchone()
+    if row is None:
+        row = conn.execute('SELECT capacity FROM destination WHERE id = ?', (destination_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def hold(conn, cart_id, destination_id, travel_date, quantity, ttl=HOLD_TTL):
+    """Add ``quantity`` seats to this cart's hold, or raise SoldOut."""
+    if quantity < 1:
+        raise ValueError('Quantity must be at least 1')
+    now = time.time()
+    with write_transaction(conn):
+        _ensure_row(conn, destination_id, travel_date)
+        available = seats_left(conn, destination_id, travel_date, exclude_cart=cart_id, now=now)
+        held = conn.execute('''SELECT quantity FROM cart_holds
+                               WHERE cart_id = ? AND destination_id = ? AND travel_date = ? AND expires_at > ?''',
+                            (cart_id, destination_id, travel_date, now)).fetchone()
+        held = held[0] if held else 0
+        if held + quantity > available:
+            raise SoldOut(destination_id, travel_date, available - held)
+        conn.execute('''INSERT INTO cart_holds (cart_id, destination_id, travel_date, quantity, expires_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (cart_id, destination_id, travel_date)
+                        DO UPDATE SET quantity = ?, expires_at = excluded.expires_at''',
+                     (cart_id, destination_id, travel_date, quantity, now + ttl, held + quantity))
+
+
+def release(conn, cart_id, destination_id=None, travel_date=None):
+    # Drops one hold, or every hold of the cart when no line is given
+    if destination_id is None:
+        conn.execute('DELETE FROM cart_holds WHERE cart_id = ?', (cart_id,))
+    else:
+        conn.execute('DELETE FROM cart_holds WHERE cart_id = ? AND destination_id = ? AND travel_date = ?',
+                     (cart_id, destination_id, travel_date))
+    conn.execute('DELETE FROM cart_holds WHERE expires_at < ?', (time.time() - HOLD_TTL,))
+    conn.commit()
+
+
+def reserve(conn, cart_id, cart_items):
+    """Turn the cart into sold seats. Must run inside the checkout transaction.
+
+    Each line is a single conditional UPDATE, so concurrent checkouts can never
+    sell more than capacity minus other carts' live holds.
+    """
+    now = time.time()
+    quantities = {}
+    for item in cart_items:
+        key = (item['destination_id'], item['travel_date'])
+        quantities[key] = quantities.get(key, 0) + item['quantity']
+    for (destination_id, travel_date), quantity in quantities.items():
+        _ensure_row(conn, destination_id, travel_date)
+        updated = conn.execute('''UPDATE availability SET sold = sold + ?
+                                  WHERE destination_id = ? AND travel_date = ?
+                                    AND sold + ? + COALESCE(
+                                        (SELECT SUM(h.quantity) FROM cart_holds h
+                                         WHERE h.destination_id = availability.destination_id
+                                           AND h.travel_date = availability.travel_date
+                                           AND h.expires_at > ? AND h.cart_id IS NOT ?), 0) <= capacity''',
+                               (quantity, destination_id, travel_date, quantity, now, cart_id)).rowcount
+        if not updated:
+            raise SoldOut(destination_id, travel_date,
+                          seats_left(conn, destination_id, travel_date, exclude_cart=cart_id, now=now))
+    if cart_id is not None:
+        conn.execute('DELETE FROM cart_holds WHERE cart_id = ?', (cart_id,))
+    return list(quantities)
+
+
+class AvailabilityCache:
+    """Short-lived counters of seats left, so detail pages do not hit SQLite."""
+
+    def __init__(self, ttl=5.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def get(self, conn, destination_id, travel_date):
+        key = (destination_id, travel_date)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        value = seats_left(conn, destination_id, travel_date)
+        with self._lock:
+            if len(self._counters) >= self.max_entries:
+                self._counters.clear()
+            self._counters[key] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self, keys=None):
+        with self._lock:
+            if keys is None:
+                self._counters.clear()
+            else:
+                for key in keys:
+                    self._counters.pop(key, None)
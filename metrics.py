@@ -0,0 +1,169 @@
+import bisect
+import threading
+import time
+
+from flask import Response, before_render_template, g, request, template_rendered
+
+# Request, SQL and template timings exposed in the Prometheus text format.
+# Everything is kept in-process: each worker reports its own numbers.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 3072, 4096)
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> [count per bucket (+Inf last), sum]
+        self._series = {}
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            pairs = [f'{name}="{value}"' for name, value in zip(self.labels, labels)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                bucket_labels = ','.join(pairs + [f'le="{bound}"'])
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} {cumulative}')
+            suffix = '{' + ','.join(pairs) + '}' if pairs else ''
+            lines.append(f'{self.name}_sum{suffix} {total}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, labels=()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            pairs = ','.join(f'{name}="{label}"' for name, label in zip(self.labels, labels))
+            lines.append(f'{self.name}{{{pairs}}} {value}' if pairs else f'{self.name} {value}')
+        return lines
+
+
+class Metrics:
+    """Collects per-request timings for one Flask app.
+
+    ``install()`` registers the request hooks and template signals; SQL
+    statements are reported by the connection pool through ``record_query``.
+    Statements slower than ``slow_query_seconds`` are logged.
+    """
+
+    def __init__(self, prefix='dreamtravels', slow_query_seconds=None, logger=None):
+        self.prefix = prefix
+        self.slow_query_seconds = slow_query_seconds
+        self.logger = logger
+        self._local = threading.local()
+        self._stats = []
+        self.requests = Counter(f'{prefix}_requests_total', 'HTTP responses by endpoint and status',
+                                ('endpoint', 'method', 'status'))
+        self.latency = Histogram(f'{prefix}_request_duration_seconds', 'Time spent handling a request',
+                                 ('endpoint',))
+        self.sql_count = Counter(f'{prefix}_sql_statements_total', 'SQL statements executed', ('endpoint',))
+        self.sql_time = Counter(f'{prefix}_sql_seconds_total', 'Time spent executing SQL', ('endpoint',))
+        self.sql_latency = Histogram(f'{prefix}_sql_statement_duration_seconds', 'Time per SQL statement',
+                                     buckets=QUERY_BUCKETS)
+        self.slow_queries = Counter(f'{prefix}_slow_queries_total', 'SQL statements over the slow query threshold')
+        self.render_latency = Histogram(f'{prefix}_template_render_seconds', 'Time spent rendering a template',
+                                        ('template',))
+        self.session_size = Histogram(f'{prefix}_session_cookie_bytes', 'Size of the session cookie sent by clients',
+                                      buckets=SIZE_BUCKETS)
+
+    def install(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        if self.logger is None:
+            self.logger = app.logger
+        self._session_cookie = app.config['SESSION_COOKIE_NAME']
+
+    def register_stats(self, name, stats):
+        # ``stats`` returns a dict; numeric values are exported as gauges
+        self._stats.append((name, stats))
+
+    def _endpoint(self):
+        return getattr(self._local, 'endpoint', None) or 'background'
+
+    def _before_request(self):
+        self._local.endpoint = request.endpoint or 'unmatched'
+        g.request_started = time.perf_counter()
+        cookie = request.cookies.get(self._session_cookie)
+        if cookie:
+            self.session_size.observe(len(cookie))
+
+    def _after_request(self, response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            endpoint = self._endpoint()
+            self.latency.observe(time.perf_counter() - started, (endpoint,))
+            self.requests.inc(labels=(endpoint, request.method, str(response.status_code)))
+        self._local.endpoint = None
+        return response
+
+    def _before_render(self, sender, template, context, **extra):
+        stack = getattr(self._local, 'renders', None)
+        if stack is None:
+            stack = self._local.renders = []
+        stack.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        stack = getattr(self._local, 'renders', None)
+        if stack:
+            self.render_latency.observe(time.perf_counter() - stack.pop(), (template.name or 'string',))
+
+    def record_query(self, sql, duration):
+        endpoint = self._endpoint()
+        self.sql_count.inc(labels=(endpoint,))
+        self.sql_time.inc(duration, labels=(endpoint,))
+        self.sql_latency.observe(duration)
+        if self.slow_query_seconds is not None and duration >= self.slow_query_seconds:
+            self.slow_queries.inc()
+            if self.logger is not None:
+                self.logger.warning('Slow query (%.1f ms, endpoint %s): %s', duration * 1000, endpoint,
+                                    ' '.join(sql.split()))
+
+    def render(self):
+        lines = []
+        for metric in (self.requests, self.latency, self.sql_count, self.sql_time, self.sql_latency,
+                       self.slow_queries, self.render_latency, self.session_size):
+            lines.extend(metric.render())
+        for name, stats in self._stats:
+            for key, value in stats().items():
+                if isinstance(value, (bool, int, float)):
+                    metric = f'{self.prefix}_{name}_{key}'
+                    lines.append(f'# TYPE {metric} gauge')
+                    lines.append(f'{metric} {float(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def response(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
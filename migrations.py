@@ -0,0 +1,407 @@
+import sqlite3
+import sys
+
+# Schema migrations, applied in order and tracked in PRAGMA user_version.
+# Never edit a released migration; append a new one instead.
+
+
+def initial_schema(conn):
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS destination
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  name TEXT NOT NULL,
+                  description TEXT NOT NULL,
+                  price REAL NOT NULL,
+                  image_url TEXT)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS booking
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  name TEXT NOT NULL,
+                  email TEXT NOT NULL,
+                  destination_id INTEGER NOT NULL,
+                  travel_date TEXT NOT NULL,
+                  created_at TEXT NOT NULL,
+                  FOREIGN KEY (destination_id) REFERENCES destination (id))''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS user
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  username TEXT UNIQUE NOT NULL,
+                  email TEXT UNIQUE NOT NULL,
+                  password TEXT NOT NULL,
+                  is_admin INTEGER DEFAULT 0,
+                  created_at TEXT NOT NULL)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS orders
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  user_id INTEGER NOT NULL,
+                  order_number TEXT NOT NULL,
+                  total_amount REAL NOT NULL,
+                  payment_method TEXT NOT NULL,
+                  status TEXT NOT NULL,
+                  created_at TEXT NOT NULL,
+                  FOREIGN KEY (user_id) REFERENCES user (id))''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS order_items
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  order_id INTEGER NOT NULL,
+                  destination_id INTEGER NOT NULL,
+                  quantity INTEGER NOT NULL,
+                  price REAL NOT NULL,
+                  travel_date TEXT NOT NULL,
+                  FOREIGN KEY (order_id) REFERENCES orders (id),
+                  FOREIGN KEY (destination_id) REFERENCES destination (id))''')
+
+    # Catalog version, bumped by triggers so other processes can detect catalog changes
+    c.execute('''CREATE TABLE IF NOT EXISTS catalog_meta
+                 (id INTEGER PRIMARY KEY CHECK (id = 1),
+                  version INTEGER NOT NULL)''')
+    c.execute('INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS destination_{event.lower()}_version
+                      AFTER {event} ON destination
+                      BEGIN
+                          UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+                      END''')
+
+
+def add_indexes(conn):
+    c = conn.cursor()
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_order_number ON orders (order_number)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders (created_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders (user_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_booking_destination_id ON booking (destination_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_booking_created_at ON booking (created_at)')
+
+
+def add_admin_counters(conn):
+    c = conn.cursor()
+    # Composite indexes so filtered admin pages can walk created_at without sorting
+    c.execute('DROP INDEX IF EXISTS idx_orders_user_id')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at)')
+
+    # Row counts and revenue kept up to date by triggers, so the dashboard never counts
+    c.execute('''CREATE TABLE IF NOT EXISTS admin_counters
+                 (name TEXT PRIMARY KEY,
+                  value REAL NOT NULL DEFAULT 0)''')
+    c.execute('''INSERT OR REPLACE INTO admin_counters (name, value)
+                 SELECT 'orders', COUNT(*) FROM orders
+                 UNION ALL SELECT 'revenue', COALESCE(SUM(total_amount), 0) FROM orders
+                 UNION ALL SELECT 'bookings', COUNT(*) FROM booking''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS orders_insert_counters AFTER INSERT ON orders
+                 BEGIN
+                     UPDATE admin_counters SET value = value + 1 WHERE name = 'orders';
+                     UPDATE admin_counters SET value = value + NEW.total_amount WHERE name = 'revenue';
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS orders_delete_counters AFTER DELETE ON orders
+                 BEGIN
+                     UPDATE admin_counters SET value = value - 1 WHERE name = 'orders';
+                     UPDATE admin_counters SET value = value - OLD.total_amount WHERE name = 'revenue';
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS booking_insert_counters AFTER INSERT ON booking
+                 BEGIN
+                     UPDATE admin_counters SET value = value + 1 WHERE name = 'bookings';
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS booking_delete_counters AFTER DELETE ON booking
+                 BEGIN
+                     UPDATE admin_counters SET value = value - 1 WHERE name = 'bookings';
+                 END''')
+
+
+def add_cart_lines(conn):
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS cart_lines
+                 (cart_id TEXT NOT NULL,
+                  destination_id INTEGER NOT NULL,
+                  travel_date TEXT NOT NULL,
+                  quantity INTEGER NOT NULL,
+                  price REAL NOT NULL,
+                  updated_at REAL NOT NULL,
+                  PRIMARY KEY (cart_id, destination_id, travel_date))''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_cart_lines_updated_at ON cart_lines (updated_at)')
+
+
+def add_inventory(conn):
+    c = conn.cursor()
+    c.execute('ALTER TABLE destination ADD COLUMN capacity INTEGER NOT NULL DEFAULT 50')
+    c.execute('''CREATE TABLE IF NOT EXISTS availability
+                 (destination_id INTEGER NOT NULL,
+                  travel_date TEXT NOT NULL,
+                  capacity INTEGER NOT NULL,
+                  sold INTEGER NOT NULL DEFAULT 0,
+                  PRIMARY KEY (destination_id, travel_date),
+                  FOREIGN KEY (destination_id) REFERENCES destination (id)) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS cart_holds
+                 (cart_id TEXT NOT NULL,
+                  destination_id INTEGER NOT NULL,
+                  travel_date TEXT NOT NULL,
+                  quantity INTEGER NOT NULL,
+                  expires_at REAL NOT NULL,
+                  PRIMARY KEY (cart_id, destination_id, travel_date))''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_cart_holds_slot
+                 ON cart_holds (destination_id, travel_date, expires_at)''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_cart_holds_expires_at ON cart_holds (expires_at)')
+
+
+def add_destination_search(conn):
+    c = conn.cursor()
+    try:
+        c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS destination_fts USING fts5
+                     (name, description, content='destination', content_rowid='id',
+                      tokenize='unicode61 remove_diacritics 2')''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5; search.py falls back to LIKE queries
+        return
+    c.execute('''CREATE TRIGGER IF NOT EXISTS destination_fts_insert AFTER INSERT ON destination
+                 BEGIN
+                     INSERT INTO destination_fts (rowid, name, description)
+                     VALUES (NEW.id, NEW.name, NEW.description);
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS destination_fts_delete AFTER DELETE ON destination
+                 BEGIN
+                     INSERT INTO destination_fts (destination_fts, rowid, name, description)
+                     VALUES ('delete', OLD.id, OLD.name, OLD.description);
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS destination_fts_update AFTER UPDATE OF name, description ON destination
+                 BEGIN
+                     INSERT INTO destination_fts (destination_fts, rowid, name, description)
+                     VALUES ('delete', OLD.id, OLD.name, OLD.description);
+                     INSERT INTO destination_fts (rowid, name, description)
+                     VALUES (NEW.id, NEW.name, NEW.description);
+                 END''')
+    # Rank by BM25 with name matches weighted 10x; ORDER BY rank then sorts inside FTS5
+    c.execute("INSERT INTO destination_fts (destination_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')")
+    c.execute("INSERT INTO destination_fts (destination_fts) VALUES ('rebuild')")
+
+
+def add_sales_summaries(conn):
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS sales_daily
+                 (day TEXT PRIMARY KEY,
+                  orders INTEGER NOT NULL DEFAULT 0,
+                  units INTEGER NOT NULL DEFAULT 0,
+                  revenue REAL NOT NULL DEFAULT 0) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS sales_by_destination
+                 (destination_id INTEGER PRIMARY KEY,
+                  units INTEGER NOT NULL DEFAULT 0,
+                  revenue REAL NOT NULL DEFAULT 0)''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_sales_by_destination_revenue ON sales_by_destination (revenue)')
+    c.execute('''CREATE TABLE IF NOT EXISTS sales_by_payment
+                 (payment_method TEXT PRIMARY KEY,
+                  orders INTEGER NOT NULL DEFAULT 0,
+                  revenue REAL NOT NULL DEFAULT 0) WITHOUT ROWID''')
+    c.execute('''INSERT INTO sales_daily (day, orders, units, revenue)
+                 SELECT date(o.created_at), COUNT(DISTINCT o.id), COALESCE(SUM(oi.quantity), 0),
+                        COALESCE(SUM(oi.quantity * oi.price), 0)
+                 FROM orders o LEFT JOIN order_items oi ON oi.order_id = o.id
+                 GROUP BY date(o.created_at)''')
+    c.execute('''INSERT INTO sales_by_destination (destination_id, units, revenue)
+                 SELECT destination_id, SUM(quantity), SUM(quantity * price)
+                 FROM order_items GROUP BY destination_id''')
+    c.execute('''INSERT INTO sales_by_payment (payment_method, orders, revenue)
+                 SELECT payment_method, COUNT(*), SUM(total_amount)
+                 FROM orders GROUP BY payment_method''')
+
+
+def add_destination_name_key(conn):
+    c = conn.cursor()
+    # Names become the natural key for bulk imports; disambiguate existing duplicates first
+    c.execute('''UPDATE destination SET name = name || ' (' || id || ')'
+                 WHERE id NOT IN (SELECT MIN(id) FROM destination GROUP BY name)''')
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_destination_name ON destination (name)')
+
+    # Bulk imports set catalog_meta.bulk_load inside their own write transaction
+    # and maintain the version and search index once per chunk instead of per row
+    c.execute('ALTER TABLE catalog_meta ADD COLUMN bulk_load INTEGER NOT NULL DEFAULT 0')
+    unless_bulk = 'WHEN (SELECT bulk_load FROM catalog_meta WHERE id = 1) = 0'
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        c.execute(f'DROP TRIGGER IF EXISTS destination_{event.lower()}_version')
+        c.execute(f'''CREATE TRIGGER destination_{event.lower()}_version
+                      AFTER {event} ON destination {unless_bulk}
+                      BEGIN
+                          UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+                      END''')
+    if c.execute("SELECT 1 FROM sqlite_master WHERE name = 'destination_fts'").fetchone() is None:
+        return
+    for event in ('insert', 'update', 'delete'):
+        c.execute(f'DROP TRIGGER IF EXISTS destination_fts_{event}')
+    c.execute(f'''CREATE TRIGGER destination_fts_insert AFTER INSERT ON destination {unless_bulk}
+                  BEGIN
+                      INSERT INTO destination_fts (rowid, name, description)
+                      VALUES (NEW.id, NEW.name, NEW.description);
+                  END''')
+    c.execute(f'''CREATE TRIGGER destination_fts_delete AFTER DELETE ON destination {unless_bulk}
+                  BEGIN
+                      INSERT INTO destination_fts (destination_fts, rowid, name, description)
+                      VALUES ('delete', OLD.id, OLD.name, OLD.description);
+                  END''')
+    c.execute(f'''CREATE TRIGGER destination_fts_update AFTER UPDATE OF name, description ON destination {unless_bulk}
+                  BEGIN
+                      INSERT INTO destination_fts (destination_fts, rowid, name, description)
+                      VALUES ('delete', OLD.id, OLD.name, OLD.description);
+                      INSERT INTO destination_fts (rowid, name, description)
+                      VALUES (NEW.id, NEW.name, NEW.description);
+                  END''')
+
+
+def add_failed_orders(conn):
+    c = conn.cursor()
+    # Queued checkouts the order writer could not commit, so their status survives a restart
+    c.execute('''CREATE TABLE IF NOT EXISTS failed_orders
+                 (order_number TEXT PRIMARY KEY,
+                  user_id INTEGER NOT NULL,
+                  error TEXT NOT NULL,
+                  failed_at TEXT NOT NULL) WITHOUT ROWID''')
+
+
+MIGRATIONS = [
+    (1, initial_schema),
+    (2, add_indexes),
+    (3, add_admin_counters),
+    (4, add_cart_lines),
+    (5, add_inventory),
+    (6, add_destination_search),
+    (7, add_sales_summaries),
+    (8, add_destination_name_key),
+    (9, add_failed_orders),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    current = schema_version(conn)
+    for version, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the write lock
+            if schema_version(conn) < version:
+                migration(conn)
+                conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return schema_version(conn)
+
+
+# Queries issued by the routes, checked with EXPLAIN QUERY PLAN. Queries that
+# read a whole table on purpose (e.g. the catalog cache load) set allow_scan.
+ROUTE_QUERIES = [
+    ('catalog load', 'SELECT * FROM destination ORDER BY id', (), True),
+    ('catalog count', 'SELECT COUNT(*) FROM destination', (), True),
+    ('suggest index', 'SELECT id, name FROM destination', (), True),
+    ('destination by id', 'SELECT * FROM destination WHERE id = ?', (1,), False),
+    ('destinations by ids', 'SELECT * FROM destination WHERE id IN (?, ?, ?)', (1, 2, 3), False),
+    ('user by username', 'SELECT * FROM user WHERE username = ?', ('admin',), False),
+    ('user by username or email', 'SELECT id FROM user WHERE username = ? OR email = ?', ('a', 'b'), False),
+    ('admin user count', 'SELECT COUNT(*) FROM user WHERE is_admin = 1', (), True),
+    ('order by number', 'SELECT id FROM orders WHERE order_number = ?', ('X',), False),
+    ('order status', 'SELECT status FROM orders WHERE order_number = ? AND user_id = ?', ('X', 1), False),
+    ('failed order status', 'SELECT 1 FROM failed_orders WHERE order_number = ? AND user_id = ?', ('X', 1), False),
+    ('admin bookings', '''SELECT b.*, d.name as destination_name
+                          FROM booking b
+                          JOIN destination d ON b.destination_id = d.id
+                          WHERE (b.created_at, b.id) < (?, ?)
+                          ORDER BY b.created_at DESC, b.id DESC LIMIT 51''', ('2030-01-01', 1), False),
+    ('admin orders', '''SELECT o.*, u.username
+                        FROM orders o
+                        JOIN user u ON o.user_id = u.id
+                        WHERE (o.created_at, o.id) < (?, ?)
+                        ORDER BY o.created_at DESC, o.id DESC LIMIT 51''', ('2030-01-01', 1), False),
+    ('admin orders by user', '''SELECT o.*, u.username
+                                FROM orders o
+                                JOIN user u ON o.user_id = u.id
+                                WHERE u.username = ?
+                                ORDER BY o.created_at DESC, o.id DESC LIMIT 51''', ('admin',), False),
+    ('admin orders by status', '''SELECT o.*, u.username
+                                  FROM orders o
+                                  JOIN user u ON o.user_id = u.id
+                                  WHERE o.status = ? AND o.created_at >= ?
+                                  ORDER BY o.created_at DESC, o.id DESC LIMIT 51''', ('Completed', '2026-01-01'), False),
+    ('cart lines', '''SELECT * FROM cart_lines WHERE cart_id = ? AND updated_at >= ?
+                      ORDER BY destination_id, travel_date''', ('c', 0), False),
+    ('expired cart lines', 'DELETE FROM cart_lines WHERE updated_at < ?', (0,), False),
+    ('seats left', '''SELECT a.capacity - a.sold - COALESCE(
+                           (SELECT SUM(h.quantity) FROM cart_holds h
+                            WHERE h.destination_id = a.destination_id
+                              AND h.travel_date = a.travel_date
+                              AND h.expires_at > ? AND h.cart_id IS NOT ?), 0)
+                       FROM availability a
+                       WHERE a.destination_id = ? AND a.travel_date = ?''', (0, 'c', 1, 'd'), False),
+    ('cart hold', '''SELECT quantity FROM cart_holds
+                     WHERE cart_id = ? AND destination_id = ? AND travel_date = ? AND expires_at > ?''',
+     ('c', 1, 'd', 0), False),
+    ('expired holds', 'DELETE FROM cart_holds WHERE expires_at < ?', (0,), False),
+    ('admin counters', 'SELECT name, value FROM admin_counters', (), True),
+    ('destination search', '''SELECT d.*
+                              FROM destination_fts
+                              JOIN destination d ON d.id = destination_fts.rowid
+                              WHERE destination_fts MATCH ?
+                              ORDER BY destination_fts.rank
+                              LIMIT 13 OFFSET 0''', ('"paris"*',), False),
+    ('daily sales', 'SELECT day, orders, units, revenue FROM sales_daily WHERE day >= ? ORDER BY day',
+     ('2026-01-01',), False),
+    ('top destinations', '''SELECT destination_id, units, revenue FROM sales_by_destination
+                            ORDER BY revenue DESC LIMIT ?''', (10,), False),
+    ('payment methods', 'SELECT payment_method, orders, revenue FROM sales_by_payment', (), True),
+    ('bookings for destination', 'SELECT COUNT(*) FROM booking WHERE destination_id = ?', (1,), False),
+    ('order items', 'SELECT * FROM order_items WHERE order_id = ?', (1,), False),
+    ('search available', "SELECT 1 FROM sqlite_master WHERE name = 'destination_fts'", (), True),
+    # Full exports read whole tables; incremental ones (since=) use the created_at indexes
+    ('export orders', '''SELECT id, user_id, order_number, total_amount, payment_method, status, created_at
+                         FROM main.orders''', (), True),
+    ('export orders since', '''SELECT id, user_id, order_number, total_amount, payment_method, status, created_at
+                               FROM main.orders WHERE created_at >= ?''', ('2026-01-01',), False),
+    ('export bookings', 'SELECT id, name, email, destination_id, travel_date, created_at FROM main.booking',
+     (), True),
+    ('export bookings since', '''SELECT id, name, email, destination_id, travel_date, created_at
+                                 FROM main.booking WHERE created_at >= ?''', ('2026-01-01',), False),
+    ('export users', 'SELECT id, username, email, is_admin, created_at FROM main.user', (), True),
+]
+
+
+def check_query_plans(conn, queries=ROUTE_QUERIES):
+    # Returns a list of (name, plan detail) for every query that scans a table
+    problems = []
+    for name, sql, params, allow_scan in queries:
+        for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params):
+            detail = row[-1]
+            full_scan = detail.startswith('SCAN ') and 'INDEX' not in detail
+            if (full_scan and not allow_scan) or 'TEMP B-TREE' in detail:
+                problems.append((name, detail))
+    return problems
+
+
+def main(argv=None):
+    # Imported here so the app does not pay for argparse at startup
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Apply schema migrations or check route query plans.')
+    parser.add_argument('database', nargs='?', default=':memory:')
+    parser.add_argument('--check-plans', action='store_true',
+                        help='fail if any route query does a full table scan')
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.database)
+    version = migrate(conn)
+    print(f'Schema version {version}')
+    if args.check_plans:
+        problems = check_query_plans(conn)
+        for name, detail in problems:
+            print(f'{name}: {detail}')
+        if problems:
+            return 1
+        print(f'All {len(ROUTE_QUERIES)} route queries use indexes')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from db import write_transaction
+from orders import insert_order
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class _JournalBatch:
+    # Lines appended while the previous fsync was running; written by one fsync
+    def __init__(self):
+        self.lines = []
+        self.done = False
+        self.error = None
+
+
+class OrderQueue:
+    """Write-behind queue that commits checkouts from one writer thread.
+
+    ``submit()`` appends the order to a journal file and waits for it to be
+    fsynced before queueing it, so orders accepted but not yet committed are
+    replayed on restart. Concurrent submits share one fsync (group commit).
+    The writer drains up to ``batch_size`` orders per transaction. Replays are
+    idempotent because orders whose order_number already exists are skipped.
+    Orders that cannot be committed are recorded in failed_orders.
+    """
+
+    def __init__(self, pool, journal_path, max_depth=1000, batch_size=50, compact_bytes=1024 * 1024):
+        self.pool = pool
+        self.journal_path = journal_path
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.compact_bytes = compact_bytes
+        # Depth is enforced in submit() so journal replays never block
+        self._queue = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._depth_lock = threading.Lock()
+        # Guards the journal file, the pending batch and the outstanding lines
+        self._journal_cond = threading.Condition()
+        self._batch = _JournalBatch()
+        self._flushing = False
+        self._journal_bytes = 0
+        # order_number -> journal line, for orders synced to the journal but not yet committed
+        self._outstanding = {}
+        self._status_lock = threading.Lock()
+        self._statuses = {}
+        self._thread = None
+        self._submitted = 0
+        self._rejected = 0
+        self._committed = 0
+        self._failed = 0
+        self._batches = 0
+        self._last_batch_size = 0
+        self._max_batch_size = 0
+        self._fsyncs = 0
+        self._compactions = 0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            for line, order in self._read_journal():
+                self._outstanding[order['order_number']] = line
+                self._queue.put(order)
+                self._set_status(order['order_number'], 'Queued')
+            self._thread = threading.Thread(target=self._run, name='order-writer', daemon=True)
+            self._thread.start()
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return []
+        entries = []
+        with open(self.journal_path, encoding='utf-8') as journal:
+            for line in journal:
+                self._journal_bytes += len(line)
+                try:
+                    entries.append((line, json.loads(line)))
+                except ValueError:
+                    # A torn final line from a crash mid-write was never acknowledged
+                    continue
+        return entries
+
+    def submit(self, order):
+        self.start()
+        line = json.dumps(order, separators=(',', ':')) + '\n'
+        with self._depth_lock:
+            if self._queue.qsize() >= self.max_depth:
+                self._rejected += 1
+                raise QueueFull('Too many orders are waiting to be processed')
+        self._journal(order['order_number'], line)
+        self._set_status(order['order_number'], 'Queued')
+        self._queue.put_nowait(order)
+        with self._depth_lock:
+            self._submitted += 1
+
+    def _journal(self, order_number, line):
+        # Group commit: a submit that finds no fsync running writes every pending
+        # line with one fsync; the others wait for the batch holding their line
+        with self._journal_cond:
+            batch = self._batch
+            batch.lines.append((order_number, line))
+            while not batch.done:
+                if self._flushing:
+                    self._journal_cond.wait()
+                    continue
+                # Nobody swaps the batch while no flush is running, so this is still ours
+                self._flushing = True
+                self._batch = _JournalBatch()
+                self._journal_cond.release()
+                try:
+                    self._append(batch.lines)
+                except OSError as e:
+                    batch.error = e
+                finally:
+                    self._journal_cond.acquire()
+                    if batch.error is None:
+                        self._outstanding.update(batch.lines)
+                    self._flushing = False
+                    batch.done = True
+                    self._journal_cond.notify_all()
+            if batch.error is not None:
+                raise batch.error
+
+    def _append(self, lines):
+        data = ''.join(line for _, line in lines)
+        with open(self.journal_path, 'a', encoding='utf-8') as journal:
+            journal.write(data)
+            journal.flush()
+            os.fsync(journal.fileno())
+        self._journal_bytes += len(data)
+        self._fsyncs += 1
+
+    def _compact(self):
+        # Rewrite the journal with only the orders that are still outstanding.
+        # Holding _flushing keeps submits from appending to the old file meanwhile.
+        with self._journal_cond:
+            while self._flushing:
+                self._journal_cond.wait()
+            self._flushing = True
+            lines = list(self._outstanding.values())
+        try:
+            partial = f'{self.journal_path}.compact'
+            data = ''.join(lines)
+            with open(partial, 'w', encoding='utf-8') as journal:
+                journal.write(data)
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(partial, self.journal_path)
+            self._journal_bytes = len(data)
+            self._compactions += 1
+        except OSError:
+            logger.exception('Order journal compaction failed')
+        finally:
+            with self._journal_cond:
+                self._flushing = False
+                self._journal_cond.notify_all()
+
+    def _set_status(self, order_number, status):
+        with self._status_lock:
+            if status == 'Queued':
+                self._statuses[order_number] = status
+            else:
+                self._statuses.pop(order_number, None)
+
+    def status(self, order_number):
+        # Only orders still waiting for the writer have an in-memory status;
+        # committed and failed ones are looked up in the database
+        with self._status_lock:
+            return self._statuses.get(order_number)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit_batch(batch)
+            except Exception:
+                # No connection could be obtained; keep the orders and try again shortly
+                logger.exception('Order writer error')
+                for order in batch:
+                    self._queue.put(order)
+                time.sleep(1)
+                continue
+            with self._journal_cond:
+                for order in batch:
+                    self._outstanding.pop(order['order_number'], None)
+                compact = self._journal_bytes > self.compact_bytes or not self._outstanding
+            # Committed orders are dropped from the journal, so it stays bounded under sustained load
+            if compact and self._journal_bytes:
+                self._compact()
+
+    def _write(self, conn, orders):
+        with write_transaction(conn):
+            for order in orders:
+                exists = conn.execute('SELECT 1 FROM orders WHERE order_number = ?',
+                                      (order['order_number'],)).fetchone()
+                if not exists:
+                    insert_order(conn, order['user_id'], order['cart_items'],
+                                 order['payment_method'], order['order_number'],
+                                 cart_id=order.get('cart_id'))
+
+    def _record_failure(self, conn, order, error):
+        with write_transaction(conn):
+            conn.execute('''INSERT OR REPLACE INTO failed_orders (order_number, user_id, error, failed_at)
+                            VALUES (?, ?, ?, ?)''',
+                         (order['order_number'], order['user_id'], str(error),
+                          datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')))
+            # Checkout left the cart's seat holds for this order; give them back
+            if order.get('cart_id'):
+                conn.execute('DELETE FROM cart_holds WHERE cart_id = ?', (order['cart_id'],))
+
+    def _commit_batch(self, batch):
+        with self.pool.connection() as conn:
+            failed = set()
+            try:
+                self._write(conn, batch)
+            except Exception:
+                # Retry one by one so a single bad order does not fail the whole batch
+                for order in batch:
+                    try:
+                        self._write(conn, [order])
+                    except Exception as e:
+                        logger.exception('Error writing queued order %s', order['order_number'])
+                        self._record_failure(conn, order, e)
+                        failed.add(order['order_number'])
+        for order in batch:
+            self._set_status(order['order_number'], 'Failed' if order['order_number'] in failed else 'Completed')
+        self._committed += len(batch) - len(failed)
+        self._failed += len(failed)
+        self._batches += 1
+        self._last_batch_size = len(batch)
+        self._max_batch_size = max(self._max_batch_size, len(batch))
+
+    def stats(self):
+        return {
+            'depth': self._queue.qsize(),
+            'max_depth': self.max_depth,
+            'submitted': self._submitted,
+            'rejected': self._rejected,
+            'committed': self._committed,
+            'failed': self._failed,
+            'batches': self._batches,
+            'last_batch_size': self._last_batch_size,
+            'max_batch_size': self._max_batch_size,
+            'journal_fsyncs': self._fsyncs,
+            'journal_bytes': self._journal_bytes,
+            'journal_compactions': self._compactions,
+        }
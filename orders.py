@@ -0,0 +1,47 @@
+import uuid
+from datetime import datetime
+
+from db import write_transaction
+from inventory import reserve
+from reports import record_order
+
+
+def generate_order_number():
+    return uuid.uuid4().hex[:10].upper()
+
+
+def insert_order(conn, user_id, cart_items, payment_method, order_number, status='Completed', cart_id=None):
+    # Caller owns the transaction; returns the new order id. Raises SoldOut
+    # (leaving the caller to roll back) if any line exceeds the seats left.
+    reserve(conn, cart_id, cart_items)
+    total_amount = sum(item['price'] * item['quantity'] for item in cart_items)
+    created_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    order_id = conn.execute('''INSERT INTO orders
+                               (user_id, order_number, total_amount, payment_method, status, created_at)
+                               VALUES (?, ?, ?, ?, ?, ?)''',
+                            (user_id, order_number, total_amount, payment_method, status,
+                             created_at)).lastrowid
+    conn.executemany('''INSERT INTO order_items
+                        (order_id, destination_id, quantity, price, travel_date)
+                        VALUES (?, ?, ?, ?, ?)''',
+                     [(order_id, item['destination_id'], item['quantity'], item['price'],
+                       item['travel_date']) for item in cart_items])
+    record_order(conn, created_at, payment_method, cart_items)
+    return order_id
+
+
+def create_order(conn, user_id, cart_items, payment_method, status='Completed', order_number=None, cart_id=None):
+    """Insert an order and all of its items in a single write transaction.
+
+    ``cart_items`` are dicts with destination_id, quantity, price and
+    travel_date. Seats are reserved in the same transaction; ``cart_id``
+    lets the cart's own holds count towards them. Returns
+    ``(order_id, order_number)``.
+    """
+    if order_number is None:
+        order_number = generate_order_number()
+
+    # Take the write lock up front instead of upgrading a read lock mid-transaction
+    with write_transaction(conn):
+        order_id = insert_order(conn, user_id, cart_items, payment_method, order_number, status, cart_id)
+    return order_id, order_number
@@ -0,0 +1,108 @@
+import functools
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+from flask import Response, g, request, session
+
+
+class PageCache:
+    """Caches fully rendered catalog pages for anonymous visitors.
+
+    Entries are tied to the catalog generation, so any catalog change makes
+    them stale. Responses carry a strong ETag and Last-Modified header, and
+    conditional requests are answered with 304 Not Modified.
+    """
+
+    def __init__(self, catalog, max_entries=2048):
+        self.catalog = catalog
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._generation = None
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+
+    def purge(self):
+        with self._lock:
+            self._pages.clear()
+            self._generation = None
+
+    def _lookup(self, key, generation):
+        with self._lock:
+            if generation != self._generation:
+                self._pages.clear()
+                self._generation = generation
+            return self._pages.get(key)
+
+    def _store(self, key, generation, page):
+        with self._lock:
+            if generation != self._generation:
+                return
+            if len(self._pages) >= self.max_entries:
+                self._pages.pop(next(iter(self._pages)))
+            self._pages[key] = page
+
+    def peek(self, key, generation):
+        # Cached page for an anonymous GET of ``key`` (request.full_path), or None.
+        # Used directly by servers that answer outside Flask (see async_app.py).
+        page = self._lookup(key, generation)
+        if page is not None:
+            with self._lock:
+                self._hits += 1
+        return page
+
+    def count_not_modified(self):
+        with self._lock:
+            self._not_modified += 1
+
+    def _respond(self, page):
+        body, etag, last_modified, mimetype = page
+        response = Response(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.public = True
+        response.cache_control.max_age = 0
+        response.cache_control.must_revalidate = True
+        response.vary.add('Cookie')
+        response.make_conditional(request)
+        if response.status_code == 304:
+            self.count_not_modified()
+        return response
+
+    def cached(self, view):
+        @functools.wraps(view)
+        def decorated_function(*args, **kwargs):
+            # Logged-in pages and pages with pending flash messages are personalised
+            if request.method != 'GET' or 'user_id' in session or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            key = request.full_path
+            generation = self.catalog.current_generation()
+            page = self.peek(key, generation)
+            if page is not None:
+                return self._respond(page)
+
+            with self._lock:
+                self._misses += 1
+            response = view(*args, **kwargs)
+            if not isinstance(response, str) or g.get('skip_page_cache') or session.get('_flashes'):
+                return response
+
+            body = response.encode('utf-8')
+            etag = hashlib.sha1(body).hexdigest()
+            last_modified = datetime.fromtimestamp(int(self.catalog.changed_at), timezone.utc)
+            page = (body, etag, last_modified, 'text/html')
+            self._store(key, generation, page)
+            return self._respond(page)
+        return decorated_function
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'not_modified': self._not_modified,
+                'entries': len(self._pages),
+            }
@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+
+# Hash strings are self-describing: "<algorithm>$<parameters...>$<salt>$<hash>".
+# Bare 64-character hex strings are legacy unsalted SHA-256 hashes.
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class ScryptHasher:
+    algorithm = 'scrypt'
+
+    def __init__(self, n=2 ** 14, r=8, p=1, salt_size=16):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.salt_size = salt_size
+
+    def _derive(self, password, salt, n, r, p):
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p + 1024 * 1024, dklen=32)
+
+    def encode(self, password):
+        salt = os.urandom(self.salt_size)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f'{self.algorithm}${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(digest)}'
+
+    def verify(self, password, encoded):
+        _, n, r, p, salt, digest = encoded.split('$')
+        derived = self._derive(password, _b64decode(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(derived, _b64decode(digest))
+
+    def needs_rehash(self, encoded):
+        _, n, r, p, _, _ = encoded.split('$')
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+
+class PBKDF2Hasher:
+    algorithm = 'pbkdf2_sha256'
+
+    def __init__(self, iterations=600000, salt_size=16):
+        self.iterations = iterations
+        self.salt_size = salt_size
+
+    def encode(self, password):
+        salt = os.urandom(self.salt_size)
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.iterations)
+        return f'{self.algorithm}${self.iterations}${_b64encode(salt)}${_b64encode(digest)}'
+
+    def verify(self, password, encoded):
+        _, iterations, salt, digest = encoded.split('$')
+        derived = hashlib.pbkdf2_hmac('sha256', password.encode(), _b64decode(salt), int(iterations))
+        return hmac.compare_digest(derived, _b64decode(digest))
+
+    def needs_rehash(self, encoded):
+        return int(encoded.split('$')[1]) != self.iterations
+
+
+class LegacySHA256Hasher:
+    algorithm = 'sha256'
+
+    def verify(self, password, encoded):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+
+    def needs_rehash(self, encoded):
+        return True
+
+
+class PasswordHasher:
+    """Hashes with the configured KDF and verifies any supported format.
+
+    KDF work runs in a small, bounded thread pool so that a burst of logins
+    can only occupy ``max_workers`` cores and never every request thread.
+    """
+
+    def __init__(self, hasher, max_workers=2):
+        self.hasher = hasher
+        self.hashers = {h.algorithm: h for h in (ScryptHasher(), PBKDF2Hasher())}
+        self.hashers[hasher.algorithm] = hasher
+        self.legacy = LegacySHA256Hasher()
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _run(self, fn, *args):
+        # The pool (and concurrent.futures) is only loaded on the first login or signup
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='password-kdf')
+        return self._executor.submit(fn, *args).result()
+
+    def _identify(self, encoded):
+        algorithm = encoded.split('$', 1)[0] if '$' in encoded else self.legacy.algorithm
+        if algorithm == self.legacy.algorithm:
+            return self.legacy
+        return self.hashers.get(algorithm)
+
+    def hash(self, password):
+        return self._run(self.hasher.encode, password)
+
+    def verify(self, password, encoded):
+        """Return ``(matches, needs_rehash)`` for a stored hash string."""
+        hasher = self._identify(encoded)
+        if hasher is None:
+            return False, False
+        if hasher is self.legacy:
+            # A single SHA-256 is cheap enough to run inline
+            matches = hasher.verify(password, encoded)
+        else:
+            matches = self._run(hasher.verify, password, encoded)
+        needs_rehash = matches and (hasher is not self.hasher or hasher.needs_rehash(encoded))
+        return matches, needs_rehash
+
+
+def hasher_from_env(environ=os.environ):
+    if environ.get('PASSWORD_HASHER', 'scrypt') == 'pbkdf2':
+        return PBKDF2Hasher(iterations=int(environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000)))
+    return ScryptHasher(n=int(environ.get('PASSWORD_SCRYPT_N', 2 ** 14)),
+                        r=int(environ.get('PASSWORD_SCRYPT_R', 8)),
+                        p=int(environ.get('PASSWORD_SCRYPT_P', 1)))
@@ -0,0 +1,171 @@
+import threading
+import time
+
+# Token buckets for throttling login and signup attempts. A bucket holds up
+# to ``capacity`` tokens and refills at ``capacity / period`` per second; a
+# request takes one token or is rejected with the seconds until one is back.
+# A bucket that has refilled completely is the same as no bucket at all, so
+# idle buckets are dropped and memory only holds recently active keys.
+
+
+def parse_limit(value):
+    """Parse ``"10/60"`` (10 requests per 60 seconds) into (capacity, period)."""
+    count, _, seconds = value.partition('/')
+    capacity, period = int(count), float(seconds or 60)
+    if capacity < 1 or period <= 0:
+        raise ValueError(f'Invalid rate limit {value!r}')
+    return capacity, period
+
+
+class MemoryRateLimitStore:
+    """Per-process buckets in a dict kept in least-recently-used order."""
+
+    def __init__(self, max_keys=100000, sweep_interval=60.0):
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        # key -> (tokens, updated_at, full_at)
+        self._buckets = {}
+        self._last_sweep = time.monotonic()
+        self._allowed = 0
+        self._rejected = 0
+
+    def take(self, key, capacity, period):
+        """Take a token; returns 0.0 when allowed, else seconds until a retry can succeed."""
+        rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            # Popping and re-inserting keeps the dict ordered by last use
+            bucket = self._buckets.pop(key, None)
+            tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+                self._allowed += 1
+            else:
+                retry_after = (1 - tokens) / rate
+                self._rejected += 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > self.max_keys or now - self._last_sweep > self.sweep_interval:
+                self._sweep(now)
+        return retry_after
+
+    def refund(self, key, capacity, period):
+        """Give back one token taken by ``take`` for an attempt that should not count."""
+        rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate + 1)
+                self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+
+    def _sweep(self, now):
+        # Called with the lock held. Oldest first: drop refilled buckets, then
+        # the least recently used ones if a flood of keys is still over the cap.
+        self._last_sweep = now
+        for key, bucket in list(self._buckets.items()):
+            if bucket[2] > now and len(self._buckets) <= self.max_keys:
+                break
+            del self._buckets[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'allowed': self._allowed,
+                'rejected': self._rejected,
+                'keys': len(self._buckets),
+            }
+
+
+class SQLiteRateLimitStore:
+    """Buckets in a SQLite table shared by every process using the same file.
+
+    Each ``take`` is a single UPSERT ... RETURNING, so concurrent processes
+    cannot both spend the last token. A rejected key is remembered in memory
+    until it may retry, so repeated rejections never touch the database.
+    """
+
+    def __init__(self, pool, sweep_interval=60.0, max_blocked=100000):
+        self.pool = pool
+        self.sweep_interval = sweep_interval
+        self.max_blocked = max_blocked
+        self._lock = threading.Lock()
+        self._blocked = {}
+        self._last_sweep = 0.0
+        self._allowed = 0
+        self._rejected = 0
+        with pool.connection() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS rate_limit (
+                                key TEXT PRIMARY KEY,
+                                tokens REAL NOT NULL,
+                                updated_at REAL NOT NULL,
+                                full_at REAL NOT NULL,
+                                allowed INTEGER NOT NULL
+                            ) WITHOUT ROWID''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_rate_limit_full_at ON rate_limit (full_at)')
+            conn.commit()
+
+    def take(self, key, capacity, period):
+        now = time.time()
+        with self._lock:
+            blocked_until = self._blocked.get(key)
+            if blocked_until is not None:
+                if blocked_until > now:
+                    self._rejected += 1
+                    return blocked_until - now
+                del self._blocked[key]
+        rate = capacity / period
+        params = {'key': key, 'capacity': capacity, 'rate': rate, 'now': now}
+        with self.pool.connection() as conn:
+            tokens, allowed = conn.execute('''
+                WITH refill AS (
+                    SELECT MIN(:capacity, COALESCE(tokens + (:now - updated_at) * :rate, :capacity)) AS tokens
+                    FROM (SELECT 1) LEFT JOIN rate_limit ON key = :key
+                )
+                INSERT INTO rate_limit (key, tokens, updated_at, full_at, allowed)
+                SELECT :key, tokens - (tokens >= 1), :now,
+                       :now + (:capacity - tokens + (tokens >= 1)) / :rate, tokens >= 1
+                FROM refill WHERE true
+                ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at,
+                                                full_at = excluded.full_at, allowed = excluded.allowed
+                RETURNING tokens, allowed''', params).fetchone()
+            conn.commit()
+            if now - self._last_sweep > self.sweep_interval:
+                self._last_sweep = now
+                conn.execute('DELETE FROM rate_limit WHERE full_at < ?', (now,))
+                conn.commit()
+        if allowed:
+            with self._lock:
+                self._allowed += 1
+            return 0.0
+        retry_after = (1 - tokens) / rate
+        with self._lock:
+            self._rejected += 1
+            if len(self._blocked) >= self.max_blocked:
+                self._blocked = {k: until for k, until in self._blocked.items() if until > now}
+            if len(self._blocked) < self.max_blocked:
+                self._blocked[key] = now + retry_after
+        return retry_after
+
+    def refund(self, key, capacity, period):
+        params = {'key': key, 'capacity': capacity, 'rate': capacity / period, 'now': time.time()}
+        with self._lock:
+            self._blocked.pop(key, None)
+        with self.pool.connection() as conn:
+            # SET expressions all see the old row, so tokens is refilled once in both
+            conn.execute('''UPDATE rate_limit
+                            SET tokens = MIN(:capacity, tokens + (:now - updated_at) * :rate + 1),
+                                full_at = :now + (:capacity - MIN(:capacity, tokens + (:now - updated_at) * :rate + 1))
+                                          / :rate,
+                                updated_at = :now
+                            WHERE key = :key''', params)
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'allowed': self._allowed,
+                'rejected': self._rejected,
+                'blocked': len(self._blocked),
+            }
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+from archive import each_partition
+from db import write_transaction
+
+# Sales summaries kept up to date by record_order() inside the checkout
+# transaction, so reports read O(days) rows instead of scanning every order.
+# rebuild() recomputes them from orders/order_items; check() compares the two.
+
+# Recomputed from the hot tables and, one at a time, every archive partition;
+# the per-schema results are added up (archiving never touches the summaries).
+RECOMPUTE = {
+    'sales_daily': '''SELECT date(o.created_at) AS day, COUNT(DISTINCT o.id) AS orders,
+                             COALESCE(SUM(oi.quantity), 0) AS units,
+                             COALESCE(SUM(oi.quantity * oi.price), 0) AS revenue
+                      FROM {schema}.orders o
+                      LEFT JOIN {schema}.order_items oi ON oi.order_id = o.id
+                      GROUP BY date(o.created_at)''',
+    'sales_by_destination': '''SELECT destination_id, SUM(quantity) AS units,
+                                      SUM(quantity * price) AS revenue
+                               FROM {schema}.order_items
+                               GROUP BY destination_id''',
+    'sales_by_payment': '''SELECT payment_method, COUNT(*) AS orders, SUM(total_amount) AS revenue
+                           FROM {schema}.orders
+                           GROUP BY payment_method''',
+}
+
+
+def _add(conn, schema, totals):
+    # An order and its items are always in the same schema, so per-schema results just add up
+    for table, query in RECOMPUTE.items():
+        rows = totals[table]
+        for key, *values in conn.execute(query.format(schema=schema)):
+            rows[key] = [a + b for a, b in zip(rows[key], values)] if key in rows else values
+
+
+def _archived_totals(conn, archive_dir):
+    totals = {table: {} for table in RECOMPUTE}
+    if archive_dir:
+        for schema in each_partition(conn, archive_dir):
+            _add(conn, schema, totals)
+    return totals
+
+
+def record_order(conn, created_at, payment_method, cart_items):
+    # Caller owns the transaction, so the summaries commit or roll back with the order.
+    # One upsert per summary table: lines are totalled per destination here first.
+    units = sum(item['quantity'] for item in cart_items)
+    revenue = sum(item['price'] * item['quantity'] for item in cart_items)
+    conn.execute('''INSERT INTO sales_daily (day, orders, units, revenue) VALUES (?, 1, ?, ?)
+                    ON CONFLICT (day) DO UPDATE SET orders = orders + 1,
+                                                    units = units + excluded.units,
+                                                    revenue = revenue + excluded.revenue''',
+                 (created_at[:10], units, revenue))
+    per_destination = {}
+    for item in cart_items:
+        totals = per_destination.setdefault(item['destination_id'], [0, 0])
+        totals[0] += item['quantity']
+        totals[1] += item['price'] * item['quantity']
+    if per_destination:
+        conn.execute(f'''INSERT INTO sales_by_destination (destination_id, units, revenue)
+                         VALUES {', '.join(['(?, ?, ?)'] * len(per_destination))}
+                         ON CONFLICT (destination_id) DO UPDATE SET units = units + excluded.units,
+                                                                    revenue = revenue + excluded.revenue''',
+                     [value for destination_id, (dest_units, dest_revenue) in per_destination.items()
+                      for value in (destination_id, dest_units, dest_revenue)])
+    conn.execute('''INSERT INTO sales_by_payment (payment_method, orders, revenue) VALUES (?, 1, ?)
+                    ON CONFLICT (payment_method) DO UPDATE SET orders = orders + 1,
+                                                               revenue = revenue + excluded.revenue''',
+                 (payment_method, revenue))
+
+
+def rebuild(conn, archive_dir=None):
+    """Recompute every summary table from scratch in one transaction.
+
+    Partitions in ``archive_dir`` are read first, outside the transaction
+    (they cannot be attached inside one), so do not run this during an archive run.
+    """
+    totals = _archived_totals(conn, archive_dir)
+    with write_transaction(conn):
+        _add(conn, 'main', totals)
+        for table, rows in totals.items():
+            conn.execute(f'DELETE FROM {table}')
+            rows = [(key, *values) for key, values in rows.items()]
+            if rows:
+                conn.executemany(f'INSERT INTO {table} VALUES ({", ".join("?" * len(rows[0]))})', rows)
+
+
+def check(conn, archive_dir=None):
+    # Returns (table, key, stored, recomputed) for every summary row that has drifted
+    totals = _archived_totals(conn, archive_dir)
+    _add(conn, 'main', totals)
+    problems = []
+    for table, rows in totals.items():
+        stored = {row[0]: tuple(row)[1:] for row in conn.execute(f'SELECT * FROM {table}')}
+        expected = {key: tuple(values) for key, values in rows.items()}
+        for key in stored.keys() | expected.keys():
+            have, want = stored.get(key), expected.get(key)
+            if have is None or want is None or any(abs(a - b) > 0.005 for a, b in zip(have, want)):
+                problems.append((table, key, have, want))
+    return problems
+
+
+def sales_report(conn, days=30, top=10):
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    daily = [dict(row) for row in conn.execute('''SELECT day, orders, units, revenue FROM sales_daily
+                                                  WHERE day >= ? ORDER BY day''', (since,))]
+    destinations = [dict(row) for row in conn.execute('''SELECT destination_id, units, revenue
+                                                         FROM sales_by_destination
+                                                         ORDER BY revenue DESC LIMIT ?''', (top,))]
+    # Only a handful of payment methods exist, so sort them here rather than in SQLite
+    payments = sorted((dict(row) for row in conn.execute('SELECT payment_method, orders, revenue FROM sales_by_payment')),
+                      key=lambda row: row['revenue'], reverse=True)
+    return {
+        'since': since,
+        'days': days,
+        'totals': {
+            'orders': sum(day['orders'] for day in daily),
+            'units': sum(day['units'] for day in daily),
+            'revenue': round(sum(day['revenue'] for day in daily), 2),
+        },
+        'daily': daily,
+        'top_destinations': destinations,
+        'payment_methods': payments,
+    }
@@ -0,0 +1,98 @@
+import bisect
+import re
+import threading
+
+# Full-text search over the destination_fts index (see migrations.add_destination_search)
+# and an in-memory prefix index for typeahead suggestions.
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return WORD_RE.findall(text.lower())
+
+
+def fts_query(text):
+    # Quote every token so user input can never inject FTS5 syntax; the last
+    # token is a prefix so results update while the user is still typing
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def has_fts(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'destination_fts'").fetchone() is not None
+
+
+def search_destinations(conn, text, page=1, per_page=12):
+    """Return ``(destinations, has_next)`` ranked by BM25, name weighted above description."""
+    match = fts_query(text)
+    if match is None:
+        return [], False
+    offset = (max(page, 1) - 1) * per_page
+    if has_fts(conn):
+        rows = conn.execute('''SELECT d.*
+                               FROM destination_fts
+                               JOIN destination d ON d.id = destination_fts.rowid
+                               WHERE destination_fts MATCH ?
+                               ORDER BY destination_fts.rank
+                               LIMIT ? OFFSET ?''', (match, per_page + 1, offset)).fetchall()
+    else:
+        pattern = f'%{text.strip()}%'
+        rows = conn.execute('''SELECT * FROM destination
+                               WHERE name LIKE ? OR description LIKE ?
+                               ORDER BY name LIMIT ? OFFSET ?''',
+                            (pattern, pattern, per_page + 1, offset)).fetchall()
+    destinations = [dict(row) for row in rows[:per_page]]
+    return destinations, len(rows) > per_page
+
+
+class PrefixIndex:
+    """Sorted (word, name, id) tuples answering prefix lookups with bisect.
+
+    Every word of a destination name is indexed, so "york" suggests
+    "New York City". The index is rebuilt when the catalog generation changes.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._generation = None
+        self._entries = []
+
+    def _build(self, conn, generation):
+        entries = []
+        # Only ids and names are needed, so skip the catalog's full rows
+        for id, name in conn.execute('SELECT id, name FROM destination'):
+            for word in set(tokenize(name)):
+                entries.append((word, name.lower(), id, name))
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._generation = generation
+
+    def suggest(self, conn, text, limit=8):
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        generation = self.catalog.current_generation()
+        if generation != self._generation:
+            self._build(conn, generation)
+        entries = self._entries
+        prefix, others = tokens[-1], tokens[:-1]
+        results = []
+        seen = set()
+        position = bisect.bisect_left(entries, (prefix,))
+        while position < len(entries) and len(results) < limit:
+            word, name_lower, id, name = entries[position]
+            if not word.startswith(prefix):
+                break
+            position += 1
+            if id in seen or any(other not in name_lower for other in others):
+                continue
+            seen.add(id)
+            results.append({'id': id, 'name': name})
+        return results
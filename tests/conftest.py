@@ -0,0 +1,127 @@
+import itertools
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+# app.py reads its configuration when imported, so point it at a throwaway
+# database (and cheap password hashing) before any test imports it
+WORKDIR = tempfile.mkdtemp(prefix='dreamtravels-test-')
+os.environ['DB_PATH'] = os.path.join(WORKDIR, 'travel.db')
+os.environ['IMAGE_CACHE_DIR'] = os.path.join(WORKDIR, 'images')
+os.environ['JINJA_CACHE_DIR'] = ''
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+os.environ['PASSWORD_HASHER'] = 'pbkdf2'
+os.environ['PASSWORD_PBKDF2_ITERATIONS'] = '1000'
+os.environ.pop('ORDER_QUEUE_ENABLED', None)
+os.environ.pop('METRICS_TOKEN', None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_names = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    import app
+    app.init_db()
+    app.add_sample_destinations()
+    app.add_admin_user()
+    return app
+
+
+@pytest.fixture
+def conn(app_module):
+    with app_module.db_pool.connection() as conn:
+        yield conn
+
+
+@pytest.fixture
+def make_destination(app_module, conn):
+    def make(capacity=50, price=100.0):
+        destination_id = conn.execute('''INSERT INTO destination (name, description, price, image_url, capacity)
+                                         VALUES (?, ?, ?, ?, ?)''',
+                                      (f'Test destination {next(_names)}', 'A trip made up by the tests.', price,
+                                       'https://images.example.com/test.jpg', capacity)).lastrowid
+        conn.commit()
+        app_module.catalog.invalidate()
+        return destination_id
+    return make
+
+
+@pytest.fixture
+def make_user(app_module, conn):
+    # Returns (user id, username); every user's password is "secret"
+    def make(password_hash=None):
+        username = f'user{next(_names)}'
+        user_id = conn.execute('INSERT INTO user (username, email, password, created_at) VALUES (?, ?, ?, ?)',
+                               (username, f'{username}@example.com',
+                                password_hash or app_module.hash_password('secret'),
+                                '2026-01-01 00:00:00')).lastrowid
+        conn.commit()
+        return user_id, username
+    return make
+
+
+@pytest.fixture
+def login(app_module):
+    # A test client logged in as ``username``
+    def login(username, password='secret'):
+        client = app_module.app.test_client()
+        response = client.post('/login', data={'username': username, 'password': password})
+        assert response.status_code == 302, response.data
+        return client
+    return login
+
+
+@pytest.fixture
+def admin_client(login):
+    return login('admin', 'admin123')
+
+
+@pytest.fixture
+def wait_for():
+    def wait_for(predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() > deadline:
+                raise AssertionError('Timed out waiting for condition')
+            time.sleep(0.01)
+    return wait_for
+
+
+@pytest.fixture
+def order_for():
+    # An order as the checkout hands it to OrderQueue.submit()
+    from orders import generate_order_number
+
+    def order_for(user_id, destination_id, quantity=1, cart_id=None):
+        return {
+            'order_number': generate_order_number(),
+            'user_id': user_id,
+            'cart_id': cart_id,
+            'payment_method': 'Credit Card',
+            'cart_items': [{'destination_id': destination_id, 'quantity': quantity, 'price': 100.0,
+                            'travel_date': '2030-05-01'}],
+        }
+    return order_for
+
+
+@pytest.fixture
+def gate_batches():
+    # Makes the order writer wait on gates[n] before committing its n-th batch
+    def gate_batches(order_queue, count):
+        gates = [threading.Event() for _ in range(count)]
+        calls = iter(gates)
+        commit_batch = order_queue._commit_batch
+
+        def gated(batch):
+            next(calls, threading.Event()).wait(5)
+            commit_batch(batch)
+
+        order_queue._commit_batch = gated
+        return gates
+    return gate_batches
@@ -0,0 +1,117 @@
+import pytest
+
+TRAVEL_DATE = '2030-05-01'
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def catalog_ids(conn):
+    return [row[0] for row in conn.execute('SELECT id FROM destination ORDER BY id')]
+
+
+def test_fields_select_the_keys_returned(client, make_destination):
+    destination_id = make_destination(price=123.0)
+    response = client.get(f'/api/v1/destinations?ids={destination_id}&fields=name,price')
+    assert response.status_code == 200
+    [destination] = response.get_json()['destinations']
+    # id always comes along
+    assert set(destination) == {'id', 'name', 'price'}
+    assert destination['price'] == 123.0
+
+
+def test_unknown_field_is_rejected(client):
+    response = client.get('/api/v1/destinations?fields=name,password')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Unknown field(s): password'}
+
+
+def test_cursor_pagination_walks_the_whole_catalog(client, conn, make_destination):
+    make_destination()
+    seen, cursor = [], ''
+    while True:
+        response = client.get(f'/api/v1/destinations?limit=3&fields=id&cursor={cursor}')
+        assert response.status_code == 200
+        body = response.get_json()
+        assert len(body['destinations']) <= 3
+        seen += [destination['id'] for destination in body['destinations']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert seen == catalog_ids(conn)
+    assert client.get('/api/v1/destinations?cursor=abc').status_code == 400
+
+
+def test_batch_lookup_lists_missing_ids(client, make_destination):
+    first, second = make_destination(), make_destination()
+    response = client.get(f'/api/v1/destinations?ids={second},999999,{first}&fields=name')
+    body = response.get_json()
+    assert [destination['id'] for destination in body['destinations']] == [second, first]
+    assert body['missing'] == [999999]
+    assert client.get('/api/v1/destinations?ids=1,x').status_code == 400
+
+
+def test_etag_answers_not_modified_until_the_response_changes(app_module, client, conn, make_destination):
+    destination_id = make_destination()
+    url = f'/api/v1/destinations?ids={destination_id}'
+    response = client.get(url)
+    etag = response.headers['ETag']
+    assert 'must-revalidate' in response.headers['Cache-Control']
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    # Another destination changing the catalog leaves this response (and its ETag) alone
+    make_destination()
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    conn.execute('UPDATE destination SET price = price + 1 WHERE id = ?', (destination_id,))
+    conn.commit()
+    app_module.catalog.invalidate()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def order(destination_id, quantity=1):
+    return {'payment_method': 'Credit Card',
+            'items': [{'destination_id': destination_id, 'quantity': quantity, 'travel_date': TRAVEL_DATE,
+                       'price': 0.01}]}
+
+
+def test_creating_an_order_needs_a_session(client, make_destination):
+    response = client.post('/api/v1/orders', json=order(make_destination()))
+    assert response.status_code == 401
+    assert 'error' in response.get_json()
+
+
+def test_order_is_priced_from_the_catalog(make_destination, make_user, login):
+    destination_id = make_destination(price=250.0)
+    client = login(make_user()[1])
+    response = client.post('/api/v1/orders', json=order(destination_id, quantity=2))
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body['status'], body['total_amount'], body['items']) == ('Completed', 500.0, 1)
+    assert client.get(response.headers['Location']).get_json()['status'] == 'Completed'
+
+
+def test_sold_out_order_is_a_conflict(conn, make_destination, make_user, login):
+    destination_id = make_destination(capacity=1)
+    client = login(make_user()[1])
+    response = client.post('/api/v1/orders', json=order(destination_id, quantity=2))
+    assert response.status_code == 409
+    assert response.get_json()['error'].startswith('Sold out')
+    assert conn.execute('SELECT COUNT(*) FROM order_items WHERE destination_id = ?',
+                        (destination_id,)).fetchone()[0] == 0
+
+
+def test_malformed_order_is_rejected(make_destination, make_user, login):
+    client = login(make_user()[1])
+    assert client.post('/api/v1/orders', json={'payment_method': 'Credit Card', 'items': []}).status_code == 400
+    response = client.post('/api/v1/orders', json={'payment_method': 'Credit Card',
+                                                    'items': [{'destination_id': 1, 'travel_date': 'soon'}]})
+    assert response.status_code == 400
+    assert client.post('/api/v1/orders', json=order(999999)).status_code == 404
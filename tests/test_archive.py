@@ -0,0 +1,134 @@
+import csv
+import io
+import sqlite3
+
+import pytest
+
+from archive import archive, each_partition, partitions
+from export import iter_export
+from migrations import migrate
+from orders import create_order
+from reports import check, rebuild
+
+
+@pytest.fixture
+def db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'archive.db'))
+    migrate(conn)
+    conn.execute("INSERT INTO destination (name, description, price, capacity) VALUES ('Lisbon', 'Sunny.', 100.0, 1000)")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def archive_dir(tmp_path):
+    return str(tmp_path / 'archive')
+
+
+def order_at(conn, created_at, user_id=1, quantity=1):
+    order_id, order_number = create_order(conn, user_id, [{'destination_id': 1, 'quantity': quantity, 'price': 100.0,
+                                                           'travel_date': '2030-05-01'}], 'Credit Card')
+    conn.execute('UPDATE orders SET created_at = ? WHERE id = ?', (created_at, order_id))
+    conn.commit()
+    return order_id, order_number
+
+
+def booking_at(conn, created_at):
+    booking_id = conn.execute('''INSERT INTO booking (name, email, destination_id, travel_date, created_at)
+                                 VALUES ('Ann', 'ann@example.com', 1, '2030-05-01', ?)''', (created_at,)).lastrowid
+    conn.commit()
+    return booking_id
+
+
+def counters(conn):
+    return dict(conn.execute('SELECT name, value FROM admin_counters'))
+
+
+def test_archive_moves_old_rows_into_yearly_partitions(db, archive_dir):
+    order_at(db, '2023-03-01 10:00:00')
+    order_at(db, '2024-06-01 10:00:00', quantity=2)
+    order_at(db, '2025-02-01 10:00:00')
+    booking_at(db, '2024-07-01 10:00:00')
+    rebuild(db)
+    before = counters(db)
+
+    moved = archive(db, '2025-01-01', archive_dir)
+    assert moved == {'orders': 2, 'order_items': 2, 'bookings': 1}
+    # No empty partition for the cutoff's own year
+    assert [year for year, _ in partitions(archive_dir)] == [2024, 2023]
+    assert db.execute('SELECT COUNT(*) FROM orders').fetchone()[0] == 1
+    assert counters(db) == before
+    assert check(db, archive_dir) == []
+    # Nothing left to move the second time
+    assert archive(db, '2025-01-01', archive_dir) == {'orders': 0, 'order_items': 0, 'bookings': 0}
+
+
+def test_readers_see_more_partitions_than_sqlite_can_attach(db, archive_dir):
+    years = range(2010, 2025)
+    ids = [order_at(db, f'{year}-05-01 12:00:00')[0] for year in years]
+    archive(db, '2025-01-01', archive_dir)
+    assert len(partitions(archive_dir)) == len(years) > 10
+
+    export = list(csv.reader(io.StringIO(''.join(iter_export(db, 'orders', archive_dir=archive_dir)))))
+    assert [int(row[0]) for row in export[1:]] == ids
+    db.execute('DELETE FROM sales_daily')
+    db.commit()
+    assert len(check(db, archive_dir)) == len(years)
+    rebuild(db, archive_dir)
+    assert check(db, archive_dir) == []
+    # Every partition was detached again
+    assert [row[1] for row in db.execute('PRAGMA database_list')] == ['main']
+
+
+def test_each_partition_skips_years_outside_the_range(db, archive_dir):
+    for year in (2021, 2022, 2023):
+        order_at(db, f'{year}-05-01 12:00:00')
+    archive(db, '2024-01-01', archive_dir)
+    assert list(each_partition(db, archive_dir, since='2022-02-01', until='2022-12-31')) == ['archive_2022']
+    assert list(each_partition(db, archive_dir, oldest_first=True)) == ['archive_2021', 'archive_2022',
+                                                                         'archive_2023']
+
+
+@pytest.fixture
+def archived(app_module, conn, tmp_path, monkeypatch):
+    # Archives the shared database's rows from before 2000 (only ever created here)
+    archive_dir = str(tmp_path / 'archive')
+    monkeypatch.setattr(app_module, 'ARCHIVE_DIR', archive_dir)
+    return lambda: archive(conn, '2000-01-01', archive_dir)
+
+
+def test_archived_order_status(app_module, conn, make_destination, make_user, login, archived):
+    user_id, username = make_user()
+    destination_id = make_destination()
+    order_id, order_number = create_order(conn, user_id, [{'destination_id': destination_id, 'quantity': 1,
+                                                           'price': 100.0, 'travel_date': '2030-05-01'}],
+                                          'Credit Card')
+    conn.execute("UPDATE orders SET created_at = '1999-05-01 12:00:00' WHERE id = ?", (order_id,))
+    conn.commit()
+    archived()
+    response = login(username).get(f'/order/{order_number}/status')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'Completed'
+
+
+def test_admin_deletes_reach_archived_bookings(app_module, conn, make_destination, admin_client, archived):
+    destination_id = make_destination()
+    booking_id = conn.execute('''INSERT INTO booking (name, email, destination_id, travel_date, created_at)
+                                 VALUES ('Ann', 'ann@example.com', ?, '2030-05-01', '1999-05-01 12:00:00')''',
+                              (destination_id,)).lastrowid
+    conn.commit()
+    archived()
+    bookings = counters(conn)['bookings']
+    # Listed on the dashboard from its partition
+    assert b'ann@example.com' in admin_client.get('/admin?date_to=1999-12-31').data
+
+    response = admin_client.post(f'/admin/destination/delete/{destination_id}', follow_redirects=True)
+    assert b'It has 1 bookings' in response.data
+    response = admin_client.post(f'/admin/booking/delete/{booking_id}', follow_redirects=True)
+    assert b'Booking deleted successfully' in response.data
+    assert counters(conn)['bookings'] == bookings - 1
+    response = admin_client.post(f'/admin/booking/delete/{booking_id}', follow_redirects=True)
+    assert b'Booking not found' in response.data
+    response = admin_client.post(f'/admin/destination/delete/{destination_id}', follow_redirects=True)
+    assert b'Destination deleted successfully' in response.data
@@ -0,0 +1,104 @@
+import re
+import sqlite3
+
+import pytest
+
+from cart_store import MemoryCartStore, SQLiteCartStore
+from migrations import migrate
+
+TRAVEL_DATE = '2030-05-01'
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryCartStore()
+        return
+    conn = sqlite3.connect(str(tmp_path / 'carts.db'))
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    yield SQLiteCartStore(lambda: conn)
+    conn.close()
+
+
+def line(destination_id, quantity=1, travel_date=TRAVEL_DATE):
+    return {'destination_id': destination_id, 'travel_date': travel_date, 'quantity': quantity, 'price': 100.0}
+
+
+def test_same_trip_merges_into_one_line(store):
+    store.add('cart', line(1))
+    store.add('cart', line(2))
+    store.add('cart', line(1, quantity=2))
+    store.add('cart', line(1, travel_date='2030-06-01'))
+    lines = store.load('cart')
+    assert sorted(lines) == [(1, TRAVEL_DATE), (1, '2030-06-01'), (2, TRAVEL_DATE)]
+    assert lines[(1, TRAVEL_DATE)]['quantity'] == 3
+    # Other carts are separate
+    assert store.load('other') == {}
+
+
+def test_remove_and_clear(store):
+    store.add('cart', line(1))
+    store.add('cart', line(2))
+    store.remove('cart', (1, TRAVEL_DATE))
+    assert list(store.load('cart')) == [(2, TRAVEL_DATE)]
+    store.clear('cart')
+    assert store.load('cart') == {}
+
+
+def test_expired_carts_are_gone(store):
+    store.ttl = -1
+    store.add('cart', line(1))
+    assert store.load('cart') == {}
+
+
+def test_memory_store_evicts_the_least_recently_used_cart():
+    store = MemoryCartStore(max_carts=2)
+    store.add('a', line(1))
+    store.add('b', line(1))
+    store.add('a', line(2))
+    store.add('c', line(1))
+    assert store.load('b') == {}
+    assert len(store.load('a')) == 2
+
+
+def cart_quantities(client):
+    page = client.get('/cart').data.decode()
+    return [int(n) for n in re.findall(r'(\d+) person\(s\)', page)]
+
+
+def add(client, destination_id, quantity=1):
+    return client.post(f'/add-to-cart/{destination_id}', data={'travel_date': TRAVEL_DATE, 'quantity': quantity})
+
+
+def test_cart_add_update_and_remove(app_module, make_destination, make_user, login):
+    first, second = make_destination(), make_destination()
+    client = login(make_user()[1])
+    add(client, first)
+    add(client, second, 2)
+    # Adding the same trip again updates the existing line
+    add(client, first, 2)
+    assert cart_quantities(client) == [3, 2]
+
+    response = client.post('/cart/remove/0', follow_redirects=True)
+    assert b'Item removed from cart' in response.data
+    assert cart_quantities(client) == [2]
+    # A stale index is ignored
+    client.post('/cart/remove/5')
+    assert cart_quantities(client) == [2]
+
+
+def test_session_cookie_only_carries_the_cart_id(app_module, make_destination, make_user, login):
+    destination_id = make_destination()
+    client = login(make_user()[1])
+    for _ in range(20):
+        add(client, destination_id)
+    cookie = client.get_cookie('session')
+    session = app_module.app.session_interface.get_signing_serializer(app_module.app).loads(cookie.value)
+    assert 'cart' not in session and len(session['cart_id']) == 32
+    assert len(cookie.value) < 300
+
+    # Another client presenting just that cookie (e.g. the next request on another worker) sees the cart
+    other = app_module.app.test_client()
+    other.set_cookie('session', cookie.value)
+    assert cart_quantities(other) == [20]
@@ -0,0 +1,103 @@
+import base64
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from images import IMMUTABLE, ImageCache, source_version
+
+# A 1x1 PNG
+PNG = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        ImageHandler.requests.append(self.path)
+        if self.path.startswith('/ok.png'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(PNG)))
+            self.end_headers()
+            self.wfile.write(PNG)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def image_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+@pytest.fixture
+def image_cache(app_module, tmp_path, monkeypatch):
+    monkeypatch.setenv('no_proxy', '127.0.0.1,localhost')
+    cache = ImageCache(str(tmp_path / 'images'), timeout=2)
+    monkeypatch.setattr(app_module, 'image_cache', cache)
+    ImageHandler.requests.clear()
+    return cache
+
+
+@pytest.fixture
+def destination_with_image(conn, make_destination):
+    def make(url):
+        destination_id = make_destination()
+        conn.execute('UPDATE destination SET image_url = ? WHERE id = ?', (url, destination_id))
+        conn.commit()
+        return destination_id
+    return make
+
+
+def test_resized_image_is_served_immutable(app_module, image_server, image_cache, destination_with_image):
+    url = f'{image_server}/ok.png'
+    destination_id = destination_with_image(url)
+    client = app_module.app.test_client()
+
+    response = client.get(f'/img/{destination_id}/400?v={source_version(url)}')
+    assert response.status_code == 200
+    assert response.data == PNG
+    assert response.headers['Cache-Control'] == IMMUTABLE
+
+    # Served from disk the second time; without the version it may only be cached briefly
+    response = client.get(f'/img/{destination_id}/400')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] != IMMUTABLE
+    assert ImageHandler.requests == ['/ok.png']
+
+
+def test_unknown_size_is_not_found(app_module, image_server, image_cache, destination_with_image):
+    destination_id = destination_with_image(f'{image_server}/ok.png')
+    assert app_module.app.test_client().get(f'/img/{destination_id}/123').status_code == 404
+    assert ImageHandler.requests == []
+
+
+def test_failed_fetch_redirects_to_the_source_and_is_remembered(app_module, image_server, image_cache,
+                                                                 destination_with_image):
+    url = f'{image_server}/missing.png'
+    destination_id = destination_with_image(url)
+    client = app_module.app.test_client()
+    for _ in range(3):
+        response = client.get(f'/img/{destination_id}/200')
+        assert response.status_code == 302
+        assert response.headers['Location'] == url
+    assert ImageHandler.requests == ['/missing.png']
+    assert image_cache.stats()['failure_hits'] == 2
+
+
+def test_cache_directory_is_created_on_first_use(tmp_path, image_server, monkeypatch):
+    monkeypatch.setenv('no_proxy', '127.0.0.1,localhost')
+    directory = str(tmp_path / 'lazy')
+    cache = ImageCache(directory)
+    assert not os.path.exists(directory)
+    with open(cache.get(f'{image_server}/ok.png', 100), 'rb') as f:
+        assert f.read() == PNG
+    assert os.path.isdir(directory)
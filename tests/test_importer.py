@@ -0,0 +1,128 @@
+import io
+import json
+import sqlite3
+
+import pytest
+
+from importer import import_file
+from migrations import migrate
+from search import search_destinations
+
+
+@pytest.fixture
+def db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'import.db'))
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def csv_file(*rows):
+    return io.StringIO('name,description,price,image_url\n' + ''.join(row + '\n' for row in rows))
+
+
+def ndjson_file(*records):
+    return io.StringIO(''.join((record if isinstance(record, str) else json.dumps(record)) + '\n'
+                               for record in records))
+
+
+def names(conn, text):
+    return sorted(row['name'] for row in search_destinations(conn, text)[0])
+
+
+def assert_search_index_matches(conn):
+    # Raises if the FTS index and the destination table disagree
+    conn.execute("INSERT INTO destination_fts (destination_fts) VALUES ('integrity-check')")
+    conn.commit()
+
+
+def catalog_version(conn):
+    return conn.execute('SELECT version FROM catalog_meta WHERE id = 1').fetchone()[0]
+
+
+def test_csv_import_counts_rows_and_reports_bad_lines(db):
+    result = import_file(db, csv_file('Lisbon,Sunny beaches,900,https://images.example.com/lisbon.jpg',
+                                      'Oslo,Fjords and snow,abc,',
+                                      ',No name,100,',
+                                      'Rome,Ancient ruins,1100,ftp://example.com/rome.jpg',
+                                      'Kyoto,Temples and gardens,1500,'), 'csv', chunk_size=2)
+    assert (result.rows, result.inserted, result.updated, result.unchanged, result.error_count) == (5, 2, 0, 0, 3)
+    assert result.errors == [{'line': 3, 'error': "price 'abc' is not a number"},
+                             {'line': 4, 'error': 'name is required'},
+                             {'line': 5, 'error': 'image_url must be an http(s) URL'}]
+    assert names(db, 'temples') == ['Kyoto']
+    assert_search_index_matches(db)
+
+
+def test_ndjson_import_reports_bad_lines(db):
+    result = import_file(db, ndjson_file({'name': 'Lisbon', 'description': 'Sunny beaches', 'price': 900},
+                                         '{not json',
+                                         '[1, 2]',
+                                         {'name': 'Oslo', 'description': 'Fjords', 'price': -1},
+                                         {'name': 'Kyoto', 'description': 'Temples', 'price': '1500.254'}), 'ndjson')
+    assert (result.rows, result.inserted, result.error_count) == (5, 2, 3)
+    assert [error['line'] for error in result.errors] == [2, 3, 4]
+    assert result.errors[1]['error'] == 'expected a JSON object'
+    assert db.execute("SELECT price FROM destination WHERE name = 'Kyoto'").fetchone()[0] == 1500.25
+
+
+def test_reimport_updates_changed_rows_and_the_search_index(db):
+    import_file(db, csv_file('Lisbon,Sunny beaches,900,', 'Oslo,Fjords and snow,1200,', 'Kyoto,Temples,1500,'), 'csv')
+    version = catalog_version(db)
+
+    result = import_file(db, csv_file('Lisbon,Rainy harbour,900,',
+                                      'Oslo,Fjords and snow,1300,',
+                                      'Kyoto,Temples,1500,',
+                                      'Reykjavik,Geysers and glaciers,1800,'), 'csv')
+    assert (result.inserted, result.updated, result.unchanged) == (1, 2, 1)
+    assert names(db, 'beaches') == []
+    assert names(db, 'harbour') == ['Lisbon']
+    assert names(db, 'geysers') == ['Reykjavik']
+    assert_search_index_matches(db)
+    # One version bump for the chunk, not one per row
+    assert catalog_version(db) == version + 1
+
+    # An unchanged file changes nothing, not even the version
+    result = import_file(db, csv_file('Kyoto,Temples,1500,'), 'csv')
+    assert (result.inserted, result.updated, result.unchanged) == (0, 0, 1)
+    assert catalog_version(db) == version + 1
+
+
+def test_repeated_name_in_one_chunk_keeps_the_index_consistent(db):
+    import_file(db, csv_file('Lisbon,Sunny beaches,900,'), 'csv')
+    import_file(db, csv_file('Lisbon,Rainy harbour,900,', 'Lisbon,Windy cliffs,900,'), 'csv')
+    assert names(db, 'cliffs') == ['Lisbon']
+    assert names(db, 'beaches') == names(db, 'harbour') == []
+    assert_search_index_matches(db)
+
+
+def test_triggers_are_back_on_after_an_import(db):
+    import_file(db, csv_file('Lisbon,Sunny beaches,900,', 'Oslo,Fjords,abc,'), 'csv')
+    assert db.execute('SELECT bulk_load FROM catalog_meta WHERE id = 1').fetchone()[0] == 0
+    version = catalog_version(db)
+
+    # Ordinary writes go through the per-row triggers again
+    db.execute("UPDATE destination SET description = 'Trams and tiles' WHERE name = 'Lisbon'")
+    db.execute("INSERT INTO destination (name, description, price) VALUES ('Porto', 'Port wine cellars', 700)")
+    destination_id = db.execute("SELECT id FROM destination WHERE name = 'Porto'").fetchone()[0]
+    db.execute('''INSERT INTO booking (name, email, destination_id, travel_date, created_at)
+                  VALUES ('Ann', 'ann@example.com', ?, '2030-05-01', '2026-01-01 00:00:00')''', (destination_id,))
+    db.commit()
+    assert catalog_version(db) == version + 2
+    assert names(db, 'trams') == ['Lisbon']
+    assert names(db, 'cellars') == ['Porto']
+    assert db.execute("SELECT value FROM admin_counters WHERE name = 'bookings'").fetchone()[0] == 1
+    assert_search_index_matches(db)
+
+
+def test_admin_upload_returns_the_counts(app_module, admin_client):
+    body = 'name,description,price\nUpload Test Town,Made up by the importer tests,250\nBroken,,1\n'
+    response = admin_client.post('/admin/destinations/import',
+                                 data={'file': (io.BytesIO(body.encode()), 'destinations.csv')},
+                                 headers={'Accept': 'application/json'})
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result['inserted'], result['error_count']) == (1, 1)
+    assert result['errors'] == [{'line': 3, 'error': 'description is required'}]
+    assert b'Upload Test Town' in admin_client.get('/search?q=importer').data
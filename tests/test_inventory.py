@@ -0,0 +1,98 @@
+import pytest
+
+from inventory import SoldOut, hold, release, reserve, seats_left
+from order_queue import OrderQueue
+
+TRAVEL_DATE = '2030-05-01'
+
+
+def sold(conn, destination_id):
+    row = conn.execute('SELECT sold FROM availability WHERE destination_id = ? AND travel_date = ?',
+                       (destination_id, TRAVEL_DATE)).fetchone()
+    return row[0] if row else 0
+
+
+def orders_for(conn, destination_id):
+    return conn.execute('SELECT COUNT(*) FROM order_items WHERE destination_id = ?', (destination_id,)).fetchone()[0]
+
+
+def add_to_cart(client, destination_id, quantity):
+    return client.post(f'/add-to-cart/{destination_id}', data={'travel_date': TRAVEL_DATE, 'quantity': quantity},
+                       follow_redirects=True)
+
+
+def test_holds_count_against_other_carts(conn, make_destination):
+    destination_id = make_destination(capacity=3)
+    hold(conn, 'cart-a', destination_id, TRAVEL_DATE, 2)
+    assert seats_left(conn, destination_id, TRAVEL_DATE) == 1
+    assert seats_left(conn, destination_id, TRAVEL_DATE, exclude_cart='cart-a') == 3
+    with pytest.raises(SoldOut):
+        hold(conn, 'cart-b', destination_id, TRAVEL_DATE, 2)
+    release(conn, 'cart-a')
+    hold(conn, 'cart-b', destination_id, TRAVEL_DATE, 2)
+
+
+def test_reserve_consumes_the_carts_own_holds(conn, make_destination):
+    destination_id = make_destination(capacity=2)
+    hold(conn, 'cart-a', destination_id, TRAVEL_DATE, 2)
+    items = [{'destination_id': destination_id, 'travel_date': TRAVEL_DATE, 'quantity': 2}]
+    # Another cart cannot take the held seats...
+    with pytest.raises(SoldOut):
+        reserve(conn, 'cart-b', items)
+    conn.rollback()
+    # ...but the holder can, and its holds are gone afterwards
+    reserve(conn, 'cart-a', items)
+    conn.commit()
+    assert sold(conn, destination_id) == 2
+    assert conn.execute("SELECT COUNT(*) FROM cart_holds WHERE cart_id = 'cart-a'").fetchone()[0] == 0
+
+
+def test_direct_checkout_cannot_oversell(app_module, conn, make_destination, make_user, login):
+    destination_id = make_destination(capacity=2)
+    first, second = login(make_user()[1]), login(make_user()[1])
+    add_to_cart(first, destination_id, 2)
+    response = add_to_cart(second, destination_id, 1)
+    assert b'Could not add' in response.data
+    assert b'Thank You' in first.post('/checkout', data={'payment_method': 'Credit Card'}).data
+    assert sold(conn, destination_id) == 2
+
+
+def test_queued_checkout_keeps_holds_until_the_writer_commits(app_module, conn, make_destination, make_user,
+                                                              login, gate_batches, tmp_path, monkeypatch,
+                                                              wait_for):
+    destination_id = make_destination(capacity=2)
+    order_queue = OrderQueue(app_module.db_pool, str(tmp_path / 'orders.journal'))
+    gates = gate_batches(order_queue, 1)
+    monkeypatch.setattr(app_module, 'order_queue', order_queue)
+    first, second = login(make_user()[1]), login(make_user()[1])
+
+    add_to_cart(first, destination_id, 2)
+    assert b'Thank You' in first.post('/checkout', data={'payment_method': 'Credit Card'}).data
+    # The first order is accepted but not yet written; its seats must stay taken
+    response = add_to_cart(second, destination_id, 2)
+    assert b'Could not add' in response.data
+    assert b'Your cart is empty' in second.post('/checkout', data={'payment_method': 'Credit Card'},
+                                                follow_redirects=True).data
+
+    gates[0].set()
+    wait_for(lambda: order_queue.stats()['committed'] == 1)
+    assert sold(conn, destination_id) == 2
+    assert orders_for(conn, destination_id) == 1
+    assert order_queue.stats()['failed'] == 0
+
+    # The first customer's next cart starts without the committed order's holds
+    add_to_cart(first, destination_id, 1)
+    assert conn.execute('SELECT COUNT(*) FROM cart_holds WHERE destination_id = ?',
+                        (destination_id,)).fetchone()[0] == 0
+
+
+def test_failed_queued_order_releases_its_holds(app_module, conn, make_destination, make_user, order_for, tmp_path,
+                                                wait_for):
+    destination_id = make_destination(capacity=2)
+    user_id, _ = make_user()
+    hold(conn, 'cart-failing', destination_id, TRAVEL_DATE, 2)
+    order_queue = OrderQueue(app_module.db_pool, str(tmp_path / 'orders.journal'))
+    # An unknown destination makes the order fail inside the writer
+    order_queue.submit(order_for(user_id, 10 ** 9, cart_id='cart-failing'))
+    wait_for(lambda: order_queue.stats()['failed'] == 1)
+    assert seats_left(conn, destination_id, TRAVEL_DATE) == 2
@@ -0,0 +1,13 @@
+def test_metrics_are_not_served_without_a_token(app_module, monkeypatch):
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    assert app_module.app.test_client().get('/metrics').status_code == 404
+
+
+def test_metrics_require_the_configured_token(app_module, monkeypatch):
+    monkeypatch.setenv('METRICS_TOKEN', 'scraper-token')
+    client = app_module.app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scraper-token'})
+    assert response.status_code == 200
+    assert b'_requests_total' in response.data
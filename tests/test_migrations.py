@@ -0,0 +1,145 @@
+import hashlib
+import sqlite3
+
+import pytest
+
+from migrations import ROUTE_QUERIES, SCHEMA_VERSION, check_query_plans, migrate, schema_version
+
+# The tables as the app created them before migrations existed (user_version 0)
+BASELINE_SCHEMA = '''
+CREATE TABLE destination
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     name TEXT NOT NULL,
+     description TEXT NOT NULL,
+     price REAL NOT NULL,
+     image_url TEXT);
+CREATE TABLE booking
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     name TEXT NOT NULL,
+     email TEXT NOT NULL,
+     destination_id INTEGER NOT NULL,
+     travel_date TEXT NOT NULL,
+     created_at TEXT NOT NULL,
+     FOREIGN KEY (destination_id) REFERENCES destination (id));
+CREATE TABLE user
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     username TEXT UNIQUE NOT NULL,
+     email TEXT UNIQUE NOT NULL,
+     password TEXT NOT NULL,
+     is_admin INTEGER DEFAULT 0,
+     created_at TEXT NOT NULL);
+CREATE TABLE orders
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     user_id INTEGER NOT NULL,
+     order_number TEXT NOT NULL,
+     total_amount REAL NOT NULL,
+     payment_method TEXT NOT NULL,
+     status TEXT NOT NULL,
+     created_at TEXT NOT NULL,
+     FOREIGN KEY (user_id) REFERENCES user (id));
+CREATE TABLE order_items
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     order_id INTEGER NOT NULL,
+     destination_id INTEGER NOT NULL,
+     quantity INTEGER NOT NULL,
+     price REAL NOT NULL,
+     travel_date TEXT NOT NULL,
+     FOREIGN KEY (order_id) REFERENCES orders (id),
+     FOREIGN KEY (destination_id) REFERENCES destination (id));
+'''
+
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'baseline.db'))
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute('''INSERT INTO destination (name, description, price, image_url)
+                    VALUES ('Paris, France', 'The City of Light.', 1200.0, 'https://images.example.com/paris.jpg')''')
+    # Passwords were unsalted SHA-256 back then
+    conn.execute('''INSERT INTO user (username, email, password, is_admin, created_at)
+                    VALUES ('admin', 'admin@dreamtravels.com', ?, 1, '2024-01-01 00:00:00')''',
+                 (hashlib.sha256(b'admin123').hexdigest(),))
+    conn.execute('''INSERT INTO orders (user_id, order_number, total_amount, payment_method, status, created_at)
+                    VALUES (1, 'ORD-1', 2400.0, 'Credit Card', 'Completed', '2024-02-01 10:00:00')''')
+    conn.execute('''INSERT INTO order_items (order_id, destination_id, quantity, price, travel_date)
+                    VALUES (1, 1, 2, 1200.0, '2024-06-01')''')
+    conn.execute('''INSERT INTO booking (name, email, destination_id, travel_date, created_at)
+                    VALUES ('Ann', 'ann@example.com', 1, '2024-06-01', '2024-02-01 11:00:00')''')
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_fresh_database_route_queries_use_indexes(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'fresh.db'))
+    assert migrate(conn) == SCHEMA_VERSION
+    assert check_query_plans(conn) == []
+    # Migrating again is a no-op
+    assert migrate(conn) == SCHEMA_VERSION
+
+
+def test_baseline_database_migrates_with_its_rows(app_module, baseline_db):
+    assert schema_version(baseline_db) == 0
+    assert migrate(baseline_db) == SCHEMA_VERSION
+    assert check_query_plans(baseline_db) == []
+
+    assert baseline_db.execute('SELECT name, price FROM destination').fetchall() == [('Paris, France', 1200.0)]
+    assert baseline_db.execute('SELECT order_number, total_amount FROM orders').fetchall() == [('ORD-1', 2400.0)]
+    assert baseline_db.execute('SELECT COUNT(*) FROM order_items').fetchone()[0] == 1
+    assert baseline_db.execute('SELECT COUNT(*) FROM booking').fetchone()[0] == 1
+    # Derived tables are backfilled from the existing rows
+    counters = dict(baseline_db.execute('SELECT name, value FROM admin_counters'))
+    assert (counters['orders'], counters['bookings'], counters['revenue']) == (1, 1, 2400.0)
+    assert baseline_db.execute("SELECT rowid FROM destination_fts WHERE destination_fts MATCH 'paris'").fetchall() == [(1,)]
+
+    # The legacy admin hash still verifies (and is flagged for an upgrade on the next login)
+    stored = baseline_db.execute("SELECT password FROM user WHERE username = 'admin'").fetchone()[0]
+    assert app_module.verify_password('admin123', stored) == (True, True)
+
+
+@pytest.fixture
+def traced(app_module, monkeypatch):
+    # Every statement the app's pooled connections run while the test is active
+    statements = set()
+    previous = app_module.db_pool.on_query
+
+    def record(sql, seconds):
+        statements.add(sql)
+        if previous is not None:
+            previous(sql, seconds)
+
+    monkeypatch.setattr(app_module.db_pool, 'on_query', record)
+    for conn in app_module.db_pool._idle:
+        monkeypatch.setattr(conn, 'on_query', record)
+    return statements
+
+
+def test_queries_the_routes_run_use_indexes(app_module, conn, make_destination, make_user, login, admin_client,
+                                            traced):
+    destination_id = make_destination()
+    app_module.catalog.invalidate()
+    client = login(make_user()[1])
+    for path in ('/', f'/destination/{destination_id}', '/search?q=test', '/api/suggest?q=te',
+                 f'/destination/{destination_id}/availability?date=2030-05-01',
+                 f'/api/v1/destinations?ids={destination_id}', '/api/v1/destinations?limit=5&cursor=1'):
+        assert client.get(path).status_code == 200, path
+    client.post(f'/add-to-cart/{destination_id}', data={'travel_date': '2030-05-01', 'quantity': 1})
+    assert client.get('/cart').status_code == 200
+    response = client.post('/checkout', data={'payment_method': 'Credit Card'})
+    assert response.status_code == 200
+    client.get('/order/ORD-MISSING/status')
+    for path in ('/admin', '/admin?status=Completed&date_from=2026-01-01', '/admin?user=admin',
+                 '/admin/reports', '/admin/export/orders.csv', '/admin/export/bookings.csv?since=2026-01-01',
+                 '/admin/export/users.ndjson'):
+        assert admin_client.get(path).status_code == 200, path
+
+    # Queries that read whole tables on purpose are listed in ROUTE_QUERIES with allow_scan
+    allowed = {normalize(sql) for _, sql, _, allow_scan in ROUTE_QUERIES if allow_scan}
+    queries = [(normalize(sql), sql, (None,) * sql.count('?'), normalize(sql) in allowed)
+               for sql in traced if sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE'))]
+    assert queries
+    assert check_query_plans(conn, queries) == []
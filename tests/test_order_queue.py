@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+
+import pytest
+
+from order_queue import OrderQueue
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / 'orders.journal')
+
+
+def committed(conn, order_numbers):
+    placeholders = ', '.join('?' * len(order_numbers))
+    return conn.execute(f'SELECT COUNT(*) FROM orders WHERE order_number IN ({placeholders})',
+                        list(order_numbers)).fetchone()[0]
+
+
+def journal_orders(journal_path):
+    with open(journal_path, encoding='utf-8') as journal:
+        return [json.loads(line)['order_number'] for line in journal]
+
+
+def test_concurrent_submits_share_fsyncs(app_module, conn, make_destination, make_user, order_for, journal_path,
+                                         monkeypatch, wait_for):
+    destination_id = make_destination(capacity=1000)
+    user_id, _ = make_user()
+    order_queue = OrderQueue(app_module.db_pool, journal_path)
+    fsync = os.fsync
+
+    def slow_fsync(fd):
+        threading.Event().wait(0.02)
+        fsync(fd)
+
+    monkeypatch.setattr(os, 'fsync', slow_fsync)
+    orders = [order_for(user_id, destination_id) for _ in range(20)]
+    threads = [threading.Thread(target=order_queue.submit, args=(order,)) for order in orders]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    numbers = [order['order_number'] for order in orders]
+    wait_for(lambda: committed(conn, numbers) == len(numbers))
+    assert order_queue.stats()['journal_fsyncs'] < len(orders)
+
+
+def test_journal_is_replayed_on_start(app_module, conn, make_destination, make_user, order_for, journal_path,
+                                      wait_for):
+    destination_id = make_destination()
+    user_id, _ = make_user()
+    orders = [order_for(user_id, destination_id) for _ in range(3)]
+    with open(journal_path, 'w', encoding='utf-8') as journal:
+        for order in orders:
+            journal.write(json.dumps(order) + '\n')
+        journal.write('{"order_number": "TORN')
+
+    order_queue = OrderQueue(app_module.db_pool, journal_path)
+    order_queue.start()
+    numbers = [order['order_number'] for order in orders]
+    wait_for(lambda: committed(conn, numbers) == 3)
+    wait_for(lambda: os.path.getsize(journal_path) == 0)
+
+    # Replaying the same journal again does not duplicate the orders
+    with open(journal_path, 'w', encoding='utf-8') as journal:
+        journal.write(json.dumps(orders[0]) + '\n')
+    OrderQueue(app_module.db_pool, journal_path).start()
+    wait_for(lambda: os.path.getsize(journal_path) == 0)
+    assert committed(conn, numbers) == 3
+
+
+def test_journal_is_compacted_while_orders_are_waiting(app_module, conn, make_destination, make_user, order_for,
+                                                       gate_batches, journal_path, wait_for):
+    destination_id = make_destination(capacity=1000)
+    user_id, _ = make_user()
+    order_queue = OrderQueue(app_module.db_pool, journal_path, compact_bytes=1)
+    gates = gate_batches(order_queue, 2)
+
+    first = order_for(user_id, destination_id)
+    order_queue.submit(first)
+    wait_for(lambda: order_queue.stats()['depth'] == 0)
+    waiting = [order_for(user_id, destination_id) for _ in range(3)]
+    for order in waiting:
+        order_queue.submit(order)
+
+    gates[0].set()
+    wait_for(lambda: order_queue.stats()['journal_compactions'] >= 1)
+    # The committed order is gone from the journal, the waiting ones are kept
+    assert journal_orders(journal_path) == [order['order_number'] for order in waiting]
+
+    gates[1].set()
+    wait_for(lambda: committed(conn, [order['order_number'] for order in waiting]) == 3)
+    wait_for(lambda: os.path.getsize(journal_path) == 0)
+
+
+def test_failed_orders_survive_a_restart(app_module, conn, make_destination, make_user, order_for, login,
+                                         journal_path, monkeypatch, wait_for):
+    destination_id = make_destination(capacity=1)
+    user_id, username = make_user()
+    order_queue = OrderQueue(app_module.db_pool, journal_path)
+    monkeypatch.setattr(app_module, 'order_queue', order_queue)
+
+    order = order_for(user_id, destination_id, quantity=2)
+    order_queue.submit(order)
+    wait_for(lambda: order_queue.stats()['failed'] == 1)
+
+    # A new queue (as after a restart) has no memory of it; the status comes from the database
+    monkeypatch.setattr(app_module, 'order_queue', OrderQueue(app_module.db_pool, journal_path))
+    response = login(username).get(f"/order/{order['order_number']}/status")
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'Failed'
+    assert committed(conn, [order['order_number']]) == 0
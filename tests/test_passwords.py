@@ -0,0 +1,41 @@
+import hashlib
+
+from passwords import PasswordHasher, PBKDF2Hasher, ScryptHasher
+
+
+def stored_hash(conn, user_id):
+    return conn.execute('SELECT password FROM user WHERE id = ?', (user_id,)).fetchone()[0]
+
+
+def test_hash_round_trip():
+    hasher = PasswordHasher(PBKDF2Hasher(iterations=1000))
+    encoded = hasher.hash('secret')
+    assert encoded.startswith('pbkdf2_sha256$1000$')
+    assert hasher.verify('secret', encoded) == (True, False)
+    assert hasher.verify('wrong', encoded) == (False, False)
+
+
+def test_other_algorithms_and_parameters_need_a_rehash():
+    hasher = PasswordHasher(PBKDF2Hasher(iterations=1000))
+    assert hasher.verify('secret', PBKDF2Hasher(iterations=2000).encode('secret')) == (True, True)
+    assert hasher.verify('secret', ScryptHasher(n=2 ** 4).encode('secret')) == (True, True)
+    assert hasher.verify('secret', 'unknown$abc') == (False, False)
+
+
+def test_login_upgrades_legacy_sha256_hash(app_module, conn, make_user, login):
+    user_id, username = make_user(password_hash=hashlib.sha256(b'secret').hexdigest())
+    login(username)
+    upgraded = stored_hash(conn, user_id)
+    assert upgraded.startswith('pbkdf2_sha256$')
+    assert app_module.verify_password('secret', upgraded) == (True, False)
+    # The upgraded hash still logs in
+    login(username)
+
+
+def test_failed_login_keeps_legacy_hash(app_module, conn, make_user):
+    legacy = hashlib.sha256(b'secret').hexdigest()
+    user_id, username = make_user(password_hash=legacy)
+    response = app_module.app.test_client().post('/login', data={'username': username, 'password': 'wrong'})
+    assert response.status_code == 200
+    assert b'Invalid username or password' in response.data
+    assert stored_hash(conn, user_id) == legacy
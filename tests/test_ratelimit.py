@@ -0,0 +1,86 @@
+import itertools
+
+import pytest
+
+from db import ConnectionPool
+from ratelimit import MemoryRateLimitStore, SQLiteRateLimitStore, parse_limit
+
+_addresses = itertools.count(1)
+
+
+def address():
+    n = next(_addresses)
+    return f'198.51.{n // 256}.{n % 256}'
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryRateLimitStore()
+    return SQLiteRateLimitStore(ConnectionPool(str(tmp_path / 'ratelimit.db'), max_size=2))
+
+
+@pytest.fixture
+def limiter(app_module, monkeypatch):
+    store = MemoryRateLimitStore()
+    monkeypatch.setattr(app_module, 'rate_limiter', store)
+    return store
+
+
+def test_parse_limit():
+    assert parse_limit('10/60') == (10, 60.0)
+    assert parse_limit('5') == (5, 60.0)
+    with pytest.raises(ValueError):
+        parse_limit('0/60')
+
+
+def test_bucket_rejects_once_empty(store):
+    assert [store.take('key', 3, 60) for _ in range(3)] == [0.0, 0.0, 0.0]
+    retry_after = store.take('key', 3, 60)
+    assert 0 < retry_after <= 20
+    # Other keys have their own bucket
+    assert store.take('other', 3, 60) == 0.0
+
+
+def test_refund_gives_a_token_back(store):
+    for _ in range(3):
+        store.take('key', 3, 60)
+    store.refund('key', 3, 60)
+    assert store.take('key', 3, 60) == 0.0
+    assert store.take('key', 3, 60) > 0
+
+
+def test_signup_is_limited_per_forwarded_client(app_module, limiter, monkeypatch):
+    monkeypatch.setattr(app_module, 'RATE_LIMIT_PROXY_HOPS', 1)
+    client = app_module.app.test_client()
+    abuser, other = address(), address()
+    # Everyone arrives from the same proxy address; only X-Forwarded-For tells them apart
+    environ = {'REMOTE_ADDR': '10.0.0.1'}
+    statuses = [client.post('/signup', data={}, environ_base=environ,
+                            headers={'X-Forwarded-For': abuser}).status_code for _ in range(6)]
+    assert statuses == [200] * 5 + [429]
+    response = client.post('/signup', data={}, environ_base=environ, headers={'X-Forwarded-For': other})
+    assert response.status_code == 200
+
+
+def test_rejection_has_retry_after(app_module, limiter):
+    client = app_module.app.test_client()
+    environ = {'REMOTE_ADDR': address()}
+    for _ in range(5):
+        client.post('/signup', data={}, environ_base=environ)
+    response = client.post('/signup', data={}, environ_base=environ)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+
+
+def test_successful_logins_do_not_use_up_the_username_limit(app_module, limiter, make_user):
+    _, username = make_user()
+    client = app_module.app.test_client()
+
+    def attempt(password):
+        return client.post('/login', data={'username': username, 'password': password},
+                           environ_base={'REMOTE_ADDR': address()}).status_code
+
+    assert [attempt('secret') for _ in range(8)] == [302] * 8
+    assert [attempt('wrong') for _ in range(5)] == [200] * 5
+    assert attempt('secret') == 429
@@ -0,0 +1,41 @@
+import sqlite3
+
+import pytest
+
+from migrations import migrate
+from orders import create_order
+from reports import check, rebuild
+
+
+@pytest.fixture
+def db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'reports.db'))
+    migrate(conn)
+    conn.executemany('INSERT INTO destination (name, description, price, capacity) VALUES (?, ?, ?, ?)',
+                     [(f'Destination {n}', 'Somewhere.', 100.0 * n, 1000) for n in range(1, 4)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def line(destination_id, quantity, price):
+    return {'destination_id': destination_id, 'quantity': quantity, 'price': price, 'travel_date': '2030-05-01'}
+
+
+def test_summaries_match_a_full_recompute(db):
+    create_order(db, 1, [line(1, 2, 100.0)], 'Credit Card')
+    # Several lines for the same destination are folded into one upsert
+    create_order(db, 1, [line(1, 1, 100.0), line(2, 3, 200.0), line(1, 4, 90.0)], 'PayPal')
+    create_order(db, 2, [line(3, 1, 300.0)] * 5, 'Credit Card')
+    assert check(db) == []
+    units, revenue = db.execute('SELECT units, revenue FROM sales_by_destination WHERE destination_id = 1').fetchone()
+    assert (units, revenue) == (7, 660.0)
+
+
+def test_rebuild_repairs_drift(db):
+    create_order(db, 1, [line(2, 1, 200.0)], 'Credit Card')
+    db.execute('UPDATE sales_by_payment SET revenue = 0')
+    db.commit()
+    assert [problem[0] for problem in check(db)] == ['sales_by_payment']
+    rebuild(db)
+    assert check(db) == []
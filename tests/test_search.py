@@ -0,0 +1,75 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from migrations import migrate
+from search import PrefixIndex, fts_query, search_destinations
+
+DESTINATIONS = [
+    ('New York City', 'The city that never sleeps.'),
+    ('Paris, France', 'Cafés, museums and the Eiffel Tower.'),
+    ('Lyon, France', 'Great food, two hours from Paris by train.'),
+    ('Zürich, Switzerland', 'A lake, the Alps and old town lanes.'),
+    ('York, England', 'Medieval walls and a minster.'),
+    ('Parma, Italy', 'Ham, cheese and opera.'),
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'search.db'))
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    conn.executemany('INSERT INTO destination (name, description, price) VALUES (?, ?, 100)', DESTINATIONS)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def names(conn, text, **kwargs):
+    return [row['name'] for row in search_destinations(conn, text, **kwargs)[0]]
+
+
+def test_user_input_is_quoted_with_a_prefix_on_the_last_word():
+    assert fts_query('Eiffel tow') == '"eiffel" "tow"*'
+    assert fts_query('a" OR "b NEAR(c) -d *') == '"a" "or" "b" "near" "c" "d"*'
+    assert fts_query(' "*- ') is None
+
+
+def test_last_word_matches_as_a_prefix(db):
+    assert sorted(names(db, 'par')) == ['Lyon, France', 'Paris, France', 'Parma, Italy']
+    assert names(db, 'eiffel tow') == ['Paris, France']
+
+
+def test_name_matches_rank_above_description_matches(db):
+    assert names(db, 'paris') == ['Paris, France', 'Lyon, France']
+
+
+def test_diacritics_are_ignored(db):
+    assert names(db, 'zurich') == ['Zürich, Switzerland']
+    assert names(db, 'cafes') == ['Paris, France']
+
+
+def test_pages(db):
+    assert search_destinations(db, 'france', per_page=1) == ([dict(db.execute(
+        "SELECT * FROM destination WHERE name = 'Paris, France'").fetchone())], True)
+    assert names(db, 'france', page=2, per_page=1) == ['Lyon, France']
+    assert search_destinations(db, 'france', page=3, per_page=1) == ([], False)
+
+
+def test_prefix_suggestions(db):
+    index = PrefixIndex(SimpleNamespace(current_generation=lambda: 1))
+    # Any word of a name can match, not just the first
+    assert [s['name'] for s in index.suggest(db, 'yor')] == ['New York City', 'York, England']
+    assert [s['name'] for s in index.suggest(db, 'fra par')] == ['Paris, France']
+    assert [s['name'] for s in index.suggest(db, 'par', limit=2)] == ['Paris, France', 'Parma, Italy']
+    assert index.suggest(db, '  ') == []
+
+
+@pytest.mark.parametrize('query', ['"', '"unbalanced', 'par*', '*', '-paris', 'paris -france', 'NEAR(a b)',
+                                   'a NEAR b', 'a OR', 'AND', '(', 'name:paris', '^start', 'é́'])
+def test_fts_syntax_in_the_query_is_not_an_error(app_module, query):
+    client = app_module.app.test_client()
+    assert client.get('/search', query_string={'q': query}).status_code == 200
+    assert client.get('/api/suggest', query_string={'q': query}).status_code == 200
@@ -1,44 +1,207 @@
+import argparse
+import os
 import sqlite3
+import sys
+from datetime import datetime
 
-def view_database():
+from archive import archive, cutoff_for, default_archive_dir, reclaim, vacuum
+from export import EXPORTS, FORMATS, iter_export
+
+DB_PATH = os.environ.get('DB_PATH', 'travel.db')
+
+
+def view_database(db_path=DB_PATH):
     try:
         # Connect to the database
-        conn = sqlite3.connect('travel.db')
+        conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
-        
+
         print("\n=== DATABASE CONTENT ===\n")
-        
+
         # Get table names
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
         tables = cursor.fetchall()
-        
+
         # Display tables
         for table in tables:
             table_name = table[0]
             print(f"\n** Table: {table_name} **")
-            
-            # Get all rows
-            cursor.execute(f"SELECT * FROM {table_name}")
-            rows = cursor.fetchall()
-            
+
             # Get column names
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = [column[1] for column in cursor.fetchall()]
-            
+            columns = [column[1] for column in conn.execute(f"PRAGMA table_info({table_name})")]
+
             # Print column names
             print(', '.join(columns))
             print('-' * 50)
-            
-            # Print each row
-            for row in rows:
+
+            # Print each row as it is read instead of loading the table into memory
+            for row in conn.execute(f"SELECT * FROM {table_name}"):
                 print(row)
-        
+
         conn.close()
-        
+
     except Exception as e:
         print(f"Error accessing database: {e}")
 
+
+def export_table(db_path, name, fmt, since=None, output=None, archive_dir=None):
+    conn = sqlite3.connect(db_path)
+    out = open(output, 'w', newline='', encoding='utf-8') if output else sys.stdout
+    try:
+        for chunk in iter_export(conn, name, fmt, since=since, archive_dir=archive_dir or default_archive_dir(db_path)):
+            out.write(chunk)
+        # Report the high-water mark so the next run can pass it as --since
+        latest = conn.execute(f'SELECT MAX(created_at) FROM {EXPORTS[name][0]}').fetchone()[0]
+        if latest:
+            print(f'Latest created_at: {latest}', file=sys.stderr)
+    finally:
+        if output:
+            out.close()
+        conn.close()
+
+
+def build_snapshot(output):
+    # Migrate and seed a throwaway database, then compact it into a single file
+    import tempfile
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ['DB_PATH'] = os.path.join(workdir, 'travel.db')
+        import app
+        app.init_db()
+        app.add_sample_destinations()
+        app.add_admin_user()
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        if os.path.exists(output):
+            os.remove(output)
+        with app.db_pool.connection() as conn:
+            conn.execute('VACUUM INTO ?', (output,))
+        app.db_pool.close_all()
+    print(f'Snapshot written to {output}')
+
+
+def rebuild_reports(db_path, check_only=False, archive_dir=None):
+    from reports import check, rebuild
+    conn = sqlite3.connect(db_path)
+    try:
+        # Summaries cover archived orders too, so recompute from every partition
+        archive_dir = archive_dir or default_archive_dir(db_path)
+        problems = check(conn, archive_dir)
+        for table, key, stored, expected in problems:
+            print(f'{table} {key}: stored {stored}, recomputed {expected}')
+        if check_only:
+            print(f'{len(problems)} summary row(s) differ from orders')
+            return 1 if problems else 0
+        rebuild(conn, archive_dir)
+        print(f'Sales summaries rebuilt ({len(problems)} row(s) corrected)')
+        return 0
+    finally:
+        conn.close()
+
+
+def import_destinations(db_path, path, fmt=None, chunk_size=5000):
+    from importer import import_file
+    from migrations import migrate
+    fmt = fmt or path.rsplit('.', 1)[-1].lower()
+    conn = sqlite3.connect(db_path)
+    try:
+        migrate(conn)
+        with open(path, 'rb') as f:
+            result = import_file(conn, f, fmt, chunk_size=chunk_size)
+    finally:
+        conn.close()
+    for error in result.errors:
+        print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+    # Running servers notice the catalog version change and reload on their own
+    print(f'{result.rows} rows: {result.inserted} inserted, {result.updated} updated, '
+          f'{result.unchanged} unchanged, {result.error_count} rejected')
+    return 1 if result.error_count else 0
+
+
+def archive_rows(db_path, cutoff, archive_dir=None, chunk_size=500, pause=0.01, full_vacuum=False):
+    from migrations import migrate
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute('PRAGMA busy_timeout = 30000')
+        migrate(conn)
+        moved = archive(conn, cutoff, archive_dir or default_archive_dir(db_path), chunk_size=chunk_size, pause=pause)
+        print(f"Archived {moved['orders']} orders ({moved['order_items']} items) and "
+              f"{moved['bookings']} bookings created before {cutoff}")
+        freed = reclaim(conn, pause=pause)
+        if freed is not None:
+            print(f'Released {freed} free pages')
+        elif full_vacuum:
+            print('Running a full VACUUM; writers are blocked until it finishes', file=sys.stderr)
+            vacuum(conn)
+            print('Database vacuumed and switched to incremental auto_vacuum')
+        else:
+            print('auto_vacuum is off for this database, so it will not shrink; '
+                  'run once with --vacuum to enable it', file=sys.stderr)
+        return 0
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect or export the Dream Travels database.')
+    parser.add_argument('--db', default=DB_PATH, help='path to the SQLite database')
+    parser.add_argument('--archive-dir', default=os.environ.get('ARCHIVE_DIR'),
+                        help='yearly archive databases (default: archive/ next to the database)')
+    commands = parser.add_subparsers(dest='command')
+
+    commands.add_parser('view', help='print every table (default)')
+
+    export_parser = commands.add_parser('export', help='stream a table as CSV or NDJSON')
+    export_parser.add_argument('name', choices=sorted(EXPORTS))
+    export_parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+    export_parser.add_argument('--since', help='only rows with created_at >= SINCE')
+    export_parser.add_argument('--output', '-o', help='write to a file instead of stdout')
+
+    snapshot_parser = commands.add_parser('snapshot', help='build the pre-seeded database copied in on cold start')
+    snapshot_parser.add_argument('output', nargs='?', default=os.path.join('snapshot', 'travel.db'))
+
+    reports_parser = commands.add_parser('rebuild-reports', help='recompute the sales summary tables from orders')
+    reports_parser.add_argument('--check', action='store_true', help='only report rows that differ')
+
+    import_parser = commands.add_parser('import', help='upsert destinations from a CSV or NDJSON file')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=['csv', 'ndjson'], help='default: from the file extension')
+    import_parser.add_argument('--chunk-size', type=int, default=5000, help='rows per transaction')
+
+    archive_parser = commands.add_parser('archive', help='move old orders and bookings into yearly archive databases')
+    cutoff = archive_parser.add_mutually_exclusive_group()
+    cutoff.add_argument('--before', help='archive rows created before this date (YYYY-MM-DD)')
+    cutoff.add_argument('--older-than', type=int, default=int(os.environ.get('ARCHIVE_AFTER_DAYS', 365)),
+                        help='archive rows older than this many days (default: ARCHIVE_AFTER_DAYS or 365)')
+    archive_parser.add_argument('--chunk-size', type=int, default=500, help='rows per transaction')
+    archive_parser.add_argument('--pause', type=float, default=0.01, help='seconds to sleep between chunks')
+    archive_parser.add_argument('--vacuum', action='store_true',
+                                help='run a full VACUUM if the database cannot shrink incrementally')
+
+    args = parser.parse_args(argv)
+    if args.command == 'export':
+        export_table(args.db, args.name, args.format, since=args.since, output=args.output,
+                     archive_dir=args.archive_dir)
+    elif args.command == 'snapshot':
+        build_snapshot(args.output)
+    elif args.command == 'rebuild-reports':
+        return rebuild_reports(args.db, check_only=args.check, archive_dir=args.archive_dir)
+    elif args.command == 'import':
+        return import_destinations(args.db, args.path, fmt=args.format, chunk_size=args.chunk_size)
+    elif args.command == 'archive':
+        if args.before:
+            try:
+                cutoff = datetime.strptime(args.before, '%Y-%m-%d').strftime('%Y-%m-%d')
+            except ValueError:
+                parser.error('--before must be a date like 2024-01-01')
+        else:
+            cutoff = cutoff_for(args.older_than)
+        # A cutoff in the future would archive orders while they are being placed
+        if cutoff > datetime.utcnow().strftime('%Y-%m-%d'):
+            parser.error('the cutoff must not be in the future')
+        return archive_rows(args.db, cutoff, args.archive_dir, chunk_size=args.chunk_size, pause=args.pause,
+                            full_vacuum=args.vacuum)
+    else:
+        view_database(args.db)
+
+
 if __name__ == "__main__":
-    view_database()
-    print("\nPress Enter to exit...")
-    input() 
\ No newline at end of file
+    sys.exit(main())